@@ -6,6 +6,7 @@ from sqlalchemy import pool
 from alembic import context
 
 from db import Base
+from settings import DATABASE_URL
 
 
 # this is the Alembic Config object, which provides
@@ -15,7 +16,11 @@ config = context.config
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
-    fileConfig(config.config_file_name)
+    # Не отключаем логгеры приложения, если миграции запущены из него (AUTO_MIGRATE)
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+# Адрес базы берём из тех же настроек, что и приложение
+config.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
 
 # add your model's MetaData object here
 # for 'autogenerate' support
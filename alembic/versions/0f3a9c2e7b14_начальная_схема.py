@@ -0,0 +1,143 @@
+"""Начальная схема
+
+Revision ID: 0f3a9c2e7b14
+Revises: 
+Create Date: 2026-10-18 15:21:09.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0f3a9c2e7b14'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Таблицы в том виде, в каком их раньше создавал Base.metadata.create_all
+    # до первой миграции. Базы, созданные так, уже содержат их - пропускаем
+    if sa.inspect(op.get_bind()).has_table('users'):
+        return
+
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('fullname', sa.String(), nullable=True),
+        sa.Column('role', sa.String(), nullable=True),
+        sa.Column('login', sa.String(), nullable=True),
+        sa.Column('password', sa.String(), nullable=True),
+        sa.Column('gmail', sa.String(), nullable=True),
+        sa.Column('vk', sa.String(), nullable=True),
+        sa.Column('group', sa.String(), nullable=True),
+        sa.Column('srbal', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.create_index(op.f('ix_users_login'), 'users', ['login'], unique=True)
+    op.create_index(op.f('ix_users_gmail'), 'users', ['gmail'], unique=True)
+    op.create_index(op.f('ix_users_vk'), 'users', ['vk'], unique=True)
+
+    op.create_table(
+        'teachers',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('fullname', sa.String(), nullable=True),
+        sa.Column('role', sa.String(), nullable=True),
+        sa.Column('login', sa.String(), nullable=True),
+        sa.Column('password', sa.String(), nullable=True),
+        sa.Column('gmail', sa.String(), nullable=True),
+        sa.Column('vk', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_teachers_id'), 'teachers', ['id'], unique=False)
+    op.create_index(op.f('ix_teachers_login'), 'teachers', ['login'], unique=True)
+    op.create_index(op.f('ix_teachers_gmail'), 'teachers', ['gmail'], unique=True)
+    op.create_index(op.f('ix_teachers_vk'), 'teachers', ['vk'], unique=True)
+
+    op.create_table(
+        'predmeti',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('color', sa.String(), nullable=True),
+        sa.Column('predmet', sa.String(), nullable=True),
+        sa.Column('attes', sa.String(), nullable=True),
+        sa.Column('srbal', sa.Integer(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_predmeti_id'), 'predmeti', ['id'], unique=False)
+    op.create_index(op.f('ix_predmeti_color'), 'predmeti', ['color'], unique=False)
+    op.create_index(op.f('ix_predmeti_predmet'), 'predmeti', ['predmet'], unique=False)
+
+    op.create_table(
+        'ocenki',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('data', sa.String(), nullable=True),
+        sa.Column('ocenka', sa.String(), nullable=True),
+        sa.Column('predmet_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['predmet_id'], ['predmeti.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_ocenki_id'), 'ocenki', ['id'], unique=False)
+
+    op.create_table(
+        'group',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('teacher_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['teacher_id'], ['teachers.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_group_id'), 'group', ['id'], unique=False)
+    op.create_index(op.f('ix_group_name'), 'group', ['name'], unique=False)
+
+    op.create_table(
+        'classryk',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('teacher_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['teacher_id'], ['teachers.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_classryk_id'), 'classryk', ['id'], unique=False)
+    op.create_index(op.f('ix_classryk_name'), 'classryk', ['name'], unique=False)
+
+    op.create_table(
+        'lessons',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_lessons_id'), 'lessons', ['id'], unique=False)
+
+    # Поле name добавляет следующая миграция
+    op.create_table(
+        'session',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('group', sa.String(), nullable=True),
+        sa.Column('teacher', sa.String(), nullable=True),
+        sa.Column('teacher2', sa.String(), nullable=True),
+        sa.Column('start', sa.String(), nullable=True),
+        sa.Column('end', sa.String(), nullable=True),
+        sa.Column('clases', sa.String(), nullable=True),
+        sa.Column('adress', sa.String(), nullable=True),
+        sa.Column('color', sa.String(), nullable=True),
+        sa.Column('lessons_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['lessons_id'], ['lessons.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_session_id'), 'session', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ('session', 'lessons', 'classryk', 'group', 'ocenki', 'predmeti', 'teachers', 'users'):
+        op.drop_table(table)
@@ -0,0 +1,38 @@
+"""Индексы внешних ключей
+
+Revision ID: 3e9b1d7a5c20
+Revises: b7e2d4a61c95
+Create Date: 2026-10-18 15:58:44.230871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e9b1d7a5c20'
+down_revision: Union[str, None] = 'b7e2d4a61c95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Предметы и оценки студента, группы и классное руководство учителя
+    op.create_index(op.f('ix_predmeti_user_id'), 'predmeti', ['user_id'], unique=False)
+    op.create_index(op.f('ix_ocenki_predmet_id'), 'ocenki', ['predmet_id'], unique=False)
+    op.create_index(op.f('ix_group_teacher_id'), 'group', ['teacher_id'], unique=False)
+    op.create_index(op.f('ix_classryk_teacher_id'), 'classryk', ['teacher_id'], unique=False)
+    # Список студентов группы (rowid в индексе SQLite даёт и порядок по id для курсора)
+    op.create_index(op.f('ix_users_group'), 'users', ['group'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_users_group'), table_name='users')
+    op.drop_index(op.f('ix_classryk_teacher_id'), table_name='classryk')
+    op.drop_index(op.f('ix_group_teacher_id'), table_name='group')
+    op.drop_index(op.f('ix_ocenki_predmet_id'), table_name='ocenki')
+    op.drop_index(op.f('ix_predmeti_user_id'), table_name='predmeti')
@@ -0,0 +1,38 @@
+"""Индексы для выборок расписания
+
+Revision ID: 5d2e8b7c1f03
+Revises: a4c86c5566e9
+Create Date: 2026-10-18 10:12:41.508214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2e8b7c1f03'
+down_revision: Union[str, None] = 'a4c86c5566e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_lessons_date'), 'lessons', ['date'], unique=False)
+    op.create_index(op.f('ix_session_lessons_id'), 'session', ['lessons_id'], unique=False)
+    op.create_index(op.f('ix_session_group'), 'session', ['group'], unique=False)
+    op.create_index(op.f('ix_session_teacher'), 'session', ['teacher'], unique=False)
+    op.create_index(op.f('ix_session_teacher2'), 'session', ['teacher2'], unique=False)
+    op.create_index(op.f('ix_session_clases'), 'session', ['clases'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_session_clases'), table_name='session')
+    op.drop_index(op.f('ix_session_teacher2'), table_name='session')
+    op.drop_index(op.f('ix_session_teacher'), table_name='session')
+    op.drop_index(op.f('ix_session_group'), table_name='session')
+    op.drop_index(op.f('ix_session_lessons_id'), table_name='session')
+    op.drop_index(op.f('ix_lessons_date'), table_name='lessons')
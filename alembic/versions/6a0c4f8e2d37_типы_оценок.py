@@ -0,0 +1,134 @@
+"""Числовые оценки и даты в ocenki
+
+Revision ID: 6a0c4f8e2d37
+Revises: 3e9b1d7a5c20
+Create Date: 2026-10-18 16:34:12.581904
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a0c4f8e2d37'
+down_revision: Union[str, None] = '3e9b1d7a5c20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Сколько строк читаем и обновляем за один проход
+BATCH_SIZE = 1000
+
+DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%d.%m.%y", "%d/%m/%Y")
+
+
+def _to_date(value):
+    # Формат хранения DATE в SQLAlchemy для SQLite
+    if value is None:
+        return None
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def _to_mark(value):
+    # "5", " 4 ", "3.0", "3,0" -> целое; остальное (например, "н") - отметка без числа,
+    # её текст сохраняется в ocenka_text
+    if value is None:
+        return None
+    try:
+        number = float(str(value).strip().replace(",", "."))
+    except ValueError:
+        return None
+    return int(number) if number.is_integer() else None
+
+
+# Сколько неразобранных дат показываем в ошибке
+BAD_ROWS_SHOWN = 50
+
+
+def _batches(columns: str):
+    """Строки ocenki пачками по id"""
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.text(f'SELECT id, {columns} FROM ocenki WHERE id > :last_id ORDER BY id LIMIT :limit'),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        yield rows
+        last_id = rows[-1][0]
+
+
+def _check_dates() -> None:
+    """Останавливает миграцию до изменения схемы, если есть даты, которые не разобрать:
+    их нужно исправить руками, иначе они пропали бы"""
+    bad = [
+        (row_id, data)
+        for rows in _batches('data')
+        for row_id, data in rows
+        if data is not None and data.strip() and _to_date(data) is None
+    ]
+    if bad:
+        shown = "\n".join(f"  id={row_id}: {data!r}" for row_id, data in bad[:BAD_ROWS_SHOWN])
+        more = f"\n  ... и ещё {len(bad) - BAD_ROWS_SHOWN}" if len(bad) > BAD_ROWS_SHOWN else ""
+        raise RuntimeError(
+            f"В ocenki.data {len(bad)} дат в неизвестном формате (ожидаются {', '.join(DATE_FORMATS)}), "
+            f"исправьте их и повторите миграцию:\n{shown}{more}"
+        )
+
+
+def _backfill() -> None:
+    """Переносит data/ocenka в типизированные колонки; текст отметок без числа - в ocenka_text"""
+    bind = op.get_bind()
+    for rows in _batches('data, ocenka'):
+        params = []
+        for row_id, data, ocenka in rows:
+            mark = _to_mark(ocenka)
+            text = ocenka if mark is None and ocenka is not None and str(ocenka).strip() else None
+            params.append({"id": row_id, "data": _to_date(data), "ocenka": mark, "ocenka_text": text})
+        bind.execute(
+            sa.text('UPDATE ocenki SET data_new = :data, ocenka_new = :ocenka, ocenka_text = :ocenka_text WHERE id = :id'),
+            params,
+        )
+
+
+def _replace_columns() -> None:
+    # ALTER TYPE в batch-режиме SQLite сделал бы CAST и испортил бы даты
+    with op.batch_alter_table('ocenki') as batch_op:
+        batch_op.drop_column('data')
+        batch_op.drop_column('ocenka')
+    with op.batch_alter_table('ocenki') as batch_op:
+        batch_op.alter_column('data_new', new_column_name='data')
+        batch_op.alter_column('ocenka_new', new_column_name='ocenka')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _check_dates()
+    op.add_column('ocenki', sa.Column('data_new', sa.Date(), nullable=True))
+    op.add_column('ocenki', sa.Column('ocenka_new', sa.Integer(), nullable=True))
+    op.add_column('ocenki', sa.Column('ocenka_text', sa.String(), nullable=True))
+    _backfill()
+    _replace_columns()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('ocenki', sa.Column('data_new', sa.String(), nullable=True))
+    op.add_column('ocenki', sa.Column('ocenka_new', sa.String(), nullable=True))
+    # Отметки без числа возвращаются в ocenka исходным текстом
+    op.execute(
+        'UPDATE ocenki SET data_new = CAST(data AS VARCHAR), '
+        'ocenka_new = COALESCE(ocenka_text, CAST(ocenka AS VARCHAR))'
+    )
+    _replace_columns()
+    with op.batch_alter_table('ocenki') as batch_op:
+        batch_op.drop_column('ocenka_text')
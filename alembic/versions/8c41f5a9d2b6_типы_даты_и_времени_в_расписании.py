@@ -0,0 +1,147 @@
+"""Типы DATE/TIME для lessons.date и session.start/end
+
+Revision ID: 8c41f5a9d2b6
+Revises: 5d2e8b7c1f03
+Create Date: 2026-10-18 11:40:03.917352
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41f5a9d2b6'
+down_revision: Union[str, None] = '5d2e8b7c1f03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Сколько строк читаем и обновляем за один проход
+BATCH_SIZE = 1000
+
+DATE_FORMATS = ("%Y-%m-%d", "%d.%m.%Y", "%d.%m.%y", "%d/%m/%Y")
+TIME_FORMATS = ("%H:%M:%S.%f", "%H:%M:%S", "%H:%M", "%H.%M")
+
+
+def _parse(value, formats):
+    if value is None:
+        return None
+    for fmt in formats:
+        try:
+            return datetime.strptime(value.strip(), fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _to_date(value):
+    # Формат хранения DATE в SQLAlchemy для SQLite
+    parsed = _parse(value, DATE_FORMATS)
+    return parsed.strftime("%Y-%m-%d") if parsed else None
+
+
+def _to_time(value):
+    # Формат хранения TIME в SQLAlchemy для SQLite
+    parsed = _parse(value, TIME_FORMATS)
+    return parsed.strftime("%H:%M:%S.%f") if parsed else None
+
+
+# Сколько неразобранных значений показываем в ошибке
+BAD_ROWS_SHOWN = 50
+
+
+def _batches(table: str, columns: Sequence[str]):
+    """Строки таблицы пачками по id, не загружая её целиком"""
+    bind = op.get_bind()
+    select_cols = ", ".join(f'"{c}"' for c in columns)
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.text(f'SELECT id, {select_cols} FROM "{table}" WHERE id > :last_id ORDER BY id LIMIT :limit'),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        yield rows
+        last_id = rows[-1][0]
+
+
+def _check_values(checks) -> None:
+    """Останавливает миграцию до изменения схемы, если есть значения, которые не разобрать:
+    их нужно исправить руками, иначе они пропали бы. checks - (таблица, колонки, convert, форматы)"""
+    bad = [
+        (table, c, row[0], v, formats)
+        for table, columns, convert, formats in checks
+        for rows in _batches(table, columns)
+        for row in rows
+        for c, v in zip(columns, row[1:])
+        if v is not None and v.strip() and convert(v) is None
+    ]
+    if bad:
+        shown = "\n".join(
+            f"  {table}.{c} id={row_id}: {v!r} (ожидается {', '.join(formats)})"
+            for table, c, row_id, v, formats in bad[:BAD_ROWS_SHOWN]
+        )
+        more = f"\n  ... и ещё {len(bad) - BAD_ROWS_SHOWN}" if len(bad) > BAD_ROWS_SHOWN else ""
+        raise RuntimeError(
+            f"{len(bad)} значений даты/времени в неизвестном формате, исправьте их и повторите миграцию:\n{shown}{more}"
+        )
+
+
+def _backfill(table: str, columns: Sequence[str], convert) -> None:
+    """Переносит значения column -> column_new пачками по id"""
+    bind = op.get_bind()
+    set_cols = ", ".join(f'"{c}_new" = :{c}' for c in columns)
+    for rows in _batches(table, columns):
+        params = [{"id": row[0], **{c: convert(v) for c, v in zip(columns, row[1:])}} for row in rows]
+        bind.execute(sa.text(f'UPDATE "{table}" SET {set_cols} WHERE id = :id'), params)
+
+
+def _replace_columns(table: str, columns: Sequence[str]) -> None:
+    # Старые строковые колонки удаляем, новые получают их имена.
+    # ALTER TYPE в batch-режиме SQLite сделал бы CAST и испортил бы значения
+    with op.batch_alter_table(table) as batch_op:
+        for c in columns:
+            batch_op.drop_column(c)
+    with op.batch_alter_table(table) as batch_op:
+        for c in columns:
+            batch_op.alter_column(f"{c}_new", new_column_name=c)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _check_values([
+        ("lessons", ["date"], _to_date, DATE_FORMATS),
+        ("session", ["start", "end"], _to_time, TIME_FORMATS),
+    ])
+    op.add_column('lessons', sa.Column('date_new', sa.Date(), nullable=True))
+    op.add_column('session', sa.Column('start_new', sa.Time(), nullable=True))
+    op.add_column('session', sa.Column('end_new', sa.Time(), nullable=True))
+
+    _backfill("lessons", ["date"], _to_date)
+    _backfill("session", ["start", "end"], _to_time)
+
+    op.drop_index(op.f('ix_lessons_date'), table_name='lessons')
+    _replace_columns("lessons", ["date"])
+    _replace_columns("session", ["start", "end"])
+    op.create_index(op.f('ix_lessons_date'), 'lessons', ['date'], unique=False)
+
+    op.create_index('ix_session_lessons_id_group', 'session', ['lessons_id', 'group'], unique=False)
+    op.create_index('ix_session_lessons_id_teacher', 'session', ['lessons_id', 'teacher'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_session_lessons_id_teacher', table_name='session')
+    op.drop_index('ix_session_lessons_id_group', table_name='session')
+
+    # Значения DATE/TIME уже хранятся строками ISO, просто возвращаем тип колонкам
+    op.drop_index(op.f('ix_lessons_date'), table_name='lessons')
+    for table, c, type_ in (("lessons", "date", sa.Date()), ("session", "start", sa.Time()), ("session", "end", sa.Time())):
+        op.add_column(table, sa.Column(f"{c}_new", sa.String(), nullable=True))
+        op.execute(f'UPDATE "{table}" SET "{c}_new" = CAST("{c}" AS VARCHAR)')
+    _replace_columns("lessons", ["date"])
+    _replace_columns("session", ["start", "end"])
+    op.create_index(op.f('ix_lessons_date'), 'lessons', ['date'], unique=False)
@@ -0,0 +1,60 @@
+"""Сумма и число оценок для среднего балла предмета и студента
+
+Revision ID: 9d5b3f1a7e42
+Revises: 6a0c4f8e2d37
+Create Date: 2026-10-18 17:42:06.318254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d5b3f1a7e42'
+down_revision: Union[str, None] = '6a0c4f8e2d37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _backfill() -> None:
+    # Агрегаты предметов по оценкам, затем студентов по предметам; srbal - отдельным шагом,
+    # потому что в одном UPDATE выражения видят старые значения колонок
+    op.execute(
+        'UPDATE predmeti SET '
+        'ocenki_sum = COALESCE((SELECT SUM(ocenka) FROM ocenki WHERE ocenki.predmet_id = predmeti.id), 0), '
+        'ocenki_count = (SELECT COUNT(ocenka) FROM ocenki WHERE ocenki.predmet_id = predmeti.id)'
+    )
+    op.execute(
+        'UPDATE users SET '
+        'ocenki_sum = COALESCE((SELECT SUM(ocenki_sum) FROM predmeti WHERE predmeti.user_id = users.id), 0), '
+        'ocenki_count = COALESCE((SELECT SUM(ocenki_count) FROM predmeti WHERE predmeti.user_id = users.id), 0)'
+    )
+    for table in ('predmeti', 'users'):
+        op.execute(
+            f'UPDATE {table} SET srbal = CASE WHEN ocenki_count > 0 THEN ocenki_sum * 1.0 / ocenki_count END'
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ('predmeti', 'users'):
+        with op.batch_alter_table(table) as batch_op:
+            # Прежние значения srbal вводились вручную, ниже они пересчитываются по оценкам
+            batch_op.alter_column('srbal', type_=sa.Float(), existing_nullable=True)
+            batch_op.add_column(sa.Column('ocenki_sum', sa.Integer(), server_default='0', nullable=False))
+            batch_op.add_column(sa.Column('ocenki_count', sa.Integer(), server_default='0', nullable=False))
+    _backfill()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('ocenki_count')
+        batch_op.drop_column('ocenki_sum')
+        batch_op.alter_column('srbal', type_=sa.String(), existing_nullable=True)
+    with op.batch_alter_table('predmeti') as batch_op:
+        batch_op.drop_column('ocenki_count')
+        batch_op.drop_column('ocenki_sum')
+        batch_op.alter_column('srbal', type_=sa.Integer(), existing_nullable=True)
@@ -1,7 +1,7 @@
 """Добавление поля name в таблицу session
 
 Revision ID: a4c86c5566e9
-Revises: 
+Revises: 0f3a9c2e7b14
 Create Date: 2025-03-25 01:08:56.633165
 
 """
@@ -13,16 +13,18 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision: str = 'a4c86c5566e9'
-down_revision: Union[str, None] = None
+down_revision: Union[str, None] = '0f3a9c2e7b14'
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
 
 def upgrade() -> None:
     """Upgrade schema."""
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.add_column('session', sa.Column('name', sa.String(), nullable=True))
-    # ### end Alembic commands ###
+    # Базы, созданные старым Base.metadata.create_all, уже содержат эту колонку
+    # (начальная миграция для них пропускается) - тогда добавлять её не нужно
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('session')}
+    if 'name' not in columns:
+        op.add_column('session', sa.Column('name', sa.String(), nullable=True))
 
 
 def downgrade() -> None:
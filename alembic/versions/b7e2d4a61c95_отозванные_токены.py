@@ -0,0 +1,38 @@
+"""Отозванные токены
+
+Revision ID: b7e2d4a61c95
+Revises: 8c41f5a9d2b6
+Create Date: 2026-10-18 14:03:27.114502
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2d4a61c95'
+down_revision: Union[str, None] = '8c41f5a9d2b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'revoked_tokens',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('revoked_at', sa.Float(), nullable=True),
+        sa.Column('expires', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('key'),
+    )
+    op.create_index(op.f('ix_revoked_tokens_revoked_at'), 'revoked_tokens', ['revoked_at'], unique=False)
+    op.create_index(op.f('ix_revoked_tokens_expires'), 'revoked_tokens', ['expires'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_revoked_tokens_expires'), table_name='revoked_tokens')
+    op.drop_index(op.f('ix_revoked_tokens_revoked_at'), table_name='revoked_tokens')
+    op.drop_table('revoked_tokens')
@@ -0,0 +1,44 @@
+"""Сводка оценок групп для аналитики
+
+Revision ID: c2f8a6d4e913
+Revises: 9d5b3f1a7e42
+Create Date: 2026-10-18 19:05:37.904612
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2f8a6d4e913'
+down_revision: Union[str, None] = '9d5b3f1a7e42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('group_stats',
+    sa.Column('group', sa.String(), nullable=False),
+    sa.Column('predmet', sa.String(), nullable=False),
+    sa.Column('month', sa.String(), nullable=False),
+    sa.Column('ocenka', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('group', 'predmet', 'month', 'ocenka')
+    )
+    # Заполняем по уже выставленным оценкам
+    op.execute(
+        'INSERT INTO group_stats ("group", predmet, month, ocenka, count) '
+        'SELECT COALESCE(users."group", \'\'), COALESCE(predmeti.predmet, \'\'), '
+        'COALESCE(strftime(\'%Y-%m\', ocenki.data), \'\'), ocenki.ocenka, COUNT(*) '
+        'FROM ocenki JOIN predmeti ON predmeti.id = ocenki.predmet_id JOIN users ON users.id = predmeti.user_id '
+        'WHERE ocenki.ocenka IS NOT NULL '
+        'GROUP BY 1, 2, 3, 4'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('group_stats')
@@ -0,0 +1,139 @@
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException, APIRouter, Depends, Query
+from db import UserDB, PredmetDB, ClassRykDB, GroupStatDB, get_async_db
+from pydantic import BaseModel
+from typing import Optional
+from auth import Principal, get_current_user
+from settings import FAILING_GRADE
+
+router = APIRouter()
+
+MONTH_PATTERN = r"^\d{4}-(0[1-9]|1[0-2])$"
+
+# Аналитика группы для классного руководителя. Распределения и динамика оценок читаются
+# из сводки group_stats (десятки строк на предмет), неуспевающие - из средних баллов предметов,
+# которые ведутся вместе с оценками; сами оценки эти эндпоинты не читают
+
+
+class SubjectStats(BaseModel):
+    predmet: str
+    count: int
+    average: Optional[float] = None
+    distribution: dict[int, int]  # оценка -> сколько раз поставлена
+    failing: int  # студентов со средним баллом ниже FAILING_GRADE
+
+class GroupAnalyticsResponse(BaseModel):
+    message: str
+    group: str
+    students: int
+    failing: int  # неуспевающих хотя бы по одному предмету
+    subjects: list[SubjectStats]
+
+class MonthStats(BaseModel):
+    month: str  # "YYYY-MM"
+    count: int
+    average: Optional[float] = None
+
+class GroupTimelineResponse(BaseModel):
+    message: str
+    group: str
+    predmet: Optional[str] = None
+    months: list[MonthStats]
+
+
+async def _check_head_teacher(group: str, db: AsyncSession, current_user: Principal):
+    if current_user.role != "teacher":
+        raise HTTPException(status_code=403, detail="Аналитика доступна только классному руководителю")
+    is_head = await db.scalar(
+        select(ClassRykDB.id).where(ClassRykDB.teacher_id == current_user.id, ClassRykDB.name == group).limit(1)
+    )
+    if is_head is None:
+        raise HTTPException(status_code=403, detail="Учитель не является классным руководителем этой группы")
+
+
+@router.get("/groups/{group}/analytics/", response_model=GroupAnalyticsResponse)
+async def get_group_analytics(
+    group: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    await _check_head_teacher(group, db, current_user)
+
+    # Распределение оценок по предметам за всё время
+    distribution = (await db.execute(
+        select(GroupStatDB.predmet, GroupStatDB.ocenka, func.sum(GroupStatDB.count))
+        .where(GroupStatDB.group == group)
+        .group_by(GroupStatDB.predmet, GroupStatDB.ocenka)
+        .having(func.sum(GroupStatDB.count) > 0)
+        .order_by(GroupStatDB.predmet, GroupStatDB.ocenka)
+    )).all()
+
+    # Средние баллы студентов группы по предметам (уже посчитаны)
+    students = (await db.execute(
+        select(UserDB.id, PredmetDB.predmet, PredmetDB.srbal)
+        .select_from(UserDB)
+        .outerjoin(PredmetDB, PredmetDB.user_id == UserDB.id)
+        .where(UserDB.group == group)
+    )).all()
+
+    subjects: dict[str, SubjectStats] = {}
+    for predmet, ocenka, count in distribution:
+        stats = subjects.setdefault(predmet, SubjectStats(predmet=predmet, count=0, distribution={}, failing=0))
+        stats.distribution[ocenka] = count
+        stats.count += count
+    for stats in subjects.values():
+        stats.average = sum(ocenka * count for ocenka, count in stats.distribution.items()) / stats.count
+
+    failing_students = set()
+    for user_id, predmet, srbal in students:
+        if srbal is not None and srbal < FAILING_GRADE:
+            failing_students.add(user_id)
+            stats = subjects.setdefault(predmet or "", SubjectStats(predmet=predmet or "", count=0, distribution={}, failing=0))
+            stats.failing += 1
+
+    return {
+        "message": "Аналитика группы получена",
+        "group": group,
+        "students": len({row[0] for row in students}),
+        "failing": len(failing_students),
+        "subjects": sorted(subjects.values(), key=lambda stats: stats.predmet),
+    }
+
+
+@router.get("/groups/{group}/analytics/timeline/", response_model=GroupTimelineResponse)
+async def get_group_timeline(
+    group: str,
+    predmet: Optional[str] = None,
+    month_from: Optional[str] = Query(None, pattern=MONTH_PATTERN, description="Первый месяц периода, YYYY-MM (включительно)"),
+    month_to: Optional[str] = Query(None, pattern=MONTH_PATTERN, description="Последний месяц периода, YYYY-MM (включительно)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """Сколько оценок и какой средний балл у группы по месяцам (по одному предмету или по всем)"""
+    if month_from is not None and month_to is not None and month_to < month_from:
+        raise HTTPException(status_code=400, detail="Месяц окончания раньше месяца начала")
+    await _check_head_teacher(group, db, current_user)
+
+    total = func.sum(GroupStatDB.count)
+    query = (
+        select(GroupStatDB.month, total, func.sum(GroupStatDB.ocenka * GroupStatDB.count))
+        .where(GroupStatDB.group == group, GroupStatDB.month != "")
+        .group_by(GroupStatDB.month)
+        .having(total > 0)
+        .order_by(GroupStatDB.month)
+    )
+    if predmet is not None:
+        query = query.where(GroupStatDB.predmet == predmet)
+    # Сводка ведётся по месяцам, поэтому и период задаётся месяцами: строки "YYYY-MM"
+    # сравниваются в том же порядке, что и даты
+    if month_from is not None:
+        query = query.where(GroupStatDB.month >= month_from)
+    if month_to is not None:
+        query = query.where(GroupStatDB.month <= month_to)
+
+    months = [
+        MonthStats(month=month, count=count, average=weighted / count)
+        for month, count, weighted in (await db.execute(query)).all()
+    ]
+    return {"message": "Динамика оценок получена", "group": group, "predmet": predmet, "months": months}
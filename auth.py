@@ -1,28 +1,58 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from fastapi import Security, HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import HTTPException, APIRouter, Depends
 from pydantic import BaseModel
-import bcrypt
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
-from db import get_db, TeacherDB, UserDB
+from typing import Dict, Optional, Tuple
+from settings import SECRET_KEY, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS, PRINCIPAL_CACHE_TTL
+from db import get_async_db, TeacherDB, UserDB
+import hashlib
+import hmac
+import time
+import uuid
 from websocket import notify_disconnect_user
+from hashing import verify_password
+from revocation import is_revoked, revoke_token, revoke_user
 
 router = APIRouter()
 
-SECRET_KEY = "mysecretkey"  # Лучше вынести в .env
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# {(роль, id): (время истечения, отпечаток пароля)}
+_principal_cache: Dict[Tuple[str, int], Tuple[float, str]] = {}
+
 class AuthRequest(BaseModel):
     login: str
     password: str  # исправленная опечатка
 
+class Principal(BaseModel):
+    """Текущий пользователь, собранный из claims токена"""
+    id: int
+    role: str  # "user" (студент) или "teacher"
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
+class TokenResponse(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str
+
+class MessageResponse(BaseModel):
+    message: str
+
 class AuthResponse(BaseModel):
     id: int
     access_token: str
+    refresh_token: str
     token_type: str
     role: str
     name: str
@@ -32,15 +62,38 @@ class AuthResponse(BaseModel):
     vk: str
     group: str
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
-
-def create_access_token(data: dict, expires_delta: timedelta):
+def create_access_token(data: dict, expires_delta: timedelta, token_type: str = "access"):
     to_encode = data.copy()
     expire = datetime.utcnow() + expires_delta
-    to_encode.update({"exp": expire})
+    # jti - идентификатор для отзыва, iat - для отзыва всех токенов пользователя разом
+    to_encode.update({"exp": expire, "iat": int(time.time()), "jti": uuid.uuid4().hex, "type": token_type})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def create_token_pair(user_id: int, role: str, fingerprint: str) -> TokenResponse:
+    data = {"sub": str(user_id), "role": role, "pwd": fingerprint}  # Преобразуем ID в строку
+    return TokenResponse(
+        access_token=create_access_token(data, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)),
+        refresh_token=create_access_token(data, timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS), "refresh"),
+        token_type="bearer",
+    )
+
+def password_fingerprint(hashed_password: str) -> str:
+    """Отпечаток хэша пароля для токена: после смены пароля старые токены перестают подходить"""
+    return hmac.new(SECRET_KEY.encode(), hashed_password.encode(), hashlib.sha256).hexdigest()[:16]
+
+def invalidate_principal(role: str, user_id: int):
+    """Сбрасывает кэш проверки токенов пользователя (удаление, смена пароля)"""
+    _principal_cache.pop((role, user_id), None)
+
+async def revoke_user_tokens(db: AsyncSession, role: str, user_id: int):
+    """Отзывает все выданные пользователю токены (удаление пользователя)"""
+    invalidate_principal(role, user_id)
+    await revoke_user(db, role, user_id, timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS).total_seconds())
+
+def clear_principal_cache():
+    """Сбрасывает кэш целиком (например, после восстановления базы из копии)"""
+    _principal_cache.clear()
+
 def decode_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -49,15 +102,19 @@ def decode_token(token: str):
         return None
     
 @router.post("/auth/login", response_model=AuthResponse)
-async def login(auth_data: AuthRequest, db: Session = Depends(get_db)):
-    user = db.query(TeacherDB).filter(TeacherDB.login == auth_data.login).first()
+async def login(auth_data: AuthRequest, db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(TeacherDB).options(selectinload(TeacherDB.group)).where(TeacherDB.login == auth_data.login))
     role = "teacher"
 
     if not user:
-        user = db.query(UserDB).filter(UserDB.login == auth_data.login).first()
+        user = await db.scalar(select(UserDB).where(UserDB.login == auth_data.login))
         role = "user"
 
-    if not user or not verify_password(auth_data.password, user.password):
+    # Пока пароль ждёт очереди bcrypt, соединение из пула не держим: при наплыве входов
+    # пул иначе кончается раньше потоков хэширования, и запросы падают по pool_timeout
+    await db.close()
+
+    if not user or not await verify_password(auth_data.password, user.password):
         raise HTTPException(status_code=401, detail="Неверный логин или пароль")
 
     # Преобразуем group в строку
@@ -68,16 +125,13 @@ async def login(auth_data: AuthRequest, db: Session = Depends(get_db)):
         # Для студента это поле остаётся строкой
         group = user.group
 
-    # Создаем JWT-токен
-    access_token = create_access_token(
-      data={"sub": str(user.id), "role": role},  # Преобразуем ID в строку
-      expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
-    )
-
+    # Создаем пару JWT-токенов
+    tokens = create_token_pair(user.id, role, password_fingerprint(user.password))
 
     return AuthResponse(
-        access_token=access_token,
-        token_type="bearer",
+        access_token=tokens.access_token,
+        refresh_token=tokens.refresh_token,
+        token_type=tokens.token_type,
         role=role,
         name=user.name,
         fullname=user.fullname,
@@ -89,21 +143,77 @@ async def login(auth_data: AuthRequest, db: Session = Depends(get_db)):
     )
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("sub")
-        role: str = payload.get("role")
+async def _load_fingerprint(db: AsyncSession, role: str, user_id: int) -> Optional[str]:
+    model = TeacherDB if role == "teacher" else UserDB
+    hashed_password = await db.scalar(select(model.password).where(model.id == user_id))
+    return password_fingerprint(hashed_password) if hashed_password is not None else None
 
-        if user_id is None or role is None:
-            raise HTTPException(status_code=401, detail="Недействительный токен")
-
-        # Найти пользователя в БД
-        user = db.query(UserDB).filter(UserDB.id == user_id).first()
-        if user is None:
-            raise HTTPException(status_code=401, detail="Пользователь не найден")
 
-        return {"user": user, "role": role}
+def _decode(token: str, token_type: str) -> dict:
+    """Раскодирует токен нужного типа и проверяет, что он не отозван"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError as e:
         print("Ошибка JWT:", e)
-        raise HTTPException(status_code=401, detail="Недействительный токен")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Недействительный токен")
+
+    if (
+        payload.get("type") != token_type
+        or payload.get("sub") is None
+        or payload.get("role") not in ("user", "teacher")
+        or payload.get("pwd") is None
+    ):
+        raise HTTPException(status_code=401, detail="Недействительный токен")
+    if is_revoked(payload):
+        raise HTTPException(status_code=401, detail="Токен отозван")
+    return payload
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Principal:
+    """Проверяет токен; к БД обращается, только если пользователя нет в кэше"""
+    payload = _decode(token, "access")
+    key = (payload["role"], int(payload["sub"]))
+
+    cached = _principal_cache.get(key)
+    if cached is None or cached[0] < time.monotonic():
+        current = await _load_fingerprint(db, *key)
+        if current is None:
+            _principal_cache.pop(key, None)
+            raise HTTPException(status_code=401, detail="Пользователь не найден")
+        cached = (time.monotonic() + PRINCIPAL_CACHE_TTL, current)
+        if PRINCIPAL_CACHE_TTL > 0:
+            _principal_cache[key] = cached
+
+    if not hmac.compare_digest(cached[1], payload["pwd"]):
+        raise HTTPException(status_code=401, detail="Пароль изменён, войдите заново")
+
+    return Principal(id=key[1], role=key[0])
+
+
+@router.post("/auth/refresh", response_model=TokenResponse)
+async def refresh(data: RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    """Выдаёт новую пару токенов по refresh-токену; старый refresh-токен отзывается"""
+    payload = _decode(data.refresh_token, "refresh")
+    user_id = int(payload["sub"])
+    role = payload["role"]
+
+    # Пароль не проверяем (bcrypt не нужен), но пользователь должен существовать с тем же паролем
+    current = await _load_fingerprint(db, role, user_id)
+    if current is None:
+        raise HTTPException(status_code=401, detail="Пользователь не найден")
+    if not hmac.compare_digest(current, payload["pwd"]):
+        raise HTTPException(status_code=401, detail="Пароль изменён, войдите заново")
+
+    await revoke_token(db, payload["jti"], payload["exp"])
+    return create_token_pair(user_id, role, current)
+
+
+@router.post("/auth/logout", response_model=MessageResponse)
+async def logout(data: Optional[LogoutRequest] = None, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """Отзывает текущий access-токен и, если передан, refresh-токен"""
+    payload = _decode(token, "access")
+    await revoke_token(db, payload["jti"], payload["exp"])
+    if data is not None and data.refresh_token:
+        refresh_payload = _decode(data.refresh_token, "refresh")
+        await revoke_token(db, refresh_payload["jti"], refresh_payload["exp"])
+    return {"message": "Выход выполнен"}
@@ -0,0 +1,134 @@
+from collections import defaultdict
+from typing import Iterable, Optional, Tuple
+from sqlalchemy import bindparam, case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import UserDB, PredmetDB, OcenkaDB, SessionLocal, open_engines
+import group_stats
+import argparse
+import sys
+
+# Средние баллы предмета и студента не пересчитываются при чтении:
+# вместе с каждой оценкой в той же транзакции меняются сумма и число оценок,
+# а srbal = сумма / число. Оценки без числового значения (NULL) не учитываются.
+# Если данные всё же разошлись (правка базы руками, старый код), поможет
+#   python averages.py         - показать расхождения (заодно и в сводке групп group_stats)
+#   python averages.py --fix   - пересчитать с нуля и исправить
+
+
+def summarize(marks: Iterable[Optional[int]]) -> dict:
+    """Поля агрегатов для новой записи по списку её оценок"""
+    marks = [mark for mark in marks if mark is not None]
+    total = sum(marks)
+    return {"ocenki_sum": total, "ocenki_count": len(marks), "srbal": total / len(marks) if marks else None}
+
+
+def mark_delta(mark: Optional[int]) -> Tuple[int, int]:
+    """(сумма, число) для одной оценки; отметка без числа в средние не входит"""
+    return (mark, 1) if mark is not None else (0, 0)
+
+
+async def add_to_averages(db: AsyncSession, user_id: int, predmet_id: int, total: int, count: int):
+    """Прибавляет к агрегатам предмета и студента сумму total и count оценок (могут быть < 0).
+    Считает сама база, поэтому параллельные изменения не теряются; commit делает вызывающий"""
+    await add_many_to_averages(db, [(user_id, predmet_id, total, count)])
+
+
+async def add_many_to_averages(db: AsyncSession, deltas: Iterable[Tuple[int, int, int, int]]):
+    """То же для многих оценок сразу: deltas - (user_id, predmet_id, total, count).
+    Поправки суммируются по предметам и студентам, на таблицу уходит один executemany UPDATE"""
+    by_model = {PredmetDB: defaultdict(lambda: [0, 0]), UserDB: defaultdict(lambda: [0, 0])}
+    for user_id, predmet_id, total, count in deltas:
+        for model, key in ((PredmetDB, predmet_id), (UserDB, user_id)):
+            by_model[model][key][0] += total
+            by_model[model][key][1] += count
+
+    for model, sums in by_model.items():
+        params = [{"key": key, "d_total": total, "d_count": count} for key, (total, count) in sums.items() if total or count]
+        if not params:
+            continue
+        table = model.__table__
+        new_total = table.c.ocenki_sum + bindparam("d_total")
+        new_count = table.c.ocenki_count + bindparam("d_count")
+        await db.execute(
+            update(table)
+            .where(table.c.id == bindparam("key"))
+            .values(
+                ocenki_sum=new_total,
+                ocenki_count=new_count,
+                srbal=case((new_count > 0, new_total * 1.0 / new_count), else_=None),
+            ),
+            params,
+        )
+
+
+def _drift(model, actual) -> list:
+    """Записи model, у которых сохранённые агрегаты не совпадают с посчитанными заново"""
+    total = func.coalesce(actual.c.total, 0)
+    count = func.coalesce(actual.c.count, 0)
+    query = (
+        select(model.id, model.ocenki_sum, model.ocenki_count, model.srbal, total, count)
+        .outerjoin(actual, actual.c.id == model.id)
+        .order_by(model.id)
+    )
+    rows = []
+    with SessionLocal() as db:
+        for row_id, stored_total, stored_count, srbal, real_total, real_count in db.execute(query):
+            real_srbal = real_total / real_count if real_count else None
+            srbal_ok = (srbal is None) == (real_srbal is None) and (
+                real_srbal is None or abs(srbal - real_srbal) < 1e-9
+            )
+            if stored_total != real_total or stored_count != real_count or not srbal_ok:
+                rows.append({
+                    "id": row_id, "ocenki_sum": real_total, "ocenki_count": real_count, "srbal": real_srbal,
+                    "stored": (stored_total, stored_count, srbal),
+                })
+    return rows
+
+
+def check(fix: bool = False) -> int:
+    """Пересчитывает агрегаты из таблицы оценок, печатает расхождения; возвращает их число"""
+    by_predmet = (
+        select(OcenkaDB.predmet_id.label("id"), func.sum(OcenkaDB.ocenka).label("total"),
+               func.count(OcenkaDB.ocenka).label("count"))
+        .group_by(OcenkaDB.predmet_id)
+        .subquery()
+    )
+    by_user = (
+        select(PredmetDB.user_id.label("id"), func.sum(OcenkaDB.ocenka).label("total"),
+               func.count(OcenkaDB.ocenka).label("count"))
+        .join(OcenkaDB, OcenkaDB.predmet_id == PredmetDB.id)
+        .group_by(PredmetDB.user_id)
+        .subquery()
+    )
+
+    found = 0
+    for model, actual, title in ((PredmetDB, by_predmet, "predmeti"), (UserDB, by_user, "users")):
+        rows = _drift(model, actual)
+        found += len(rows)
+        for row in rows:
+            stored_total, stored_count, srbal = row.pop("stored")
+            print(
+                f"{title} id={row['id']}: сохранено сумма={stored_total} число={stored_count} srbal={srbal}, "
+                f"по оценкам сумма={row['ocenki_sum']} число={row['ocenki_count']} srbal={row['srbal']}"
+            )
+        if fix and rows:
+            with SessionLocal() as db:
+                db.execute(update(model), rows)  # пакетный UPDATE по первичному ключу
+                db.commit()
+    return found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проверка средних баллов и сводки оценок групп")
+    parser.add_argument("--fix", action="store_true", help="исправить найденные расхождения")
+    args = parser.parse_args()
+
+    open_engines()
+    found = check(fix=args.fix) + group_stats.check(fix=args.fix)
+    if not found:
+        print("Расхождений нет")
+    elif args.fix:
+        print(f"Исправлено записей: {found}")
+    else:
+        print(f"Найдено расхождений: {found}, запустите с --fix")
+    sys.exit(1 if found and not args.fix else 0)
@@ -1,26 +1,237 @@
 from fastapi import UploadFile, File
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
 from fastapi import HTTPException, APIRouter, Depends
+from starlette.background import BackgroundTask
+from settings import ASYNC_DATABASE_URL, BACKUP_TIMEOUT, BACKUP_COMPRESSLEVEL
+from sqlalchemy.engine import make_url
+from db import dispose_engines, migration_head
+from schedule_cache import publish_clear as clear_schedule_cache
+from auth import clear_principal_cache
+import asyncio
+import datetime
 import os
-import shutil
+import sqlite3
+import tempfile
+import threading
+import zlib
+
+try:
+    import fcntl  # Блокировка между воркерами (на Windows её нет)
+except ImportError:
+    fcntl = None
 
 router = APIRouter()
 
+# Путь к файлу базы берём из URL в настройках, а не хардкодим
+DB_PATH = make_url(ASYNC_DATABASE_URL).database
+# Размер куска при передаче файла
+BACKUP_CHUNK_SIZE = 1024 * 1024
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Копирование и восстановление не должны идти одновременно
+backup_lock = asyncio.Lock()
+
+# Каждый воркер держит разделяемую блокировку на этом файле, пока работает:
+# восстановление проверяет, что других воркеров нет (их пулы держат старый файл базы)
+WORKERS_LOCK_PATH = DB_PATH + ".workers"
+_workers_file = None
+
+
+def temp_path(suffix: str) -> str:
+    # Временный файл рядом с базой: os.replace атомарен только в пределах одной ФС
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=os.path.dirname(os.path.abspath(DB_PATH)))
+    os.close(fd)
+    return path
+
+
+def remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def snapshot(target: str):
+    """Согласованная копия живой базы через VACUUM INTO.
+    Копия читается в одной транзакции чтения, поэтому запись в базу её не перезапускает
+    (в отличие от backup API по частям). Дольше BACKUP_TIMEOUT копия не идёт:
+    соединение прерывается, и вызывающий получает sqlite3.OperationalError"""
+    source = sqlite3.connect(DB_PATH)
+    timer = threading.Timer(BACKUP_TIMEOUT, source.interrupt)
+    timer.start()
+    try:
+        # target уже создан temp_path и пуст - VACUUM INTO это допускает
+        source.execute("VACUUM INTO ?", (target,))
+    finally:
+        timer.cancel()
+        source.close()
+
+
+async def snapshot_locked(target: str):
+    """snapshot под backup_lock; по тайм-ауту отвечаем 504, блокировка при этом снята"""
+    async with backup_lock:
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, snapshot, target)
+        except sqlite3.OperationalError as e:
+            if "interrupted" in str(e):
+                raise HTTPException(status_code=504, detail=f"Копия базы не уложилась в {BACKUP_TIMEOUT:g} с")
+            raise
+
+
+def register_worker():
+    """Вызывается при старте воркера (lifespan): отмечаемся разделяемой блокировкой"""
+    global _workers_file
+    if fcntl is None or _workers_file is not None:
+        return
+    _workers_file = open(WORKERS_LOCK_PATH, "a")
+    fcntl.flock(_workers_file, fcntl.LOCK_SH)
+
+
+def unregister_worker():
+    global _workers_file
+    if _workers_file is not None:
+        _workers_file.close()
+        _workers_file = None
+
+
+def _is_single_worker() -> bool:
+    """Удалось ли взять исключительную блокировку: других воркеров нет.
+    Без fcntl (Windows) проверить нельзя, такой сервер запускают одним процессом"""
+    if fcntl is None or _workers_file is None:
+        return True
+    try:
+        fcntl.flock(_workers_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def _release_single_worker():
+    if fcntl is not None and _workers_file is not None:
+        fcntl.flock(_workers_file, fcntl.LOCK_SH)
+
+
+def file_chunks(path: str, size: int = BACKUP_CHUNK_SIZE):
+    with open(path, "rb") as f:
+        while chunk := f.read(size):
+            yield chunk
+
+
+def gzip_stream(chunks):
+    """Сжимает поток кусков в gzip на лету"""
+    compressor = zlib.compressobj(BACKUP_COMPRESSLEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def gzip_chunks(path: str):
+    """Отдаёт файл кусками, сжимая его в gzip на лету"""
+    return gzip_stream(file_chunks(path))
+
+
+def _integrity_error(path: str):
+    """None, если файл - целая база SQLite с нашими таблицами и схемой текущей версии, иначе текст ошибки"""
+    try:
+        connection = sqlite3.connect(path)
+        try:
+            # Копия могла быть снята с базы в режиме WAL: переводим её в обычный журнал,
+            # чтобы рядом с временным файлом не оставались -wal/-shm
+            connection.execute("PRAGMA journal_mode=DELETE")
+            result = connection.execute("PRAGMA integrity_check").fetchone()[0]
+            if result != "ok":
+                return f"База повреждена: {result}"
+            tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            versions = (
+                [row[0] for row in connection.execute("SELECT version_num FROM alembic_version")]
+                if "alembic_version" in tables else []
+            )
+        finally:
+            connection.close()
+    except sqlite3.DatabaseError as e:
+        return f"Файл не является базой SQLite: {e}"
+    if not {"users", "teachers", "lessons"} <= tables:
+        return "В файле нет таблиц приложения"
+    # Код работает только со схемой последней миграции: старую копию сначала
+    # нужно обновить (alembic upgrade head), новую - восстановить вместе с её кодом
+    head = migration_head()
+    if versions != [head]:
+        found = ", ".join(versions) or "нет"
+        return f"Версия схемы в копии ({found}) не совпадает с текущей ({head})"
+    return None
+
+
 @router.get("/backup/")
 async def get_backup():
-    file_path = "kkts.db"  
-    if os.path.exists(file_path):
-        return FileResponse(file_path, media_type='application/octet-stream', filename='kkts.db')
-    else:
+    if not os.path.exists(DB_PATH):
         return {"error": "Файл не найден"}
 
+    path = temp_path(".db")
+    try:
+        await snapshot_locked(path)
+    except Exception:
+        remove_file(path)
+        raise
+
+    # Синхронный генератор Starlette читает в пуле потоков, event loop не блокируется
+    filename = f"kkts_{datetime.datetime.now():%Y%m%d_%H%M%S}.db.gz"
+    return StreamingResponse(
+        gzip_chunks(path),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        background=BackgroundTask(remove_file, path),
+    )
+
 
 @router.post("/restore/")
 async def restore_backup(file: UploadFile = File(...)):
-    file_location = "kkts.db"  # Путь для сохранения файла на сервере
+    loop = asyncio.get_running_loop()
+    path = temp_path(".restore")
+    try:
+        # Принимаем файл кусками во временный файл; gzip распаковываем на лету
+        first = await file.read(BACKUP_CHUNK_SIZE)
+        decompressor = zlib.decompressobj(31) if first.startswith(GZIP_MAGIC) else None
+        with open(path, "wb") as f:
+            chunk = first
+            while chunk:
+                if decompressor is not None:
+                    try:
+                        chunk = decompressor.decompress(chunk)
+                    except zlib.error:
+                        raise HTTPException(status_code=400, detail="Архив повреждён")
+                await loop.run_in_executor(None, f.write, chunk)
+                chunk = await file.read(BACKUP_CHUNK_SIZE)
+        if decompressor is not None and not decompressor.eof:
+            raise HTTPException(status_code=400, detail="Архив обрезан")
+
+        error = await loop.run_in_executor(None, _integrity_error, path)
+        if error:
+            raise HTTPException(status_code=400, detail=error)
 
-    # Сохраняем файл на сервере
-    with open(file_location, "wb") as f:
-        shutil.copyfileobj(file.file, f)
+        async with backup_lock:
+            # dispose закрывает пулы только этого процесса: пулы других воркеров
+            # продолжили бы писать в старый файл, поэтому заменяем базу, только
+            # когда воркер один (режим обслуживания: uvicorn без --workers)
+            if not _is_single_worker():
+                raise HTTPException(
+                    status_code=409,
+                    detail="Восстановление возможно только при одном запущенном воркере",
+                )
+            try:
+                await dispose_engines()
+                os.replace(path, DB_PATH)
+                # Журналы относятся к старой базе
+                for suffix in ("-wal", "-shm", "-journal"):
+                    remove_file(DB_PATH + suffix)
+            finally:
+                _release_single_worker()
+    finally:
+        remove_file(path)
 
-    return {"message": "База данных восстановлена"}
\ No newline at end of file
+    # Кэши построены по старым данным
+    await clear_schedule_cache()
+    clear_principal_cache()
+    return {"message": "База данных восстановлена"}
@@ -0,0 +1,73 @@
+"""Загрузка 5000 пар: по одной через POST /lesson/{id}/session/ против одной массовой загрузки.
+
+    python bench/bulk_import.py [--sessions 5000] [--days 5] [--tree КАТАЛОГ]
+
+Каждый способ запускается на новой базе. Время - от первого запроса до последнего ответа.
+"""
+import csv
+import io
+import time
+
+import httpx
+
+import common
+
+
+def rows(count: int, days: int):
+    return [
+        {
+            "name": f"Пара {number}", "group": f"ГР-{number % 25}", "teacher": f"Учитель {number % 40}",
+            "start": "09:00", "end": "10:30", "clases": str(100 + number % 60), "adress": "Корпус 1",
+            "color": "#00ccff", "date": f"2025-09-{number % days + 1:02d}",
+        }
+        for number in range(count)
+    ]
+
+
+def per_row(client: httpx.Client, data):
+    days = {}
+    for row in data:
+        if row["date"] not in days:
+            lesson = client.post("/lesson/", json={"date": row["date"]}).json()
+            days[row["date"]] = next(value["id"] for value in lesson.values() if isinstance(value, dict))
+        body = {key: value for key, value in row.items() if key != "date"}
+        client.post(f"/lesson/{days[row['date']]}/session/", json=body).raise_for_status()
+    return len(data)
+
+
+def bulk_json(client: httpx.Client, data):
+    response = client.post("/lesson/sessions/bulk/", json=data)
+    response.raise_for_status()
+    return response.json()["inserted"]
+
+
+def bulk_csv(client: httpx.Client, data):
+    text = io.StringIO()
+    writer = csv.DictWriter(text, fieldnames=list(data[0]))
+    writer.writeheader()
+    writer.writerows(data)
+    response = client.post(
+        "/lesson/sessions/bulk/csv/", files={"file": ("schedule.csv", text.getvalue().encode(), "text/csv")}
+    )
+    response.raise_for_status()
+    return response.json()["inserted"]
+
+
+def main():
+    parser = common.parser(__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=5)
+    args = parser.parse_args()
+
+    data = rows(args.sessions, args.days)
+    for title, method in (("по одной", per_row), ("массово, JSON", bulk_json), ("массово, CSV", bulk_csv)):
+        with common.serve(args.tree) as (url, _):
+            with httpx.Client(base_url=url, timeout=600) as client:
+                started = time.perf_counter()
+                inserted = method(client, data)
+                elapsed = time.perf_counter() - started
+        print(f"{title:14} {inserted} пар за {elapsed:.2f} с ({inserted / elapsed:.0f} пар в секунду)")
+
+
+if __name__ == "__main__":
+    main()
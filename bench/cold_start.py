@@ -0,0 +1,50 @@
+"""Холодный старт: время от запуска uvicorn до первого ответа на GET /.
+
+    python bench/cold_start.py [--runs 5] [--tree КАТАЛОГ]
+
+Меряются запуск на пустом каталоге (схема создаётся с нуля), перезапуск на
+готовой базе с AUTO_MIGRATE=True и без него, а также время import main.
+Печатаются медианы по --runs запускам.
+"""
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import common
+
+IMPORT_MAIN = "import sys, time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+
+
+def import_time(tree: str, workdir: str) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_MAIN], cwd=workdir, env=common.server_env(workdir, PYTHONPATH=tree),
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = common.parser(__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = {"новая база": [], "перезапуск": [], "перезапуск, AUTO_MIGRATE=False": [], "import main": []}
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory(prefix="kkts-bench-") as workdir:
+            for title, env in (
+                ("новая база", {}),
+                ("перезапуск", {}),
+                ("перезапуск, AUTO_MIGRATE=False", {"AUTO_MIGRATE": "False"}),
+            ):
+                process, _, seconds = common.start(args.tree, workdir, **env)
+                common.stop(process)
+                results[title].append(seconds)
+            results["import main"].append(import_time(args.tree, workdir))
+
+    for title, values in results.items():
+        print(f"{title:32} медиана {statistics.median(values) * 1000:6.0f} мс (от {min(values) * 1000:.0f} до {max(values) * 1000:.0f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import httpx
+
+# Общие помощники бенчмарков: запуск приложения в отдельном процессе uvicorn
+# на временной базе и нагрузка из множества соединений.
+# Чтобы сравнить с прежней версией, выгрузите её рядом и передайте --tree:
+#   git worktree add /tmp/kkts-before <коммит>
+#   python bench/<скрипт>.py --tree /tmp/kkts-before
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parser(description: str) -> argparse.ArgumentParser:
+    result = argparse.ArgumentParser(description=description)
+    result.add_argument("--tree", default=ROOT, help="каталог с версией приложения (по умолчанию текущая)")
+    return result
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def server_env(workdir: str, **overrides) -> dict:
+    """Окружение процесса приложения: временная база и без фоновых задач"""
+    db_path = os.path.join(workdir, "kkts.db")
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "ASYNC_DATABASE_URL": f"sqlite+aiosqlite:///{db_path}",
+        "AUTO_MIGRATE": "True",
+        "BACKUP_INTERVAL": "0",
+        "BACKUP_DIR": os.path.join(workdir, "backups"),
+        "NOTIFY_BUS_PATH": os.path.join(workdir, "kkts_bus.db"),
+    })
+    env.update({key: str(value) for key, value in overrides.items()})
+    return env
+
+
+def wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    """Ждёт первого ответа на GET /"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Приложение завершилось с кодом {process.returncode}")
+        try:
+            if httpx.get(url + "/", timeout=1.0).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.005)
+    raise RuntimeError(f"Приложение не ответило за {timeout} с")
+
+
+def start(tree: str, workdir: str, **env):
+    """Запускает uvicorn с приложением из tree; возвращает (процесс, адрес, секунды до первого ответа)"""
+    port = _free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", tree,
+         "--port", str(port), "--log-level", "warning", "--timeout-keep-alive", "120"],
+        # Старые версии держат базу по относительному пути ./kkts.db
+        cwd=workdir, env=server_env(workdir, **env),
+        stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_up(url, process)
+    except Exception:
+        stop(process)
+        raise
+    return process, url, time.perf_counter() - started
+
+
+def stop(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(30)
+    except subprocess.TimeoutExpired:
+        # Зависшие запросы не дают uvicorn завершиться штатно
+        process.kill()
+        process.wait()
+
+
+@contextmanager
+def serve(tree: str, workdir: str = None, **env):
+    """Запускает uvicorn с приложением из tree; отдаёт (адрес, каталог с базой)"""
+    with tempfile.TemporaryDirectory(prefix="kkts-bench-") as tmp:
+        workdir = workdir or tmp
+        process, url, _ = start(tree, workdir, **env)
+        try:
+            yield url, workdir
+        finally:
+            stop(process)
+
+
+def student(number: int, group: str = "БЕНЧ-1", password: str = "password") -> dict:
+    """Студент, которого принимают и текущая, и прежние версии POST /students/"""
+    return {
+        "name": f"Студент {number}", "fullname": f"Студент Бенчмарк {number}", "role": "student",
+        "login": f"bench{number}", "password": password, "gmail": f"bench{number}@example.com",
+        "vk": f"vk.com/bench{number}", "group": group, "srbal": "0", "ocenki": [],
+    }
+
+
+# Студентов в группе при заполнении базы напрямую
+GROUP_SIZE = 40
+# Хэш пароля не проверяется: этих студентов не логинят
+PASSWORD_HASH = "$2b$12$" + "x" * 53
+
+
+def seed_students(db_path: str, rows: int):
+    """Вставляет студентов напрямую в базу запущенного приложения (id с 1, группы ГР-0, ГР-1, ...)"""
+    connection = sqlite3.connect(db_path)
+    with connection:
+        connection.executemany(
+            'INSERT INTO users (name, fullname, role, login, password, gmail, vk, "group") '
+            "VALUES (?, ?, 'student', ?, ?, ?, ?, ?)",
+            (
+                (f"Студент {n}", f"Студент Бенчмарк {n}", f"bench{n}", PASSWORD_HASH,
+                 f"bench{n}@example.com", f"vk.com/bench{n}", f"ГР-{n // GROUP_SIZE}")
+                for n in range(rows)
+            ),
+        )
+    connection.close()
+
+
+def percentile(values, share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def summary(latencies, elapsed: float) -> str:
+    if not latencies:
+        return "ни одного ответа"
+    milliseconds = [value * 1000 for value in latencies]
+    return (
+        f"запросов {len(latencies)}, {len(latencies) / elapsed:.0f} в секунду, "
+        f"p50 {statistics.median(milliseconds):.1f} мс, p99 {percentile(milliseconds, 0.99):.1f} мс"
+    )
+
+
+class Connection:
+    """Одно keep-alive соединение HTTP/1.1. Пул httpx сам становится узким местом
+    при сотнях соединений, поэтому нагрузку даём напрямую через asyncio"""
+
+    def __init__(self, url: str):
+        self.host, self.port = url.rsplit("/", 1)[-1].split(":")
+        self._reader = self._writer = None
+
+    async def request(self, method: str, path: str, json_body=None, headers: dict = None):
+        """Отправляет запрос, возвращает (код ответа, тело)"""
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, int(self.port))
+        body = json.dumps(json_body).encode() if json_body is not None else b""
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}", f"Content-Length: {len(body)}"]
+        if json_body is not None:
+            lines.append("Content-Type: application/json")
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        self._writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        head = (await self._reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        length = next(int(line.split(":", 1)[1]) for line in head if line.lower().startswith("content-length:"))
+        status, body = int(head[0].split()[1]), await self._reader.readexactly(length)
+        if "connection: close" in (line.lower() for line in head):
+            # После ошибки uvicorn закрывает соединение: следующий запрос откроет новое
+            await self.close()
+        return status, body
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._reader = self._writer = None
+
+
+async def load(url: str, clients: int, requests: int, make_request, timeout: float = None):
+    """clients параллельных клиентов (у каждого своё соединение) по requests запросов;
+    make_request(connection, number) -> (код, тело). Возвращает задержки (секунды),
+    коды ответов и общее время. Клиент, не дождавшийся ответа за timeout секунд,
+    записывается как "timeout" и прекращает работу"""
+    latencies, statuses = [], {}
+    connections = [Connection(url) for _ in range(clients)]
+
+    async def worker(index: int):
+        for step in range(requests):
+            started = time.perf_counter()
+            try:
+                status, _ = await asyncio.wait_for(make_request(connections[index], index * requests + step), timeout)
+            except asyncio.TimeoutError:
+                statuses["timeout"] = statuses.get("timeout", 0) + 1
+                return
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker(index) for index in range(clients)))
+        return latencies, statuses, time.perf_counter() - started
+    finally:
+        await asyncio.gather(*(connection.close() for connection in connections))
@@ -0,0 +1,40 @@
+"""Задержка чтения при 200 одновременных клиентах (GET /students/{id}/).
+
+    python bench/concurrent_reads.py [--clients 200] [--requests 20] [--tree КАТАЛОГ]
+
+Для сравнения с синхронной сессией (до перехода на AsyncSession) передайте
+в --tree выгрузку коммита до него (см. bench/common.py).
+"""
+import asyncio
+
+import httpx
+
+import common
+
+
+def main():
+    parser = common.parser(__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=20, help="запросов на клиента")
+    parser.add_argument("--timeout", type=float, default=60, help="сколько секунд ждать один ответ")
+    args = parser.parse_args()
+
+    with common.serve(args.tree) as (url, _):
+        httpx.post(url + "/students/", json=common.student(1), timeout=30).raise_for_status()
+        student_id = 1  # база новая; прежние версии не возвращали id в ответе
+
+        async def read(connection, _):
+            return await connection.request("GET", f"/students/{student_id}/")
+
+        latencies, statuses, elapsed = asyncio.run(load_twice(url, args, read))
+    print(f"{args.clients} клиентов: {common.summary(latencies, elapsed)}, ответы {statuses}")
+
+
+async def load_twice(url, args, read):
+    # Первый прогон прогревает пул соединений и импорт ленивых модулей
+    await common.load(url, args.clients, 1, read, args.timeout)
+    return await common.load(url, args.clients, args.requests, read, args.timeout)
+
+
+if __name__ == "__main__":
+    main()
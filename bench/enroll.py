@@ -0,0 +1,83 @@
+"""Зачисление набора из 500 студентов с предметами и оценками.
+
+    python bench/enroll.py [--students 500] [--subjects 8] [--marks 5] [--tree КАТАЛОГ]
+
+Сравнивает 500 запросов POST /students/ с одним POST /students/batch/ (если он есть),
+каждый способ на новой базе. Большую часть времени занимает bcrypt (по хэшу на
+студента), поэтому рядом печатается его оценка на этой машине; разница с общим
+временем - запись в базу.
+"""
+import time
+
+import bcrypt
+import httpx
+
+import common
+
+
+def intake(students: int, subjects: int, marks: int):
+    # srbal и строковые оценки нужны старым версиям, текущая лишние поля игнорирует
+    return [
+        common.student(number, group=f"ГР-{number // 25}") | {
+            "ocenki": [
+                {
+                    "color": "#ffcc00", "predmet": f"Предмет {subject}", "attes": "экзамен", "srbal": 0,
+                    "ocenki": [
+                        {"name": "Контрольная", "data": f"2025-09-{mark + 1:02d}", "ocenka": str(mark % 5 + 1)}
+                        for mark in range(marks)
+                    ],
+                }
+                for subject in range(subjects)
+            ],
+        }
+        for number in range(1, students + 1)
+    ]
+
+
+def one_by_one(client: httpx.Client, items):
+    for item in items:
+        client.post("/students/", json=item).raise_for_status()
+    return True
+
+
+def batch(client: httpx.Client, items):
+    response = client.post("/students/batch/", json=items)
+    if response.status_code in (404, 405):
+        return False
+    response.raise_for_status()
+    return True
+
+
+def bcrypt_estimate(passwords: int, samples: int = 10) -> float:
+    started = time.perf_counter()
+    for _ in range(samples):
+        bcrypt.hashpw(b"password", bcrypt.gensalt())
+    return (time.perf_counter() - started) / samples * passwords
+
+
+def main():
+    parser = common.parser(__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--subjects", type=int, default=8)
+    parser.add_argument("--marks", type=int, default=5)
+    args = parser.parse_args()
+
+    items = intake(args.students, args.subjects, args.marks)
+    for title, method in (("по одному", one_by_one), ("пачкой", batch)):
+        hashing = bcrypt_estimate(args.students)
+        with common.serve(args.tree) as (url, _):
+            with httpx.Client(base_url=url, timeout=3600) as client:
+                started = time.perf_counter()
+                supported = method(client, items)
+                elapsed = time.perf_counter() - started
+        if not supported:
+            print(f"{title}: в этой версии нет POST /students/batch/")
+            continue
+        print(
+            f"{title:10} {args.students} студентов ({args.subjects} предметов по {args.marks} оценок) "
+            f"за {elapsed:.1f} с; bcrypt для {args.students} паролей в один поток - около {hashing:.1f} с"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Рассылка изменений расписания при 5000 подключённых по WebSocket клиентах.
+
+    python bench/fanout.py [--clients 5000] [--tree КАТАЛОГ]
+
+Студенты (по 40 в группе) вставляются в базу напрямую и подключаются к /ws/{id}.
+Сценарии:
+  одна группа - POST /lesson/{id}/session/ для ГР-0: сколько ждёт последний студент
+                группы и сколько клиентов получили хоть что-то;
+  вся школа   - одна пара на каждую группу через /lesson/sessions/bulk/
+                (если эндпоинт есть): сколько ждёт последний из всех клиентов.
+Окно объединения NOTIFY_DEBOUNCE выставляется в 0, чтобы мерить саму рассылку.
+"""
+import asyncio
+import time
+
+import httpx
+from websockets.asyncio.client import connect
+
+import common
+
+CONNECT_BATCH = 200
+WAIT = 60.0
+
+
+class Client:
+    def __init__(self, user_id: int, group: str):
+        self.user_id = user_id
+        self.group = group
+        self.received = []  # моменты прихода сообщений
+
+    async def run(self, url: str, ready: asyncio.Semaphore):
+        async with ready:
+            websocket = await connect(f"ws://{url.split('//', 1)[1]}/ws/{self.user_id}", ping_interval=None)
+            await websocket.recv()  # приветствие
+        self.websocket = websocket
+        async for _ in websocket:
+            self.received.append(time.perf_counter())
+
+
+async def wait_for(clients, started: float, timeout: float = WAIT):
+    """Ждёт, пока каждый из clients получит сообщение после started; возвращает время последнего"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        arrivals = [next((t for t in client.received if t >= started), None) for client in clients]
+        if all(arrivals):
+            return max(arrivals) - started
+        await asyncio.sleep(0.01)
+    return None
+
+
+def received_since(clients, started: float) -> str:
+    arrivals = [[t for t in client.received if t >= started] for client in clients]
+    reached = [times for times in arrivals if times]
+    if not reached:
+        return "сообщений не было"
+    last = max(max(times) for times in reached) - started
+    return (
+        f"сообщения получили {len(reached)} клиентов, всего {sum(map(len, reached))}, "
+        f"последнее через {last * 1000:.0f} мс"
+    )
+
+
+def session(group: str, **fields):
+    return {
+        "name": "Бенчмарк", "group": group, "teacher": "Бенч Б.Б.", "start": "09:00", "end": "10:30",
+        "clases": "101", "adress": "Корпус 1", "color": "#00ccff", **fields,
+    }
+
+
+async def scenarios(url: str, count: int):
+    clients = [Client(n + 1, f"ГР-{n // common.GROUP_SIZE}") for n in range(count)]
+    ready = asyncio.Semaphore(CONNECT_BATCH)
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(client.run(url, ready)) for client in clients]
+    while sum(1 for client in clients if hasattr(client, "websocket")) < count:
+        failed = next((task for task in tasks if task.done()), None)
+        if failed is not None:
+            failed.result()  # ошибка подключения
+        await asyncio.sleep(0.1)
+    print(f"подключено {count} клиентов за {time.perf_counter() - started:.1f} с")
+
+    async with httpx.AsyncClient(base_url=url, timeout=600) as http:
+        lesson = (await http.post("/lesson/", json={"date": "2025-09-01"})).json()
+        lesson_id = next(value["id"] for value in lesson.values() if isinstance(value, dict))
+
+        members = [client for client in clients if client.group == "ГР-0"]
+        started = time.perf_counter()
+        response = await http.post(f"/lesson/{lesson_id}/session/", json=session("ГР-0"))
+        answered = time.perf_counter() - started
+        last = await wait_for(members, started)
+        await asyncio.sleep(1)  # лишние сообщения другим клиентам успеют прийти
+        print(
+            f"одна группа: ответ на POST {answered * 1000:.0f} мс (код {response.status_code}), "
+            f"последний из {len(members)} студентов группы через "
+            f"{'-' if last is None else f'{last * 1000:.0f} мс'}; {received_since(clients, started)}"
+        )
+
+        groups = sorted({client.group for client in clients})
+        started = time.perf_counter()
+        response = await http.post(
+            "/lesson/sessions/bulk/", json=[session(group, date="2025-09-02") for group in groups]
+        )
+        if response.status_code in (404, 405):
+            print("вся школа: в этой версии нет /lesson/sessions/bulk/")
+        else:
+            answered = time.perf_counter() - started
+            last = await wait_for(clients, started)
+            print(
+                f"вся школа ({len(groups)} групп): ответ на POST {answered * 1000:.0f} мс, последний из "
+                f"{count} клиентов через {'-' if last is None else f'{last * 1000:.0f} мс'}; "
+                f"{received_since(clients, started)}"
+            )
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def main():
+    parser = common.parser(__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=5000)
+    args = parser.parse_args()
+
+    with common.serve(args.tree, NOTIFY_DEBOUNCE=0) as (url, workdir):
+        common.seed_students(f"{workdir}/kkts.db", args.clients)
+        asyncio.run(scenarios(url, args.clients))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Список студентов на 10 000 и 100 000 записей (GET /students/).
+
+    python bench/listing.py [--rows 10000 100000] [--limit 100] [--tree КАТАЛОГ]
+
+Студенты вставляются напрямую в базу запущенного приложения (по 40 в группе).
+Меряется первая страница, страница в конце списка, фильтр по группе и полный
+обход по next_cursor. Версия без пагинации отдаёт весь список первым же ответом
+(для неё удобно уменьшить --repeat).
+"""
+import statistics
+import time
+
+import httpx
+
+import common
+
+
+def timed(client: httpx.Client, path: str, repeat: int) -> str:
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(path)
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+    milliseconds = [value * 1000 for value in latencies]
+    return (
+        f"p50 {statistics.median(milliseconds):.1f} мс, p99 {common.percentile(milliseconds, 0.99):.1f} мс, "
+        f"{len(response.content) / 1024:.0f} КиБ"
+    )
+
+
+def traverse(client: httpx.Client, limit: int) -> str:
+    started = time.perf_counter()
+    pages, size, received, cursor = 0, 0, 0, None
+    while True:
+        params = {"limit": limit} if cursor is None else {"limit": limit, "cursor": cursor}
+        response = client.get("/students/", params=params)
+        response.raise_for_status()
+        body = response.json()
+        pages += 1
+        size += len(response.content)
+        received += len(body["users"])
+        cursor = body.get("next_cursor")
+        if cursor is None:
+            break
+    return (
+        f"{received} студентов за {pages} запросов, {time.perf_counter() - started:.2f} с, "
+        f"{size / 1024 / 1024:.1f} МиБ"
+    )
+
+
+def main():
+    parser = common.parser(__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=30, help="повторов каждого запроса")
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        with common.serve(args.tree) as (url, workdir):
+            common.seed_students(f"{workdir}/kkts.db", rows)
+            with httpx.Client(base_url=url, timeout=600) as client:
+                print(f"{rows} студентов:")
+                print(f"  первая страница:     {timed(client, f'/students/?limit={args.limit}', args.repeat)}")
+                print(f"  страница в конце:    {timed(client, f'/students/?limit={args.limit}&cursor={rows - args.limit}', args.repeat)}")
+                print(f"  одна группа:         {timed(client, f'/students/?group=ГР-{rows // common.GROUP_SIZE // 2}', args.repeat)}")
+                print(f"  обход всего списка:  {traverse(client, args.limit)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Утренний наплыв входов: пропускная способность POST /auth/login по числу потоков bcrypt.
+
+    python bench/login_storm.py [--users 100] [--clients 100] [--workers 1 2 4] [--tree КАТАЛОГ]
+
+Для каждого значения HASH_WORKERS приложение запускается заново; пока идут входы,
+отдельный клиент читает GET /lesson/ и показывает, сколько ждут остальные запросы.
+Прирост от потоков ограничен числом ядер (os.cpu_count()).
+"""
+import asyncio
+import os
+import time
+
+import httpx
+
+import common
+
+
+async def storm(url: str, clients: int, users: int):
+    stop = asyncio.Event()
+    reads = []
+
+    async def reader():
+        connection = common.Connection(url)
+        try:
+            while not stop.is_set():
+                started = time.perf_counter()
+                await connection.request("GET", "/lesson/")
+                reads.append(time.perf_counter() - started)
+                await asyncio.sleep(0.05)
+        finally:
+            await connection.close()
+
+    async def login(connection, number):
+        credentials = common.student(number % users + 1)
+        return await connection.request(
+            "POST", "/auth/login", {"login": credentials["login"], "password": credentials["password"]}
+        )
+
+    reading = asyncio.create_task(reader())
+    await asyncio.sleep(0.5)
+    try:
+        return await common.load(url, clients, 1, login) + (reads,)
+    finally:
+        stop.set()
+        await reading
+
+
+def main():
+    parser = common.parser(__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=100, help="одновременных входов")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="значения HASH_WORKERS")
+    args = parser.parse_args()
+
+    print(f"ядер: {os.cpu_count()}")
+    for workers in args.workers:
+        # Очередь не должна отбрасывать входы: меряем пропускную способность, а не 429
+        with common.serve(args.tree, HASH_WORKERS=workers, HASH_QUEUE_LIMIT=args.clients * 2) as (url, _):
+            with httpx.Client(base_url=url, timeout=60) as client:
+                for number in range(1, args.users + 1):
+                    client.post("/students/", json=common.student(number)).raise_for_status()
+            latencies, statuses, elapsed, reads = asyncio.run(storm(url, args.clients, args.users))
+        print(
+            f"HASH_WORKERS={workers}: входов {len(latencies) / elapsed:.1f} в секунду, "
+            f"p50 {common.percentile(latencies, 0.5) * 1000:.0f} мс, ответы {statuses}; "
+            f"GET /lesson/ во время наплыва: {common.summary(reads, elapsed)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
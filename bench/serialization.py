@@ -0,0 +1,137 @@
+"""Время сериализации ответа для типичных данных эндпоинтов (без сети и базы).
+
+    python bench/serialization.py [--repeat 300] [--tree КАТАЛОГ]
+
+Ответ собирается из объектов ORM, как его возвращает обработчик, и проходит тот же
+путь, что в FastAPI: serialize_response с response_model маршрута (или
+jsonable_encoder, если модели нет) и render класса ответа маршрута.
+"""
+import asyncio
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from sqlalchemy import String
+from sqlalchemy.orm.attributes import set_committed_value
+
+import common
+
+SUBJECTS = 10
+MARKS_PER_SUBJECT = 20
+SESSIONS_PER_DAY = 40
+DAYS = 6
+
+
+def build(model, **fields):
+    """Объект ORM без сессии, как после загрузки из базы; в старых версиях часть колонок была строками"""
+    columns = model.__table__.columns
+    values, related = {}, {}
+    for name, value in fields.items():
+        if name not in columns:
+            if hasattr(model, name):
+                related[name] = value
+            continue
+        if isinstance(columns[name].type, String) and not isinstance(value, str):
+            value = value.strftime("%H:%M") if isinstance(value, datetime.time) else str(value)
+        values[name] = value
+    instance = model(**values)
+    for name, value in related.items():
+        # Без событий обратной связи: загруженная коллекция не заполняет parent у детей
+        set_committed_value(instance, name, value)
+    return instance
+
+
+def payloads(db):
+    predmeti = [
+        build(
+            db.PredmetDB, id=number, color="#ffcc00", predmet=f"Предмет {number}", attes="экзамен",
+            srbal=4.25, user_id=1,
+            ocenki=[
+                build(db.OcenkaDB, id=number * 100 + mark, name="Контрольная", ocenka=mark % 5 + 1,
+                      data=datetime.date(2025, 9, 1) + datetime.timedelta(days=mark), predmet_id=number)
+                for mark in range(MARKS_PER_SUBJECT)
+            ],
+        )
+        for number in range(1, SUBJECTS + 1)
+    ]
+    user = build(
+        db.UserDB, id=1, name="Иван", fullname="Иванов Иван Иванович", role="student", login="ivanov",
+        password="$2b$12$" + "x" * 53, gmail="ivanov@example.com", vk="vk.com/ivanov", group="ИС-21",
+        srbal=4.25, predmeti=predmeti,
+    )
+
+    def sessions(day):
+        return [
+            build(db.SessionDB, id=day * 100 + number, name=f"Пара {number}", group=f"ИС-{number % 8}",
+                  teacher="Петров П.П.", teacher2=None, start=datetime.time(8 + number % 6, 30),
+                  end=datetime.time(10 + number % 6, 0), clases=str(100 + number), adress="Корпус 1",
+                  color="#00ccff", lessons_id=day)
+            for number in range(SESSIONS_PER_DAY)
+        ]
+
+    lessons = [
+        build(db.LessonsDB, id=day, date=datetime.date(2025, 9, day), sessions=sessions(day))
+        for day in range(1, DAYS + 1)
+    ]
+    return {
+        "/students/{id}/": {"message": "Студент получен", "user": user},
+        "/students/{id}/subjects/": {"message": "Предметы получены", "subjects": predmeti},
+        "/lesson/{id}/session/": {"message": "Пары получены", "session": sessions(1)},
+        "/lesson/": {"message": "Дни получены", "lessons": lessons},
+    }
+
+
+def measure(route, content, response_class, repeat: int):
+    async def render():
+        body = await serialize_response(field=route.response_field, response_content=content)
+        return response_class(body).body
+
+    loop = asyncio.new_event_loop()
+    try:
+        size = len(loop.run_until_complete(render()))
+        started = time.perf_counter()
+        for _ in range(repeat):
+            loop.run_until_complete(render())
+        return (time.perf_counter() - started) / repeat, size
+    finally:
+        loop.close()
+
+
+def main():
+    parser = common.parser(__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=300)
+    args = parser.parse_args()
+
+    # Старые версии создают ./kkts.db при импорте
+    os.chdir(tempfile.mkdtemp(prefix="kkts-bench-"))
+    sys.path.insert(0, args.tree)
+    import db
+    import main as app_module
+
+    routes = {
+        route.path: route for route in app_module.app.routes
+        if "GET" in getattr(route, "methods", ())
+    }
+    for path, content in payloads(db).items():
+        route = routes[path]
+        response_class = route.response_class
+        if isinstance(response_class, DefaultPlaceholder):
+            response_class = response_class.value
+        seconds, size = measure(route, content, response_class, args.repeat)
+        line = (
+            f"{path:28} {seconds * 1000:7.2f} мс  {size / 1024:6.1f} КиБ  "
+            f"({'response_model' if route.response_field else 'jsonable_encoder'}, {response_class.__name__}"
+        )
+        if response_class is not JSONResponse:
+            json_seconds, _ = measure(route, content, JSONResponse, args.repeat)
+            line += f"; с JSONResponse {json_seconds * 1000:.2f} мс"
+        print(line + ")")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Optional
+
+from settings import NOTIFY_BROKER, NOTIFY_BUS_PATH, NOTIFY_POLL_INTERVAL, REDIS_URL
+
+# Брокер доставляет уведомления всем воркерам uvicorn, а не только текущему процессу
+# (выбор реализации - NOTIFY_BROKER в settings.py)
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+class Broker:
+    """Базовый брокер: publish рассылает событие, handler получает его в каждом процессе"""
+
+    def __init__(self):
+        self._handler: Optional[Handler] = None
+
+    async def start(self, handler: Handler):
+        self._handler = handler
+
+    async def stop(self):
+        self._handler = None
+
+    async def publish(self, event: dict):
+        raise NotImplementedError
+
+    async def _dispatch(self, event: dict):
+        if self._handler is None:
+            return
+        try:
+            await self._handler(event)
+        except Exception as e:
+            print(f"Error handling notification {event}: {e}")
+
+
+class MemoryBroker(Broker):
+    """Доставка только внутри текущего процесса"""
+
+    async def publish(self, event: dict):
+        await self._dispatch(event)
+
+
+class SQLiteBroker(Broker):
+    """Шина через общий SQLite-файл: каждый процесс опрашивает таблицу новых событий"""
+
+    RETENTION = 60  # секунд храним события, потом удаляем
+
+    def __init__(self, path: str, poll_interval: float):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self._origin = uuid.uuid4().hex
+        self._last_id = 0
+        # Все обращения к sqlite3 идут из одного потока
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="notify-bus")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _open(self) -> int:
+        self._conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS bus ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT, payload TEXT, created REAL)"
+        )
+        # Старые события других процессов не доставляем
+        return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM bus").fetchone()[0]
+
+    def _insert(self, payload: str):
+        self._conn.execute(
+            "INSERT INTO bus (origin, payload, created) VALUES (?, ?, ?)",
+            (self._origin, payload, time.time()),
+        )
+
+    def _fetch(self, last_id: int):
+        return self._conn.execute(
+            "SELECT id, origin, payload FROM bus WHERE id > ? ORDER BY id", (last_id,)
+        ).fetchall()
+
+    def _cleanup(self):
+        self._conn.execute("DELETE FROM bus WHERE created < ?", (time.time() - self.RETENTION,))
+
+    async def start(self, handler: Handler):
+        await super().start(handler)
+        self._last_id = await self._run(self._open)
+        self._task = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        await super().stop()
+
+    async def publish(self, event: dict):
+        await self._run(self._insert, json.dumps(event))
+        # Своим клиентам доставляем сразу, не дожидаясь опроса
+        await self._dispatch(event)
+
+    async def _poll(self):
+        polls = 0
+        while True:
+            try:
+                for row_id, origin, payload in await self._run(self._fetch, self._last_id):
+                    self._last_id = row_id
+                    if origin != self._origin:
+                        await self._dispatch(json.loads(payload))
+                polls += 1
+                if polls % 100 == 0:
+                    await self._run(self._cleanup)
+            except sqlite3.Error as e:
+                print(f"Notification bus error: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+
+class RedisBroker(Broker):
+    """Redis pub/sub; сообщение приходит и самому отправителю через подписку"""
+
+    CHANNEL = "kkts:notifications"
+
+    def __init__(self, url: str):
+        super().__init__()
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("Для NOTIFY_BROKER=redis установите пакет redis")
+        self._redis = redis.from_url(url)
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: Handler):
+        await super().start(handler)
+        self._pubsub = self._redis.pubsub()
+        await self._pubsub.subscribe(self.CHANNEL)
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        await self._redis.aclose()
+        await super().stop()
+
+    async def publish(self, event: dict):
+        await self._redis.publish(self.CHANNEL, json.dumps(event))
+
+    async def _listen(self):
+        async for message in self._pubsub.listen():
+            if message["type"] == "message":
+                await self._dispatch(json.loads(message["data"]))
+
+
+def create_broker(kind: str = NOTIFY_BROKER) -> Broker:
+    if kind == "sqlite":
+        return SQLiteBroker(NOTIFY_BUS_PATH, NOTIFY_POLL_INTERVAL)
+    if kind == "redis":
+        return RedisBroker(REDIS_URL)
+    return MemoryBroker()
+
+
+broker = create_broker()
@@ -1,19 +1,114 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Date, Time, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm import Session, sessionmaker  # Импорт sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-SQLALCHEMY_DATABASE_URL = "sqlite:///./kkts.db" 
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from settings import (
+    DATABASE_URL, ASYNC_DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_BUSY_TIMEOUT, SQLITE_CACHE_SIZE, SQLITE_MMAP_SIZE,
+)
+from typing import Optional
+import os
+import re
 Base = declarative_base()  # Здесь 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db  # Возвращаем сессию для использования в зависимостях
-    finally:
-        db.close()
 
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+    cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+
+def make_engine(url: str, is_async: bool = False):
+    """Создаёт движок с настройками пула; для SQLite включает WAL и остальные PRAGMA"""
+    pool_options = {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, "pool_timeout": DB_POOL_TIMEOUT}
+    if is_async:
+        new_engine = create_async_engine(url, **pool_options)
+        sync_engine = new_engine.sync_engine
+    else:
+        connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+        new_engine = sync_engine = create_engine(url, connect_args=connect_args, **pool_options)
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+    return new_engine
+
+
+# Движки создаёт open_engines() из lifespan приложения (или скрипт перед работой с базой):
+# импорт модуля не открывает пулов. Фабрики сессий привязываются к движкам там же
+engine = None
+async_engine = None
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+
+def open_engines():
+    """Создаёт оба движка один раз на процесс; повторный вызов ничего не делает"""
+    global engine, async_engine
+    if async_engine is not None:
+        return
+    engine = make_engine(DATABASE_URL)
+    async_engine = make_engine(ASYNC_DATABASE_URL, is_async=True)
+    SessionLocal.configure(bind=engine)
+    AsyncSessionLocal.configure(bind=async_engine)
+
+
+async def dispose_engines():
+    """Закрывает соединения в пулах; движки остаются и откроют новые при следующем запросе"""
+    if async_engine is not None:
+        await async_engine.dispose()
+        engine.dispose()
+
+
+def _alembic_config():
+    from alembic.config import Config
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    alembic_config = Config(os.path.join(base_dir, "alembic.ini"))
+    alembic_config.set_main_option("script_location", os.path.join(base_dir, "alembic"))
+    return alembic_config
+
+def run_migrations():
+    """alembic upgrade head: схему базы создают и меняют только миграции"""
+    from alembic import command
+
+    command.upgrade(_alembic_config(), "head")
+
+def migration_head() -> str:
+    """Ревизия, до которой код ожидает видеть схему базы"""
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(_alembic_config()).get_current_head()
+
+async def get_async_db():
+    # Асинхронная сессия: запросы не блокируют event loop
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Сообщения для нарушений уникальных индексов users/teachers
+UNIQUE_FIELD_MESSAGES = {
+    "login": "Логин уже используется",
+    "gmail": "Gmail уже используется",
+    "vk": "VK уже используется",
+}
+
+def unique_violation_field(e: IntegrityError) -> Optional[str]:
+    """Колонка, уникальный индекс которой нарушен (по тексту ошибки SQLite или PostgreSQL)"""
+    text = str(e.orig)
+    match = re.search(r"UNIQUE constraint failed: \w+\.(\w+)", text) or re.search(r"Key \((\w+)\)=", text)
+    return match.group(1) if match else None
+
+def unique_violation_detail(e: IntegrityError) -> str:
+    return UNIQUE_FIELD_MESSAGES.get(unique_violation_field(e), "Данные конфликтуют с существующей записью")
+
+
+# Связи загружаются лениво: каждый эндпоинт сам указывает, что ему нужно (selectinload)
 class PredmetDB(Base):
     __tablename__ = "predmeti"
     
@@ -21,19 +116,23 @@ class PredmetDB(Base):
     color = Column(String, index=True)
     predmet = Column(String, index=True)
     attes = Column(String)
-    srbal = Column(Integer)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    # Средний балл ведёт сервер: сумма и число оценок меняются вместе с оценками (см. averages.py)
+    srbal = Column(Float)
+    ocenki_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    ocenki_count = Column(Integer, nullable=False, default=0, server_default="0")
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     
-    ocenki = relationship("OcenkaDB", back_populates="predmet" , lazy='joined')  # связь с OcenkaDB
+    ocenki = relationship("OcenkaDB", back_populates="predmet")  # связь с OcenkaDB
 
 class OcenkaDB(Base):
     __tablename__ = "ocenki"
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
-    data = Column(String)
-    ocenka = Column(String)
-    predmet_id = Column(Integer, ForeignKey("predmeti.id"))  # внешний ключ на PredmetDB
+    data = Column(Date)  # дата выставления
+    ocenka = Column(Integer)  # числовая оценка, средние считает SQL
+    ocenka_text = Column(String, nullable=True)  # отметка без числа (например, "н"), тогда ocenka = NULL
+    predmet_id = Column(Integer, ForeignKey("predmeti.id"), index=True)  # внешний ключ на PredmetDB
     
     predmet = relationship("PredmetDB", back_populates="ocenki" )  #
 
@@ -48,10 +147,13 @@ class UserDB(Base):
     password = Column(String)
     gmail = Column(String, unique=True, index=True)
     vk = Column(String, unique=True, index=True)
-    group = Column(String)
-    srbal = Column(String)
+    group = Column(String, index=True)  # фильтр списка студентов по группе
+    # По всем оценкам всех предметов студента
+    srbal = Column(Float)
+    ocenki_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    ocenki_count = Column(Integer, nullable=False, default=0, server_default="0")
 
-    predmeti = relationship("PredmetDB" , lazy='joined') 
+    predmeti = relationship("PredmetDB")
 
 
 
@@ -79,14 +181,14 @@ class TeacherDB(Base):
 
     # Уникальные backref для разных связей
     group = relationship("GroupDB", backref="group_teachers")  # связь с группой
-    classryk = relationship("ClassRykDB", lazy='joined')  # связь с классами
+    classryk = relationship("ClassRykDB")  # связь с классами
 
 class GroupDB(Base):
     __tablename__ = "group"
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    teacher_id = Column(Integer, ForeignKey("teachers.id"))
+    teacher_id = Column(Integer, ForeignKey("teachers.id"), index=True)
 
 
 class ClassRykDB(Base):
@@ -94,7 +196,7 @@ class ClassRykDB(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    teacher_id = Column(Integer, ForeignKey("teachers.id"))
+    teacher_id = Column(Integer, ForeignKey("teachers.id"), index=True)
 
 
 
@@ -112,10 +214,10 @@ class LessonsDB(Base):
     __tablename__ = "lessons"
 
     id = Column(Integer, primary_key=True, index=True)
-    date = Column(String)  # Оставляем строкой, как ты просил
+    date = Column(Date, index=True)
 
     # Связь один ко многим: один урок - много сессий
-    sessions = relationship("SessionDB", lazy='joined')
+    sessions = relationship("SessionDB")
 
 
 class SessionDB(Base):
@@ -123,15 +225,42 @@ class SessionDB(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
-    group = Column(String)  # Можно сделать ForeignKey на таблицу групп
-    teacher = Column(String)  # Можно сделать ForeignKey на таблицу учителей
-    teacher2 = Column(String, nullable=True)  # Второй учитель не всегда есть
-    start = Column(String)  
-    end = Column(String)
-    clases = Column(String)  
+    group = Column(String, index=True)  # Можно сделать ForeignKey на таблицу групп
+    teacher = Column(String, index=True)  # Можно сделать ForeignKey на таблицу учителей
+    teacher2 = Column(String, nullable=True, index=True)  # Второй учитель не всегда есть
+    start = Column(Time)  
+    end = Column(Time)
+    clases = Column(String, index=True)  
     adress = Column(String)
     color = Column(String)
 
     # Внешний ключ для связи с `LessonsDB`
-    lessons_id = Column(Integer, ForeignKey("lessons.id"))
+    lessons_id = Column(Integer, ForeignKey("lessons.id"), index=True)
     lesson = relationship("LessonsDB", back_populates="sessions")
+
+    # Выборки расписания идут от дней (lessons.date) к парам конкретной группы или учителя
+    __table_args__ = (
+        Index("ix_session_lessons_id_group", "lessons_id", "group"),
+        Index("ix_session_lessons_id_teacher", "lessons_id", "teacher"),
+    )
+
+
+class RevokedTokenDB(Base):
+    __tablename__ = "revoked_tokens"
+
+    # jti отозванного токена или "роль:id" для отзыва всех токенов пользователя
+    key = Column(String, primary_key=True)
+    revoked_at = Column(Float, index=True)  # unix-время отзыва
+    expires = Column(Float, index=True)  # после этого момента запись не нужна
+
+
+class GroupStatDB(Base):
+    __tablename__ = "group_stats"
+
+    # Сводка для аналитики групп: сколько оценок каждого значения получила группа
+    # по предмету за месяц. Ведётся вместе с оценками (см. group_stats.py)
+    group = Column(String, primary_key=True)
+    predmet = Column(String, primary_key=True)
+    month = Column(String, primary_key=True)  # "YYYY-MM", "" - дата не указана
+    ocenka = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
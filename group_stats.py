@@ -0,0 +1,66 @@
+from sqlalchemy import delete, func, literal, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import UserDB, PredmetDB, OcenkaDB, GroupStatDB, SessionLocal
+
+# Сводка оценок групп (group_stats) для аналитики классного руководителя.
+# Любое изменение, от которого зависит сводка (оценка, название предмета, группа студента,
+# удаление), делается так: remove_group_stats до изменения, add_group_stats после,
+# с одним и тем же условием и в той же транзакции. Каждый вызов - один INSERT ... SELECT
+# с ON CONFLICT (upsert SQLite), строки со счётчиком 0 просто не показываются.
+
+COLUMNS = ["group", "predmet", "month", "ocenka", "count"]
+
+
+def _counts(condition=None, sign: int = 1):
+    """Число оценок по (группа, предмет, месяц, значение) для оценок, подходящих под condition"""
+    month = func.coalesce(func.strftime("%Y-%m", OcenkaDB.data), "")
+    group = func.coalesce(UserDB.group, "")
+    predmet = func.coalesce(PredmetDB.predmet, "")
+    query = (
+        select(group, predmet, month, OcenkaDB.ocenka, literal(sign) * func.count())
+        .select_from(OcenkaDB)
+        .join(PredmetDB, PredmetDB.id == OcenkaDB.predmet_id)
+        .join(UserDB, UserDB.id == PredmetDB.user_id)
+        .where(OcenkaDB.ocenka.is_not(None))
+        .group_by(group, predmet, month, OcenkaDB.ocenka)
+    )
+    if condition is not None:
+        query = query.where(condition)
+    return query
+
+
+async def _shift(db: AsyncSession, condition, sign: int):
+    stmt = insert(GroupStatDB).from_select(COLUMNS, _counts(condition, sign))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=COLUMNS[:-1],
+        set_={"count": GroupStatDB.count + stmt.excluded["count"]},
+    )
+    await db.execute(stmt)
+
+
+async def add_group_stats(db: AsyncSession, condition):
+    """Учитывает в сводке оценки, подходящие под condition (например, OcenkaDB.id == 5)"""
+    await _shift(db, condition, 1)
+
+
+async def remove_group_stats(db: AsyncSession, condition):
+    await _shift(db, condition, -1)
+
+
+def check(fix: bool = False) -> int:
+    """Сверяет сводку с таблицей оценок, печатает расхождения; fix перестраивает сводку целиком"""
+    with SessionLocal() as db:
+        actual = {tuple(row[:-1]): row[-1] for row in db.execute(_counts())}
+        stored = {
+            tuple(row[:-1]): row[-1]
+            for row in db.execute(select(*(getattr(GroupStatDB, column) for column in COLUMNS)).where(GroupStatDB.count != 0))
+        }
+        drift = sorted(key for key in actual.keys() | stored.keys() if actual.get(key, 0) != stored.get(key, 0))
+        for key in drift:
+            print(f"group_stats {key}: сохранено {stored.get(key, 0)}, по оценкам {actual.get(key, 0)}")
+        if fix and drift:
+            db.execute(delete(GroupStatDB))
+            db.execute(insert(GroupStatDB).from_select(COLUMNS, _counts()))
+            db.commit()
+    return len(drift)
@@ -0,0 +1,71 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional
+
+import bcrypt
+from settings import HASH_POOL, HASH_WORKERS, HASH_QUEUE_LIMIT
+from fastapi import HTTPException
+
+_executor: Optional[Executor] = None
+_pending = 0
+
+
+def _hash(password: str) -> str:
+    salt = bcrypt.gensalt()
+    hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
+    return hashed_password.decode('utf-8')
+
+
+def _check(plain_password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if HASH_POOL == "process":
+            _executor = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+    return _executor
+
+
+async def _run(func, *args):
+    """Выполняет func в пуле, не блокируя event loop; при переполнении очереди отдаёт 429"""
+    global _pending
+    if _pending >= HASH_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=429,
+            detail="Сервер перегружен, повторите попытку позже",
+            headers={"Retry-After": "1"},
+        )
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), func, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _run(_hash, password)
+
+
+async def hash_passwords(passwords: List[str]) -> List[str]:
+    """Хэширует пачку паролей, занимая не больше HASH_WORKERS мест в очереди"""
+    hashed = []
+    for start in range(0, len(passwords), HASH_WORKERS):
+        chunk = passwords[start:start + HASH_WORKERS]
+        hashed.extend(await asyncio.gather(*(_run(_hash, password) for password in chunk)))
+    return hashed
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run(_check, plain_password, hashed_password)
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
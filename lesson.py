@@ -1,43 +1,163 @@
-from sqlalchemy.orm import Session
-from fastapi import HTTPException, APIRouter, Depends
-from db import LessonsDB, SessionDB, Base, get_db
-from pydantic import BaseModel 
+from sqlalchemy import select, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from fastapi import HTTPException, APIRouter, Depends, Response, UploadFile, File
+from db import LessonsDB, SessionDB, Base, get_async_db
+from pydantic import BaseModel, ConfigDict, ValidationError, field_serializer
 from typing import Optional
-from websocket import notify_racp_group
+from websocket import notify_schedule_change
+from resolvers import get_child_or_404
+from schedule_cache import get_schedule, set_schedule, generation as cache_generation, publish_invalidate_session, publish_clear
+import datetime
+import csv
+import io
 
 
 router = APIRouter()
 
 
 class Item(BaseModel):
-    date: str
+    date: datetime.date
 
+# Модели ответов: отдаём только нужные поля (без служебных атрибутов ORM)
+class SessionOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
 
-@router.post("/lesson/")
-async def register_teacher(item: Item, db: Session = Depends(get_db)):
+    id: int
+    name: Optional[str] = None
+    group: Optional[str] = None
+    teacher: Optional[str] = None
+    teacher2: Optional[str] = None
+    start: Optional[datetime.time] = None
+    end: Optional[datetime.time] = None
+    clases: Optional[str] = None
+    adress: Optional[str] = None
+    color: Optional[str] = None
+    lessons_id: Optional[int] = None
+
+    @field_serializer("start", "end")
+    def serialize_time(self, value: Optional[datetime.time]):
+        # Клиенты ждут время в виде "08:30"
+        return value.strftime("%H:%M") if value is not None else None
+
+class LessonOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    date: Optional[datetime.date] = None
+
+class LessonWithSessions(LessonOut):
+    sessions: list[SessionOut] = []
+
+class MessageResponse(BaseModel):
+    message: str
+
+class LessonResponse(BaseModel):
+    message: str
+    lesson: LessonOut
+
+class LessonDetailResponse(BaseModel):
+    message: str
+    lessons: LessonWithSessions
+
+class LessonListResponse(BaseModel):
+    message: str
+    lessons: list[LessonWithSessions]
+
+class SessionsResponse(BaseModel):
+    message: str
+    session: list[SessionOut]
+
+class SessionResponse(BaseModel):
+    message: str
+    session: SessionOut
+
+class ScheduleResponse(BaseModel):
+    message: str
+    lessons: list[LessonWithSessions]
+
+# Максимальная длина запрашиваемого периода, чтобы ответ не рос вместе с историей
+SCHEDULE_MAX_DAYS = 31
+
+
+@router.post("/lesson/", response_model=LessonResponse)
+async def register_teacher(item: Item, db: AsyncSession = Depends(get_async_db)):
     lesson = LessonsDB(
         date=item.date, 
     )
     db.add(lesson)
-    db.commit()
-    db.refresh(lesson)
-
-    return {"message": "День успешно зарегистрирован", "lesson": item}
-
-
-@router.get("/lesson/")
-async def get_all_lesson(db: Session = Depends(get_db)):
-    # Получаем всех пользователей из базы данных
-    lessons = db.query(LessonsDB).all()
+    await db.commit()
+    await db.refresh(lesson)
+
+    return {"message": "День успешно зарегистрирован", "lesson": lesson}
+
+
+@router.get("/lesson/", response_model=LessonListResponse)
+async def get_all_lesson(
+    date_from: Optional[datetime.date] = None,
+    date_to: Optional[datetime.date] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Получаем дни из базы данных, при необходимости только за указанный период
+    query = select(LessonsDB).options(selectinload(LessonsDB.sessions)).order_by(LessonsDB.date)
+    if date_from is not None:
+        query = query.where(LessonsDB.date >= date_from)
+    if date_to is not None:
+        query = query.where(LessonsDB.date <= date_to)
+    lessons = (await db.scalars(query)).all()
     
     # Преобразуем пользователей в формат, подходящий для возврата
     return {"message": "Распиние получено", "lessons": lessons}
 
 
-@router.get("/lesson/{id}/")
-async def get_one_teacher(id: int, db: Session = Depends(get_db)):
+@router.get("/lesson/schedule/", response_model=ScheduleResponse)
+async def get_schedule_range(
+    date_from: datetime.date,
+    date_to: datetime.date,
+    group: Optional[str] = None,
+    teacher: Optional[str] = None,  # ищется и в teacher, и в teacher2
+    classroom: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="Дата окончания раньше даты начала")
+    if (date_to - date_from).days >= SCHEDULE_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Период не может быть длиннее {SCHEDULE_MAX_DAYS} дней")
+
+    key = (date_from, date_to, group, teacher, classroom)
+    body = get_schedule(key)
+    if body is None:
+        read_generation = cache_generation()
+        query = (
+            select(SessionDB, LessonsDB.date)
+            .join(LessonsDB, SessionDB.lessons_id == LessonsDB.id)
+            .where(LessonsDB.date >= date_from, LessonsDB.date <= date_to)
+            .order_by(LessonsDB.date, SessionDB.start, SessionDB.id)
+        )
+        if group is not None:
+            query = query.where(SessionDB.group == group)
+        if teacher is not None:
+            query = query.where((SessionDB.teacher == teacher) | (SessionDB.teacher2 == teacher))
+        if classroom is not None:
+            query = query.where(SessionDB.clases == classroom)
+
+        # Собираем пары по дням
+        days = {}
+        for session, lesson_date in (await db.execute(query)).all():
+            day = days.setdefault(session.lessons_id, {"id": session.lessons_id, "date": lesson_date, "sessions": []})
+            day["sessions"].append(session)
+
+        body = ScheduleResponse(message="Расписание получено", lessons=list(days.values())).model_dump_json().encode()
+        set_schedule(key, body, read_generation)
+
+    # Отдаём уже сериализованный ответ: попадание в кэш не трогает ни БД, ни pydantic
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/lesson/{id}/", response_model=LessonDetailResponse)
+async def get_one_teacher(id: int, db: AsyncSession = Depends(get_async_db)):
     # Ищем студента по id
-    lessons = db.query(LessonsDB).filter(LessonsDB.id == id).first()
+    lessons = await db.get(LessonsDB, id, options=[selectinload(LessonsDB.sessions)])
 
     # Если студент не найден, возвращаем ошибку
     if not lessons:
@@ -55,12 +175,12 @@ async def get_one_teacher(id: int, db: Session = Depends(get_db)):
 
 
 
-@router.get("/lesson/{id}/session/")
-async def get_teacher_session(id: int, db: Session = Depends(get_db)):
-    user = db.query(LessonsDB).filter(LessonsDB.id == id).first()
+@router.get("/lesson/{id}/session/", response_model=SessionsResponse)
+async def get_teacher_session(id: int, db: AsyncSession = Depends(get_async_db)):
+    user = await db.get(LessonsDB, id)
     if not user:
         raise HTTPException(status_code=404, detail="День не найден")
-    session = db.query(SessionDB).filter(SessionDB.lessons_id == id).all()
+    session = (await db.scalars(select(SessionDB).where(SessionDB.lessons_id == id))).all()
     
     return {"message": "Пары получены","session": session}
 
@@ -69,17 +189,17 @@ class sessionCreate(BaseModel):
     group: str  # Это поле может быть пустым
     teacher: str
     teacher2: Optional[str] = None
-    start: str
-    end: str
+    start: datetime.time
+    end: datetime.time
     clases: str  
     adress: str
     color: str
 
 
-@router.post("/lesson/{id}/session/")
-async def add_teacher_session(id: int, session: sessionCreate, db: Session = Depends(get_db)):
+@router.post("/lesson/{id}/session/", response_model=SessionResponse)
+async def add_teacher_session(id: int, session: sessionCreate, db: AsyncSession = Depends(get_async_db)):
 
-    user = db.query(LessonsDB).filter(LessonsDB.id == id).first()
+    user = await db.get(LessonsDB, id)
     if not user:
         raise HTTPException(status_code=404, detail="День не найден")
 
@@ -98,11 +218,10 @@ async def add_teacher_session(id: int, session: sessionCreate, db: Session = Dep
     )
 
     db.add(new_session)
-    db.commit()
-    db.refresh(new_session)
-    await notify_racp_group(session.group, f"newlesson:{session.group}")
-    await notify_racp_group(session.teacher, f"newlessonteacher:{session.teacher}")
-    await notify_racp_group(session.teacher2, f"newlessonteacher2:{session.teacher2}")
+    await db.commit()
+    await db.refresh(new_session)
+    await publish_invalidate_session(user.date, new_session.group, new_session.teacher, new_session.teacher2, new_session.clases)
+    notify_schedule_change("created", new_session.id, new_session.group, new_session.teacher, new_session.teacher2)
     return {"message": "Пара добавлена", "session": new_session}
 
 class sessionUpdate(BaseModel):
@@ -110,21 +229,23 @@ class sessionUpdate(BaseModel):
     group: Optional[str] = None
     teacher: Optional[str] = None
     teacher2: Optional[str] = None
-    start: Optional[str] = None
-    end: Optional[str] = None
+    start: Optional[datetime.time] = None
+    end: Optional[datetime.time] = None
     clases: Optional[str] = None 
     adress: Optional[str] = None
     color: Optional[str] = None
 
-@router.put("/lesson/{id}/session/{session_id}/")
-async def update_session(id: int, session_id: int, session_data: sessionUpdate, db: Session = Depends(get_db)):
-    user = db.query(LessonsDB).filter(LessonsDB.id == id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="День не найден")
+@router.put("/lesson/{id}/session/{session_id}/", response_model=SessionResponse)
+async def update_session(id: int, session_id: int, session_data: sessionUpdate, db: AsyncSession = Depends(get_async_db)):
+    # Пара и дата её дня одним запросом (дата нужна для сброса кэша)
+    session, date = await get_child_or_404(
+        db, LessonsDB, id, SessionDB, SessionDB.lessons_id, session_id,
+        "День не найден", "Пара не найдена или не принадлежит дню",
+        parent_columns=[LessonsDB.date],
+    )
 
-    session = db.query(SessionDB).filter(SessionDB.id == session_id, SessionDB.lessons_id == id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Пара не найдена или не принадлежит дню")
+    # Запоминаем старые значения: пара могла пропасть из прежних выборок расписания
+    old_keys = (session.group, session.teacher, session.teacher2, session.clases)
 
     # Обновляем только переданные поля
     if session_data.name is not None:
@@ -148,22 +269,135 @@ async def update_session(id: int, session_id: int, session_data: sessionUpdate,
 
 
 
-    db.commit()
-    db.refresh(session)
-    await notify_racp_group(session.group, f"updatelesson:{session.group}")
+    await db.commit()
+    await db.refresh(session)
+    await publish_invalidate_session(date, *old_keys)
+    await publish_invalidate_session(date, session.group, session.teacher, session.teacher2, session.clases)
+    # Сообщаем и прежним, и новым группе/учителям
+    notify_schedule_change("updated", session.id, *old_keys[:3], session.group, session.teacher, session.teacher2)
     return {"message": "Пары обновлены", "session": session}
 
-@router.delete("/lesson/{id}/session/{session_id}/")
-async def delete_session(id: int, session_id: int, db: Session = Depends(get_db)):
-    user = db.query(LessonsDB).filter(LessonsDB.id == id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="День не найден")
-
-    session = db.query(SessionDB).filter(SessionDB.id == session_id, SessionDB.lessons_id == id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Пара не найден или не прнадлежит дню")
+@router.delete("/lesson/{id}/session/{session_id}/", response_model=MessageResponse)
+async def delete_session(id: int, session_id: int, db: AsyncSession = Depends(get_async_db)):
+    session, date = await get_child_or_404(
+        db, LessonsDB, id, SessionDB, SessionDB.lessons_id, session_id,
+        "День не найден", "Пара не найдена или не принадлежит дню",
+        parent_columns=[LessonsDB.date],
+    )
 
-    db.delete(session)
-    db.commit()
-    await notify_racp_group(session.group, f"dellesson:{session.group}")
-    return {"message": "Пара удалена"}
\ No newline at end of file
+    await db.delete(session)
+    await db.commit()
+    await publish_invalidate_session(date, session.group, session.teacher, session.teacher2, session.clases)
+    notify_schedule_change("deleted", session.id, session.group, session.teacher, session.teacher2)
+    return {"message": "Пара удалена"}
+
+
+
+# Массовая загрузка расписания (JSON или CSV) одним запросом и одной транзакцией
+
+# Ограничение на размер одной загрузки
+BULK_MAX_ROWS = 10000
+
+class SessionImportRow(sessionCreate):
+    # День указывается либо по id, либо по дате (недостающие дни создаются)
+    lessons_id: Optional[int] = None
+    date: Optional[datetime.date] = None
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportResponse(BaseModel):
+    message: str
+    inserted: int
+    errors: list[ImportRowError]
+
+
+def _format_validation_error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors())
+
+
+async def _import_sessions(rows: list[tuple[int, dict]], db: AsyncSession) -> dict:
+    """Проверяет строки, вставляет корректные одним executemany и возвращает ошибки по строкам"""
+    if len(rows) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Не больше {BULK_MAX_ROWS} пар за одну загрузку")
+
+    errors = []
+    valid = []
+    for number, raw in rows:
+        try:
+            row = SessionImportRow.model_validate(raw)
+        except ValidationError as e:
+            errors.append({"row": number, "error": _format_validation_error(e)})
+            continue
+        if row.lessons_id is None and row.date is None:
+            errors.append({"row": number, "error": "Нужно указать lessons_id или date"})
+            continue
+        valid.append((number, row))
+
+    # Дни разрешаем двумя запросами на всю загрузку, а не по запросу на строку
+    ids = {row.lessons_id for _, row in valid if row.lessons_id is not None}
+    dates = {row.date for _, row in valid if row.lessons_id is None}
+    existing_ids = set((await db.scalars(select(LessonsDB.id).where(LessonsDB.id.in_(ids)))).all()) if ids else set()
+    day_by_date = {}
+    if dates:
+        found = await db.execute(select(LessonsDB.id, LessonsDB.date).where(LessonsDB.date.in_(dates)).order_by(LessonsDB.id))
+        for lesson_id, lesson_date in found:
+            day_by_date.setdefault(lesson_date, lesson_id)
+        missing = sorted(dates - day_by_date.keys())
+        if missing:
+            created = await db.execute(
+                insert(LessonsDB).returning(LessonsDB.id, LessonsDB.date, sort_by_parameter_order=True),
+                [{"date": d} for d in missing],
+            )
+            for lesson_id, lesson_date in created:
+                day_by_date[lesson_date] = lesson_id
+
+    values = []
+    for number, row in valid:
+        if row.lessons_id is not None and row.lessons_id not in existing_ids:
+            errors.append({"row": number, "error": "День не найден"})
+            continue
+        lessons_id = row.lessons_id if row.lessons_id is not None else day_by_date[row.date]
+        values.append(row.model_dump(exclude={"lessons_id", "date"}) | {"lessons_id": lessons_id})
+
+    new_ids = []
+    if values:
+        new_ids = (await db.scalars(insert(SessionDB).returning(SessionDB.id, sort_by_parameter_order=True), values)).all()
+    await db.commit()
+
+    if new_ids:
+        # Затронуто слишком много выборок, проще сбросить кэш расписания целиком
+        await publish_clear()
+        for session_id, value in zip(new_ids, values):
+            notify_schedule_change("created", session_id, value["group"], value["teacher"], value["teacher2"])
+
+    errors.sort(key=lambda error: error["row"])
+    return {"message": "Расписание загружено", "inserted": len(new_ids), "errors": errors}
+
+
+@router.post("/lesson/sessions/bulk/", response_model=ImportResponse)
+async def import_sessions(rows: list[dict], db: AsyncSession = Depends(get_async_db)):
+    # Строки нумеруем с 1, как их видит пользователь
+    return await _import_sessions(list(enumerate(rows, start=1)), db)
+
+
+@router.post("/lesson/sessions/bulk/csv/", response_model=ImportResponse)
+async def import_sessions_csv(file: UploadFile = File(...), db: AsyncSession = Depends(get_async_db)):
+    try:
+        text = (await file.read()).decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Файл должен быть в кодировке UTF-8")
+
+    # Excel с русской локалью сохраняет CSV через ";"
+    try:
+        dialect = csv.Sniffer().sniff(text.split("\n", 1)[0], delimiters=",;")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+    # Пустые ячейки считаем отсутствующими значениями; строка 1 - заголовок
+    rows = [
+        (reader.line_num, {key: value for key, value in record.items() if key and value not in ("", None)})
+        for record in reader
+    ]
+    return await _import_sessions(rows, db)
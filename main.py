@@ -1,16 +1,29 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Depends
-from sqlalchemy.orm import Session, sessionmaker  
-from sqlalchemy import create_engine
-from db import Base, get_db  
+from db import open_engines, dispose_engines, run_migrations
+import asyncio
+import backup
+import hashing
+import revocation
 from student import router as student_router
 from teacher import router as teacher_router
 from backup import router as backup_router
+from snapshots import router as snapshots_router
+import snapshots
 from auth import router as auth_router
-from websocket import router as websocket_router
+from websocket import router as websocket_router, start_notifications, stop_notifications
 from lesson import router as lesson_router
-from decouple import config  
+from analytics import router as analytics_router
+from settings import AUTO_MIGRATE
 from fastapi.middleware.cors import CORSMiddleware
 
+# orjson необязателен: если он установлен, ответы сериализуются заметно быстрее
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    from fastapi.responses import JSONResponse as DefaultResponse
+
 origins = [
     "http://localhost:5173",  
     "http://127.0.0.1:5173",
@@ -19,21 +32,32 @@ origins = [
     "https://kkts.tw1.ru"
 ]
 
-ALLOWED_IPS = config("ALLOWED_IPS").split(",")  
-VALID_TOKENS = config("VALID_TOKENS").split(",")  
-ADMIN_USERNAME = config("ADMIN_USERNAME")  
-ADMIN_PASSWORD = config("ADMIN_PASSWORD")  
-
-
-
-SQLALCHEMY_DATABASE_URL = "sqlite:///./kkts.db" 
-
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Схему создаёт только Alembic; AUTO_MIGRATE=True прогоняет миграции при старте
+    if AUTO_MIGRATE:
+        await asyncio.get_running_loop().run_in_executor(None, run_migrations)
+    # Единственные пулы соединений процесса
+    open_engines()
+    # Отмечаем воркер: восстановление базы проверяет, что он единственный
+    backup.register_worker()
+    # Подключаемся к брокеру уведомлений (общему для всех воркеров)
+    await start_notifications()
+    # Загружаем список отозванных токенов и следим за отзывами из других воркеров
+    await revocation.start()
+    # Снимки базы по расписанию
+    await snapshots.start()
+    yield
+    await stop_notifications()
+    await revocation.stop()
+    await snapshots.stop()
+    backup.unregister_worker()
+    # Закрываем пулы соединений
+    await dispose_engines()
+    hashing.shutdown()
 
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+app = FastAPI(default_response_class=DefaultResponse, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -50,6 +74,8 @@ async def home():
 app.include_router(student_router)
 app.include_router(teacher_router)
 app.include_router(backup_router)
+app.include_router(snapshots_router)
 app.include_router(auth_router)
 app.include_router(websocket_router)
 app.include_router(lesson_router)
+app.include_router(analytics_router)
@@ -0,0 +1,57 @@
+from typing import Any, Sequence, Tuple
+from fastapi import HTTPException
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import UserDB, PredmetDB, OcenkaDB
+
+# Поиск вложенных ресурсов (/parent/{id}/child/{child_id}/) одним запросом:
+# родитель LEFT JOIN ребёнок по id ребёнка. Нет строки - нет родителя,
+# строка без ребёнка - ребёнок не найден или принадлежит другому родителю.
+# Граф родителя (его коллекции) при этом не загружается.
+
+
+async def get_child_or_404(
+    db: AsyncSession,
+    parent_model: Any,
+    parent_id: int,
+    child_model: Any,
+    child_fk: Any,
+    child_id: int,
+    parent_detail: str,
+    child_detail: str,
+    parent_columns: Sequence[Any] = (),
+    options: Sequence[Any] = (),
+) -> Tuple[Any, ...]:
+    """Возвращает (ребёнок, *parent_columns); нужные колонки родителя приходят тем же запросом"""
+    query = (
+        select(child_model, parent_model.id, *parent_columns)
+        .select_from(parent_model)
+        .outerjoin(child_model, and_(child_fk == parent_model.id, child_model.id == child_id))
+        .where(parent_model.id == parent_id)
+        .options(*options)
+    )
+    row = (await db.execute(query)).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail=parent_detail)
+    if row[0] is None:
+        raise HTTPException(status_code=404, detail=child_detail)
+    return (row[0], *row[2:])
+
+
+async def get_ocenka_or_404(db: AsyncSession, user_id: int, subject_id: int, ocenka_id: int) -> OcenkaDB:
+    """Оценка студента по цепочке студент -> предмет -> оценка, одним запросом"""
+    query = (
+        select(OcenkaDB, UserDB.id, PredmetDB.id)
+        .select_from(UserDB)
+        .outerjoin(PredmetDB, and_(PredmetDB.user_id == UserDB.id, PredmetDB.id == subject_id))
+        .outerjoin(OcenkaDB, and_(OcenkaDB.predmet_id == PredmetDB.id, OcenkaDB.id == ocenka_id))
+        .where(UserDB.id == user_id)
+    )
+    row = (await db.execute(query)).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Студент не найден")
+    if row[2] is None:
+        raise HTTPException(status_code=404, detail="Предмет не найден или не принадлежит студенту")
+    if row[0] is None:
+        raise HTTPException(status_code=404, detail="Оценка не найдена")
+    return row[0]
@@ -0,0 +1,108 @@
+import asyncio
+import time
+from typing import Dict, Optional, Tuple
+from settings import REVOCATION_SYNC_INTERVAL
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import AsyncSessionLocal, RevokedTokenDB
+
+# Список отозванных токенов. Проверка идёт по словарям в памяти (O(1) на запрос),
+# таблица revoked_tokens хранит записи между перезапусками и для других воркеров:
+# каждый процесс подтягивает новые отзывы раз в REVOCATION_SYNC_INTERVAL секунд
+
+# {jti: когда истекает сам токен}
+_revoked_tokens: Dict[str, float] = {}
+# {(роль, id): (момент отзыва, когда запись можно забыть)} - все токены, выданные до отзыва
+_revoked_users: Dict[Tuple[str, int], Tuple[float, float]] = {}
+
+_last_sync = 0.0
+_sync_task: Optional[asyncio.Task] = None
+
+
+def _user_key(role: str, user_id: int) -> str:
+    return f"{role}:{user_id}"
+
+
+def _remember(key: str, revoked_at: float, expires: float):
+    role, sep, user_id = key.partition(":")
+    if sep:
+        _revoked_users[(role, int(user_id))] = (revoked_at, expires)
+    else:
+        _revoked_tokens[key] = expires
+
+
+def is_revoked(payload: dict) -> bool:
+    """Отозван ли токен: по его jti или целиком по пользователю"""
+    jti = payload.get("jti")
+    if jti is None or jti in _revoked_tokens:
+        return True
+    revoked = _revoked_users.get((payload.get("role"), int(payload.get("sub"))))
+    return revoked is not None and payload.get("iat", 0) <= revoked[0]
+
+
+async def _store(db: AsyncSession, key: str, expires: float):
+    revoked_at = time.time()
+    _remember(key, revoked_at, expires)
+    await db.merge(RevokedTokenDB(key=key, revoked_at=revoked_at, expires=expires))
+    await db.commit()
+
+
+async def revoke_token(db: AsyncSession, jti: str, expires: float):
+    """Отзывает один токен (выход из системы, использованный refresh-токен)"""
+    await _store(db, jti, expires)
+
+
+async def revoke_user(db: AsyncSession, role: str, user_id: int, lifetime: float):
+    """Отзывает все уже выданные токены пользователя; lifetime - срок жизни самого долгого токена"""
+    await _store(db, _user_key(role, user_id), time.time() + lifetime)
+
+
+def _purge(now: float):
+    for jti in [jti for jti, expires in _revoked_tokens.items() if expires < now]:
+        del _revoked_tokens[jti]
+    for key in [key for key, (_, expires) in _revoked_users.items() if expires < now]:
+        del _revoked_users[key]
+
+
+async def sync():
+    """Подтягивает отзывы, сделанные другими процессами, и чистит истёкшие записи"""
+    global _last_sync
+    now = time.time()
+    async with AsyncSessionLocal() as db:
+        # Небольшой запас на случай одновременных записей из разных воркеров
+        rows = (await db.execute(
+            select(RevokedTokenDB.key, RevokedTokenDB.revoked_at, RevokedTokenDB.expires)
+            .where(RevokedTokenDB.revoked_at >= _last_sync - 1, RevokedTokenDB.expires >= now)
+        )).all()
+        await db.execute(delete(RevokedTokenDB).where(RevokedTokenDB.expires < now))
+        await db.commit()
+    for key, revoked_at, expires in rows:
+        _remember(key, revoked_at, expires)
+    _purge(now)
+    _last_sync = now
+
+
+async def _sync_loop():
+    while True:
+        await asyncio.sleep(REVOCATION_SYNC_INTERVAL)
+        try:
+            await sync()
+        except Exception as e:
+            print(f"Revocation sync error: {e}")
+
+
+async def start():
+    global _sync_task
+    await sync()
+    _sync_task = asyncio.create_task(_sync_loop())
+
+
+async def stop():
+    global _sync_task
+    if _sync_task is not None:
+        _sync_task.cancel()
+        try:
+            await _sync_task
+        except asyncio.CancelledError:
+            pass
+        _sync_task = None
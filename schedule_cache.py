@@ -0,0 +1,101 @@
+import datetime
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from settings import SCHEDULE_CACHE_TTL
+from broker import broker
+
+# Кэш готовых ответов расписания внутри процесса.
+# Ключ: (date_from, date_to, group, teacher, classroom), значение: сериализованный JSON.
+# Сбросы рассылаются через брокер, чтобы их видели все воркеры; записи вдобавок
+# живут не дольше SCHEDULE_CACHE_TTL
+CacheKey = Tuple[datetime.date, datetime.date, Optional[str], Optional[str], Optional[str]]
+
+SCHEDULE_CACHE_SIZE = 1024
+
+_entries: "OrderedDict[CacheKey, Tuple[bytes, float]]" = OrderedDict()
+# Растёт при каждом сбросе: ответ, собранный до сброса, в кэш уже не попадёт
+_generation = 0
+
+
+def generation() -> int:
+    """Запоминается перед чтением из БД и передаётся в set_schedule"""
+    return _generation
+
+
+def get_schedule(key: CacheKey) -> Optional[bytes]:
+    entry = _entries.get(key)
+    if entry is None:
+        return None
+    body, expires = entry
+    if expires <= time.monotonic():
+        del _entries[key]
+        return None
+    _entries.move_to_end(key)
+    return body
+
+
+def set_schedule(key: CacheKey, body: bytes, read_generation: int):
+    # Пока читали из БД, пару могли изменить и сбросить кэш - такой ответ устарел
+    if read_generation != _generation:
+        return
+    _entries[key] = (body, time.monotonic() + SCHEDULE_CACHE_TTL)
+    _entries.move_to_end(key)
+    # Вытесняем самые старые записи (LRU)
+    while len(_entries) > SCHEDULE_CACHE_SIZE:
+        _entries.popitem(last=False)
+
+
+def _affects(key: CacheKey, date: datetime.date, group: str, teacher: str, teacher2: Optional[str], clases: str) -> bool:
+    date_from, date_to, f_group, f_teacher, f_classroom = key
+    if not (date_from <= date <= date_to):
+        return False
+    if f_group is not None and f_group != group:
+        return False
+    if f_teacher is not None and f_teacher not in (teacher, teacher2):
+        return False
+    if f_classroom is not None and f_classroom != clases:
+        return False
+    return True
+
+
+def invalidate_session(date: Optional[datetime.date], group: str, teacher: str, teacher2: Optional[str], clases: str):
+    """Удаляет из кэша этого процесса только те выборки, в которые попадает изменённая пара"""
+    global _generation
+    # День без даты не попадает ни в одну выборку за период
+    if date is None:
+        return
+    _generation += 1
+    for key in [key for key in _entries if _affects(key, date, group, teacher, teacher2, clases)]:
+        del _entries[key]
+
+
+def clear():
+    global _generation
+    _generation += 1
+    _entries.clear()
+
+
+async def publish_invalidate_session(date: Optional[datetime.date], group: str, teacher: str, teacher2: Optional[str], clases: str):
+    """Сбрасывает выборки с парой здесь же и рассылает сброс остальным воркерам"""
+    if date is None:
+        return
+    invalidate_session(date, group, teacher, teacher2, clases)
+    await broker.publish({
+        "type": "schedule_cache",
+        "session": [date.isoformat(), group, teacher, teacher2, clases],
+    })
+
+
+async def publish_clear():
+    clear()
+    await broker.publish({"type": "schedule_cache", "session": None})
+
+
+def apply_event(event: dict):
+    """Сброс, пришедший через брокер (в том числе свой же - повторный сброс безвреден)"""
+    if event["session"] is None:
+        clear()
+        return
+    date, group, teacher, teacher2, clases = event["session"]
+    invalidate_session(datetime.date.fromisoformat(date), group, teacher, teacher2, clases)
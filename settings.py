@@ -0,0 +1,77 @@
+import os
+from decouple import config
+
+# Все настройки приложения в одном месте; значения читаются из .env или переменных окружения
+
+# База данных
+DATABASE_URL = config("DATABASE_URL", default="sqlite:///./kkts.db")
+# Асинхронный URL можно переопределить (например, postgresql+asyncpg://...)
+ASYNC_DATABASE_URL = config("ASYNC_DATABASE_URL", default="sqlite+aiosqlite:///./kkts.db")
+# Прогонять миграции Alembic при старте (удобно локально; на сервере - alembic upgrade head)
+AUTO_MIGRATE = config("AUTO_MIGRATE", default=False, cast=bool)
+
+# Пул соединений: писатель в SQLite всё равно один, большой пул нужен только читателям
+DB_POOL_SIZE = config("DB_POOL_SIZE", default=10, cast=int)
+DB_MAX_OVERFLOW = config("DB_MAX_OVERFLOW", default=10, cast=int)
+DB_POOL_TIMEOUT = config("DB_POOL_TIMEOUT", default=30, cast=float)
+
+# PRAGMA для каждого нового соединения SQLite.
+# WAL: читатели не ждут писателей; synchronous=NORMAL в WAL безопасен при сбое процесса
+SQLITE_JOURNAL_MODE = config("SQLITE_JOURNAL_MODE", default="WAL")
+SQLITE_SYNCHRONOUS = config("SQLITE_SYNCHRONOUS", default="NORMAL")
+SQLITE_BUSY_TIMEOUT = config("SQLITE_BUSY_TIMEOUT", default=5000, cast=int)  # мс ожидания блокировки
+SQLITE_CACHE_SIZE = config("SQLITE_CACHE_SIZE", default=-64000, cast=int)  # отрицательное - в КиБ
+SQLITE_MMAP_SIZE = config("SQLITE_MMAP_SIZE", default=256 * 1024 * 1024, cast=int)
+
+# Авторизация
+SECRET_KEY = config("SECRET_KEY", default="mysecretkey")
+# Access-токен живёт недолго, продлевается через refresh-токен без повторной проверки пароля
+ACCESS_TOKEN_EXPIRE_MINUTES = config("ACCESS_TOKEN_EXPIRE_MINUTES", default=15, cast=int)
+REFRESH_TOKEN_EXPIRE_DAYS = config("REFRESH_TOKEN_EXPIRE_DAYS", default=14, cast=int)
+# Сколько секунд доверяем проверенному токену без обращения к БД (0 - проверять каждый запрос).
+# Удаление пользователя и смена пароля сбрасывают кэш сразу, но только в своём процессе:
+# в остальных воркерах изменение вступит в силу не позже чем через PRINCIPAL_CACHE_TTL
+PRINCIPAL_CACHE_TTL = config("PRINCIPAL_CACHE_TTL", default=60, cast=float)
+# Как часто воркер подтягивает отзывы токенов, сделанные другими процессами
+REVOCATION_SYNC_INTERVAL = config("REVOCATION_SYNC_INTERVAL", default=5, cast=float)
+
+# Хэширование паролей. bcrypt отпускает GIL, поэтому по умолчанию хватает пула потоков;
+# HASH_POOL=process переключает на отдельные процессы
+HASH_POOL = config("HASH_POOL", default="thread")
+HASH_WORKERS = config("HASH_WORKERS", default=os.cpu_count() or 1, cast=int)
+# Сколько операций (в работе + в очереди) допускаем, прежде чем отвечать 429
+HASH_QUEUE_LIMIT = config("HASH_QUEUE_LIMIT", default=HASH_WORKERS * 8, cast=int)
+
+# Уведомления доставляются всем воркерам uvicorn, а не только текущему процессу.
+# NOTIFY_BROKER=memory  - один процесс (по умолчанию)
+# NOTIFY_BROKER=sqlite  - общая шина в файле NOTIFY_BUS_PATH, внешние сервисы не нужны
+# NOTIFY_BROKER=redis   - Redis pub/sub по адресу REDIS_URL (нужен пакет redis)
+NOTIFY_BROKER = config("NOTIFY_BROKER", default="memory")
+NOTIFY_BUS_PATH = config("NOTIFY_BUS_PATH", default="./kkts_bus.db")
+NOTIFY_POLL_INTERVAL = config("NOTIFY_POLL_INTERVAL", default=0.1, cast=float)
+REDIS_URL = config("REDIS_URL", default="redis://localhost:6379/0")
+# Окно (в секундах), за которое изменения расписания собираются в одно событие
+NOTIFY_DEBOUNCE = config("NOTIFY_DEBOUNCE", default=0.3, cast=float)
+# Сколько секунд живёт ответ в кэше расписания: страховка на случай, если сброс
+# из другого воркера не дошёл (например, NOTIFY_BROKER=memory при нескольких воркерах)
+SCHEDULE_CACHE_TTL = config("SCHEDULE_CACHE_TTL", default=30, cast=float)
+
+# Резервные копии
+# Сколько секунд может идти одна копия базы, после этого она прерывается и снимает блокировку
+BACKUP_TIMEOUT = config("BACKUP_TIMEOUT", default=300, cast=float)
+BACKUP_COMPRESSLEVEL = config("BACKUP_COMPRESSLEVEL", default=3, cast=int)
+# Снимки по расписанию: полный снимок, затем до BACKUP_FULL_EVERY инкрементов
+BACKUP_DIR = config("BACKUP_DIR", default="./backups")
+BACKUP_INTERVAL = config("BACKUP_INTERVAL", default=3600, cast=float)  # секунд, 0 - не запускать
+BACKUP_FULL_EVERY = config("BACKUP_FULL_EVERY", default=24, cast=int)
+BACKUP_KEEP_FULL = config("BACKUP_KEEP_FULL", default=7, cast=int)  # сколько цепочек хранить
+
+# Аналитика групп: студент считается неуспевающим по предмету, если средний балл ниже порога
+FAILING_GRADE = config("FAILING_GRADE", default=3.0, cast=float)
+
+# Доступ. Пустые значения по умолчанию нужны, чтобы модули (и скрипты, и тесты)
+# импортировались без .env; на сервере их задают явно
+ALLOWED_IPS = [ip for ip in config("ALLOWED_IPS", default="").split(",") if ip]
+VALID_TOKENS = [token for token in config("VALID_TOKENS", default="").split(",") if token]
+ADMIN_USERNAME = config("ADMIN_USERNAME", default="")
+ADMIN_PASSWORD = config("ADMIN_PASSWORD", default="")
@@ -0,0 +1,316 @@
+from fastapi import HTTPException, APIRouter
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel
+from settings import BACKUP_DIR, BACKUP_INTERVAL, BACKUP_FULL_EVERY, BACKUP_KEEP_FULL, SQLITE_BUSY_TIMEOUT
+from typing import List, Optional
+from backup import (
+    DB_PATH, backup_lock, fcntl, file_chunks, gzip_chunks, gzip_stream, temp_path, remove_file, BACKUP_CHUNK_SIZE,
+)
+from contextlib import contextmanager
+import asyncio
+import datetime
+import gzip
+import hashlib
+import os
+import sqlite3
+import struct
+import time
+
+router = APIRouter()
+
+# Снимки по расписанию: полный снимок, затем до BACKUP_FULL_EVERY инкрементов,
+# в каждом из которых только страницы, изменившиеся с прошлого снимка цепочки
+
+FULL_SUFFIX = "_full.db.gz"
+INC_SUFFIX = "_inc.pages.gz"
+# Заголовок инкремента: сигнатура, размер страницы, число страниц в базе;
+# дальше записи "номер страницы + страница"
+INC_MAGIC = b"KKTSINC1"
+INC_HEADER = struct.Struct(">II")
+PAGE_NUMBER = struct.Struct(">I")
+# Сколько раз пробуем перенести WAL в файл базы, прежде чем отказаться от снимка
+PIN_ATTEMPTS = 20
+PIN_RETRY_DELAY = 0.1
+
+_task: Optional[asyncio.Task] = None
+
+
+class SnapshotOut(BaseModel):
+    name: str
+    kind: str  # "full" или "incremental"
+    created: datetime.datetime
+    size: int
+
+class SnapshotsResponse(BaseModel):
+    message: str
+    snapshots: List[SnapshotOut]
+
+
+def _names() -> List[str]:
+    if not os.path.isdir(BACKUP_DIR):
+        return []
+    # Имена начинаются с времени, поэтому сортировка по имени хронологическая
+    return sorted(name for name in os.listdir(BACKUP_DIR) if name.endswith((FULL_SUFFIX, INC_SUFFIX)))
+
+
+def _chains(names: List[str]) -> List[List[str]]:
+    """Группирует снимки в цепочки [полный, инкремент, ...]; инкременты без полного пропускаем"""
+    chains = []
+    for name in names:
+        if name.endswith(FULL_SUFFIX):
+            chains.append([name])
+        elif chains:
+            chains[-1].append(name)
+    return chains
+
+
+def _path(name: str) -> str:
+    return os.path.join(BACKUP_DIR, name)
+
+
+def _hashes_path(full_name: str) -> str:
+    # Хэши страниц последнего состояния цепочки, с ними сравнивается следующий снимок
+    return _path(full_name + ".hashes")
+
+
+def _digest(page: bytes) -> bytes:
+    return hashlib.blake2b(page, digest_size=16).digest()
+
+
+def _load_hashes(full_name: str, page_size: int) -> Optional[List[bytes]]:
+    try:
+        with open(_hashes_path(full_name), "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if len(data) < 4 or PAGE_NUMBER.unpack_from(data)[0] != page_size:
+        return None
+    return [data[i:i + 16] for i in range(4, len(data), 16)]
+
+
+def _save_hashes(full_name: str, page_size: int, hashes: List[bytes]):
+    tmp = _hashes_path(full_name) + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(PAGE_NUMBER.pack(page_size))
+        f.write(b"".join(hashes))
+    os.replace(tmp, _hashes_path(full_name))
+
+
+def _write_atomic(name: str, chunks):
+    tmp = _path(name) + ".tmp"
+    with open(tmp, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp, _path(name))
+
+
+def _full_records(path: str, page_size: int, hashes: List[bytes]):
+    """Файл базы целиком; хэши страниц собираются по ходу чтения"""
+    for page in file_chunks(path, page_size):
+        hashes.append(_digest(page))
+        yield page
+
+
+def _increment_records(path: str, page_size: int, page_count: int, previous: List[bytes], hashes: List[bytes]):
+    """Инкремент: за один проход по файлу базы сравниваем хэши и пишем только изменившиеся страницы"""
+    yield INC_MAGIC + INC_HEADER.pack(page_size, page_count)
+    for number, page in enumerate(file_chunks(path, page_size)):
+        digest = _digest(page)
+        hashes.append(digest)
+        if number >= len(previous) or previous[number] != digest:
+            yield PAGE_NUMBER.pack(number) + page
+
+
+def _apply_retention():
+    chains = _chains(_names())
+    for chain in chains[:-BACKUP_KEEP_FULL] if BACKUP_KEEP_FULL > 0 else []:
+        for name in chain:
+            remove_file(_path(name))
+        remove_file(_hashes_path(chain[0]))
+
+
+@contextmanager
+def _pinned_database():
+    """Держит файл базы неизменным и возвращает размер страницы.
+
+    Снимок читается прямо из файла базы, без промежуточной копии. В режиме WAL файл
+    меняет только checkpoint: под блокировкой записи переносим весь WAL в файл базы
+    и открываем транзакцию чтения - она читает один файл базы (read-mark 0), и пока
+    она открыта, checkpoint не переносит в файл новые кадры. Писатели ждут только
+    сам checkpoint, дальше их записи копятся в WAL.
+    В режиме с журналом отката файл и так не меняется, пока открыто чтение"""
+    reader = sqlite3.connect(DB_PATH, isolation_level=None, timeout=SQLITE_BUSY_TIMEOUT / 1000)
+    try:
+        if reader.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            _begin_read_on_checkpointed_wal(reader)
+        else:
+            reader.execute("BEGIN")
+            reader.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        yield reader.execute("PRAGMA page_size").fetchone()[0]
+    finally:
+        reader.close()
+
+
+def _begin_read_on_checkpointed_wal(reader: sqlite3.Connection):
+    writer = sqlite3.connect(DB_PATH, isolation_level=None, timeout=SQLITE_BUSY_TIMEOUT / 1000)
+    try:
+        for _ in range(PIN_ATTEMPTS):
+            # Блокировка записи: пока она у нас, новых кадров в WAL не появится
+            writer.execute("BEGIN IMMEDIATE")
+            try:
+                _, frames, copied = reader.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+                # Перенести всё не дают читатели старых версий - попробуем ещё раз
+                if frames == copied:
+                    reader.execute("BEGIN")
+                    reader.execute("SELECT count(*) FROM sqlite_master").fetchone()
+                    return
+            finally:
+                writer.execute("ROLLBACK")
+            time.sleep(PIN_RETRY_DELAY)
+    finally:
+        writer.close()
+    raise RuntimeError("Не удалось перенести WAL в файл базы перед снимком: его держат читатели")
+
+
+def _store() -> str:
+    """Сохраняет текущее состояние базы как полный снимок или как инкремент к текущей цепочке"""
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    with _pinned_database() as page_size:
+        page_count = os.path.getsize(DB_PATH) // page_size
+
+        chains = _chains(_names())
+        chain = chains[-1] if chains else None
+        previous = None
+        if chain is not None and len(chain) - 1 < BACKUP_FULL_EVERY:
+            previous = _load_hashes(chain[0], page_size)
+
+        hashes = []
+        if previous is None:
+            name = stamp + FULL_SUFFIX
+            _write_atomic(name, gzip_stream(_full_records(DB_PATH, page_size, hashes)))
+            base = name
+        else:
+            name = stamp + INC_SUFFIX
+            _write_atomic(name, gzip_stream(_increment_records(DB_PATH, page_size, page_count, previous, hashes)))
+            base = chain[0]
+
+    _save_hashes(base, page_size, hashes)
+    _apply_retention()
+    return name
+
+
+def _materialize(name: str, target: str):
+    """Собирает базу на момент снимка name: полный снимок плюс инкременты цепочки по порядку"""
+    chain = next(chain for chain in _chains(_names()) if name in chain)
+    with gzip.open(_path(chain[0]), "rb") as source, open(target, "wb") as f:
+        while chunk := source.read(BACKUP_CHUNK_SIZE):
+            f.write(chunk)
+    for increment in chain[1:chain.index(name) + 1]:
+        with gzip.open(_path(increment), "rb") as source, open(target, "r+b") as f:
+            if source.read(len(INC_MAGIC)) != INC_MAGIC:
+                raise ValueError(f"Повреждён инкремент {increment}")
+            page_size, page_count = INC_HEADER.unpack(source.read(INC_HEADER.size))
+            while header := source.read(PAGE_NUMBER.size):
+                f.seek(PAGE_NUMBER.unpack(header)[0] * page_size)
+                f.write(source.read(page_size))
+            f.truncate(page_count * page_size)
+
+
+def _is_due() -> bool:
+    """Не пора ли делать снимок: другой воркер мог только что его сделать"""
+    names = _names()
+    if not names:
+        return True
+    last = datetime.datetime.strptime(names[-1][:22], "%Y%m%d_%H%M%S_%f")
+    return (datetime.datetime.now() - last).total_seconds() >= BACKUP_INTERVAL / 2
+
+
+def _store_if_due(force: bool = False) -> Optional[str]:
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    with open(_path(".lock"), "w") as lock:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX if force else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return None  # Снимок сейчас делает другой воркер
+        # Проверяем уже под блокировкой: другой воркер мог только что закончить снимок
+        if not force and not _is_due():
+            return None
+        return _store()
+
+
+async def take_snapshot(force: bool = False) -> Optional[str]:
+    """Сохраняет снимок базы; чтение файла и сжатие идут в потоке"""
+    async with backup_lock:
+        return await asyncio.get_running_loop().run_in_executor(None, _store_if_due, force)
+
+
+async def _loop():
+    while True:
+        await asyncio.sleep(BACKUP_INTERVAL)
+        try:
+            name = await take_snapshot()
+            if name:
+                print(f"Snapshot saved: {name}")
+        except Exception as e:
+            print(f"Snapshot error: {e}")
+
+
+async def start():
+    global _task
+    if BACKUP_INTERVAL > 0:
+        _task = asyncio.create_task(_loop())
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+
+
+@router.get("/backup/snapshots/", response_model=SnapshotsResponse)
+async def list_snapshots():
+    snapshots = [
+        SnapshotOut(
+            name=name,
+            kind="full" if name.endswith(FULL_SUFFIX) else "incremental",
+            created=datetime.datetime.strptime(name[:22], "%Y%m%d_%H%M%S_%f"),
+            size=os.path.getsize(_path(name)),
+        )
+        for chain in _chains(_names())
+        for name in chain
+    ]
+    return {"message": "Снимки получены", "snapshots": snapshots}
+
+
+@router.get("/backup/snapshots/{name}")
+async def get_snapshot(name: str):
+    """Отдаёт базу на момент снимка (gzip), её можно загрузить в /restore/"""
+    if not any(name in chain for chain in _chains(_names())):
+        raise HTTPException(status_code=404, detail="Снимок не найден")
+
+    filename = f"kkts_{name[:15]}.db.gz"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if name.endswith(FULL_SUFFIX):
+        # Полный снимок уже сжат, отдаём файл как есть
+        return StreamingResponse(file_chunks(_path(name), BACKUP_CHUNK_SIZE), media_type="application/gzip", headers=headers)
+
+    path = temp_path(".db")
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, _materialize, name, path)
+    except Exception:
+        remove_file(path)
+        raise
+    return StreamingResponse(
+        gzip_chunks(path),
+        media_type="application/gzip",
+        headers=headers,
+        background=BackgroundTask(remove_file, path),
+    )
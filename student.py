@@ -1,26 +1,42 @@
-from sqlalchemy.orm import Session
-from fastapi import HTTPException, APIRouter, Depends
-from db import UserDB, PredmetDB, OcenkaDB, TeacherDB, Base, get_db
-from pydantic import BaseModel 
+from sqlalchemy import select, insert, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from fastapi import HTTPException, APIRouter, Depends, Query
+from db import UserDB, PredmetDB, OcenkaDB, GroupDB, Base, get_async_db, unique_violation_detail
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 from typing import Optional
-import bcrypt
+import datetime
 from websocket import notify_disconnect_user  # Импортируем функцию
-from auth import get_current_user
+from auth import Principal, get_current_user, invalidate_principal, revoke_user_tokens
+from hashing import hash_password, hash_passwords, verify_password
+from resolvers import get_child_or_404, get_ocenka_or_404
+from averages import summarize, mark_delta, add_to_averages, add_many_to_averages
+from group_stats import add_group_stats, remove_group_stats
 
 
 router = APIRouter()
 
+# Оценка - число от 1 до 5; отметка без числа (например, "н") передаётся в ocenka_text
+class MarkFields(BaseModel):
+    ocenka: Optional[int] = Field(default=None, ge=1, le=5)
+    ocenka_text: Optional[str] = None
+
+    @model_validator(mode="after")
+    def one_mark(self):
+        if (self.ocenka is None) == (self.ocenka_text is None):
+            raise ValueError("Нужно указать либо ocenka (1-5), либо ocenka_text")
+        return self
+
 # Модель для данных, которые мы получаем от клиента (Pydantic)
-class OcenkaItem(BaseModel):
+class OcenkaItem(MarkFields):
     name: str
-    data: str
-    ocenka: str
+    data: datetime.date
 
 class PredmetItem(BaseModel):
     color: str
     predmet: str
     attes: str
-    srbal: float
     ocenki: list[OcenkaItem] = []
 
 class Item(BaseModel):
@@ -32,30 +48,121 @@ class Item(BaseModel):
     gmail: str
     vk: str
     group: str
-    srbal: str
     ocenki: list[PredmetItem] = []
 
+# srbal клиент больше не передаёт: средний балл считает сервер по оценкам (averages.py)
+
+# Модели ответов: отдаём только нужные поля (без пароля и служебных атрибутов ORM)
+class OcenkaOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: Optional[str] = None
+    data: Optional[datetime.date] = None
+    ocenka: Optional[int] = None
+    ocenka_text: Optional[str] = None
+    predmet_id: Optional[int] = None
+
+class PredmetOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    color: Optional[str] = None
+    predmet: Optional[str] = None
+    attes: Optional[str] = None
+    srbal: Optional[float] = None
+    user_id: Optional[int] = None
+
+class PredmetWithOcenki(PredmetOut):
+    ocenki: list[OcenkaOut] = []
+
+class StudentOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: Optional[str] = None
+    fullname: Optional[str] = None
+    role: Optional[str] = None
+    login: Optional[str] = None
+    gmail: Optional[str] = None
+    vk: Optional[str] = None
+    group: Optional[str] = None
+    srbal: Optional[float] = None
+
+class StudentDetail(StudentOut):
+    predmeti: list[PredmetWithOcenki] = []
+
+class MessageResponse(BaseModel):
+    message: str
+
+class StudentResponse(BaseModel):
+    message: str
+    user: StudentOut
+
+class StudentDetailResponse(BaseModel):
+    message: str
+    user: StudentDetail
+
+class StudentListResponse(BaseModel):
+    message: str
+    users: list[StudentOut]
+    next_cursor: Optional[int] = None
+
+class SubjectsResponse(BaseModel):
+    message: str
+    subjects: list[PredmetWithOcenki]
+
+class SubjectResponse(BaseModel):
+    message: str
+    subject: PredmetOut
+
+class OcenkaResponse(BaseModel):
+    message: str
+    ocenka: OcenkaOut
+
+class OcenkiResponse(BaseModel):
+    ocenki: list[OcenkaOut]
+
+class EnrollResponse(BaseModel):
+    message: str
+    ids: list[int]
+
+class SubjectAverage(BaseModel):
+    subject_id: int
+    predmet: Optional[str] = None
+    average: Optional[float] = None  # None, если оценок ещё нет
+    count: int
+
+class SubjectAverageResponse(BaseModel):
+    message: str
+    average: Optional[float] = None
+    count: int
+
+class StudentAveragesResponse(BaseModel):
+    message: str
+    average: Optional[float] = None  # по всем оценкам студента
+    count: int
+    subjects: list[SubjectAverage]
+
+
+@router.post("/students/", response_model=StudentResponse)
+async def register_student(
+    item: Item,
+    upsert: bool = False,  # при повторном импорте обновить студента с тем же логином
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Повторный импорт: существующего студента обновляем, не хэшируя пароль заново
+    if upsert:
+        existing = await db.scalar(select(UserDB).where(UserDB.login == item.login))
+        if existing is not None:
+            user = await _update_student(existing, item, db)
+            return {"message": "Студент обновлен", "user": user}
 
-def hash_password(password: str) -> str:
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed_password.decode('utf-8')
-
-@router.post("/students/")
-async def register_student(item: Item, db: Session = Depends(get_db)):
-    # Проверка уникальности в базе данных
-    existing_user = db.query(UserDB).filter(UserDB.gmail == item.gmail).first()
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Gmail уже используется")
-    
-    existing_vk = db.query(UserDB).filter(UserDB.vk == item.vk).first()
-    if existing_vk:
-        raise HTTPException(status_code=400, detail="VK уже используется")
-    
     # Хэшируем пароль перед сохранением
-    hashed_password = hash_password(item.password)
+    hashed_password = await hash_password(item.password)
 
-    # Создаем нового пользователя
+    # Создаем пользователя сразу с предметами и оценками: всё пишется одной транзакцией,
+    # а однотипные INSERT ORM отправляет пачкой
     user = UserDB(
         name=item.name, 
         fullname=item.fullname, 
@@ -65,69 +172,167 @@ async def register_student(item: Item, db: Session = Depends(get_db)):
         gmail=item.gmail, 
         vk=item.vk, 
         group=item.group,
-        srbal=item.srbal
-    )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-
-    # Добавляем предметы и оценки (если есть)
-    if item.ocenki:
-        for predmet in item.ocenki:
-            db_predmet = PredmetDB(
+        **summarize(ocenka.ocenka for predmet in item.ocenki for ocenka in predmet.ocenki),
+        predmeti=[
+            PredmetDB(
                 color=predmet.color, 
                 predmet=predmet.predmet, 
                 attes=predmet.attes, 
-                srbal=predmet.srbal, 
-                user_id=user.id
+                **summarize(ocenka.ocenka for ocenka in predmet.ocenki),
+                ocenki=[
+                    OcenkaDB(name=ocenka.name, data=ocenka.data, ocenka=ocenka.ocenka, ocenka_text=ocenka.ocenka_text)
+                    for ocenka in predmet.ocenki
+                ],
             )
-            db.add(db_predmet)
-            db.commit()
-            db.refresh(db_predmet)
-
-            for ocenka in predmet.ocenki:
-                db_ocenka = OcenkaDB(
-                    name=ocenka.name, 
-                    data=ocenka.data, 
-                    ocenka=ocenka.ocenka, 
-                    predmet_id=db_predmet.id
-                )
-                db.add(db_ocenka)
-
-            db.commit()
-
-    return {"message": "Студент успешно зарегистрирован", "user": item}
-
-@router.get("/students/")
-async def get_all_students(db: Session = Depends(get_db)):
-    # Получаем всех пользователей из базы данных
-    users = db.query(UserDB).all()
-    
-    # Преобразуем пользователей в формат, подходящий для возврата
-    return {"message": "Студенты получены", "users": users}
-
-@router.delete("/students/{id}/")
-async def del_student(id: int, db: Session = Depends(get_db)):
+            for predmet in item.ocenki
+        ],
+    )
+    # Уникальность login/gmail/vk проверяют индексы БД, отдельные SELECT не нужны
+    db.add(user)
+    try:
+        await db.flush()
+        await add_group_stats(db, UserDB.id == user.id)
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        if not upsert:
+            raise HTTPException(status_code=400, detail=unique_violation_detail(e))
+        # Студента с этим логином успели создать параллельно; если его нет,
+        # конфликт по gmail/vk настоящий (SQLite сообщает только о первом индексе)
+        existing = await db.scalar(select(UserDB).where(UserDB.login == item.login))
+        if existing is None:
+            raise HTTPException(status_code=400, detail=unique_violation_detail(e))
+        user = await _update_student(existing, item, db)
+        return {"message": "Студент обновлен", "user": user}
+
+    return {"message": "Студент успешно зарегистрирован", "user": user}
+
+async def _update_student(user: UserDB, item: Item, db: AsyncSession) -> UserDB:
+    """Upsert: обновляет поля существующего студента; предметы и оценки при этом не трогаем.
+    Хэш пароля меняется, только если сменился сам пароль: новый хэш (с новой солью)
+    разлогинил бы студента везде (отпечаток пароля в токене)"""
+    password_changed = not await verify_password(item.password, user.password)
+    if password_changed:
+        user.password = await hash_password(item.password)
+    user.name = item.name
+    user.fullname = item.fullname
+    user.gmail = item.gmail
+    user.vk = item.vk
+    # Оценки студента переезжают в сводку новой группы
+    await remove_group_stats(db, UserDB.id == user.id)
+    user.group = item.group
+    try:
+        await db.flush()
+        await add_group_stats(db, UserDB.id == user.id)
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=unique_violation_detail(e))
+    if password_changed:
+        invalidate_principal("user", user.id)
+    return user
+
+# Ограничение на размер одного зачисления
+ENROLL_MAX_STUDENTS = 2000
+
+@router.post("/students/batch/", response_model=EnrollResponse)
+async def enroll_students(items: list[Item], db: AsyncSession = Depends(get_async_db)):
+    """Зачисляет сразу целую группу: три пачки INSERT (студенты, предметы, оценки) в одной транзакции"""
+    if len(items) > ENROLL_MAX_STUDENTS:
+        raise HTTPException(status_code=413, detail=f"Не больше {ENROLL_MAX_STUDENTS} студентов за один запрос")
+    if not items:
+        return {"message": "Студенты зачислены", "ids": []}
+
+    hashed_passwords = await hash_passwords([item.password for item in items])
+
+    try:
+        user_ids = (await db.scalars(
+            insert(UserDB).returning(UserDB.id, sort_by_parameter_order=True),
+            [
+                {
+                    "name": item.name, "fullname": item.fullname, "role": "student", "login": item.login,
+                    "password": password, "gmail": item.gmail, "vk": item.vk, "group": item.group,
+                    **summarize(ocenka.ocenka for predmet in item.ocenki for ocenka in predmet.ocenki),
+                }
+                for item, password in zip(items, hashed_passwords)
+            ],
+        )).all()
+
+        predmeti = [(predmet, user_id) for user_id, item in zip(user_ids, items) for predmet in item.ocenki]
+        if predmeti:
+            predmet_ids = (await db.scalars(
+                insert(PredmetDB).returning(PredmetDB.id, sort_by_parameter_order=True),
+                [
+                    {"color": predmet.color, "predmet": predmet.predmet, "attes": predmet.attes,
+                     "user_id": user_id, **summarize(ocenka.ocenka for ocenka in predmet.ocenki)}
+                    for predmet, user_id in predmeti
+                ],
+            )).all()
+
+            ocenki = [
+                {"name": ocenka.name, "data": ocenka.data, "ocenka": ocenka.ocenka, "ocenka_text": ocenka.ocenka_text,
+                 "predmet_id": predmet_id}
+                for predmet_id, (predmet, _) in zip(predmet_ids, predmeti)
+                for ocenka in predmet.ocenki
+            ]
+            if ocenki:
+                await db.execute(insert(OcenkaDB), ocenki)
+                await add_group_stats(db, UserDB.id.in_(user_ids))
+
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=unique_violation_detail(e))
+
+    return {"message": "Студенты зачислены", "ids": user_ids}
+
+@router.get("/students/", response_model=StudentListResponse)
+async def get_all_students(
+    group: Optional[str] = None,
+    cursor: Optional[int] = None,  # id последнего студента с предыдущей страницы
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Выбираем только нужные колонки (без пароля), сортировка по id стабильна
+    query = select(
+        UserDB.id, UserDB.name, UserDB.fullname, UserDB.role, UserDB.login,
+        UserDB.gmail, UserDB.vk, UserDB.group, UserDB.srbal,
+    ).order_by(UserDB.id).limit(limit)
+    if group is not None:
+        query = query.where(UserDB.group == group)
+    if cursor is not None:
+        query = query.where(UserDB.id > cursor)
+
+    users = (await db.execute(query)).mappings().all()
+
+    # Курсор следующей страницы есть, только если страница заполнена целиком
+    next_cursor = users[-1]["id"] if len(users) == limit else None
+    return {"message": "Студенты получены", "users": users, "next_cursor": next_cursor}
+
+@router.delete("/students/{id}/", response_model=MessageResponse)
+async def del_student(id: int, db: AsyncSession = Depends(get_async_db)):
     # Ищем пользователя по id
-    user = db.query(UserDB).filter(UserDB.id == id).first()
+    user = await db.get(UserDB, id, options=[selectinload(UserDB.predmeti)])
 
     # Если пользователь не найден, возвращаем ошибку
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
 
-    # Удаляем пользователя
-    db.delete(user)
-    db.commit()
+    # Удаляем пользователя и его оценки из сводки группы
+    await remove_group_stats(db, UserDB.id == id)
+    await db.delete(user)
+    await db.commit()
+    await revoke_user_tokens(db, "user", id)
 
     # Отправляем уведомление об отключении
     await notify_disconnect_user(user.id, user.name, "student")
     return {"message": f"Студент удален"}
 
 
-@router.get("/students/{id}/")
-async def get_one_student(id: int, db: Session = Depends(get_db)):
+@router.get("/students/{id}/", response_model=StudentDetailResponse)
+async def get_one_student(id: int, db: AsyncSession = Depends(get_async_db)):
     # Ищем студента по id
-    user = db.query(UserDB).filter(UserDB.id == id).first()
+    user = await db.get(UserDB, id, options=[selectinload(UserDB.predmeti).selectinload(PredmetDB.ocenki)])
 
     # Если студент не найден, возвращаем ошибку
     if not user:
@@ -145,12 +350,11 @@ class UpdateStudent(BaseModel):
     gmail: Optional[str] = None
     vk: Optional[str] = None
     group: Optional[str] = None
-    srbal: Optional[str] = None
 
-@router.put("/students/{id}/")
-async def put_student(id: int, student_data: UpdateStudent, db: Session = Depends(get_db)):
+@router.put("/students/{id}/", response_model=StudentResponse)
+async def put_student(id: int, student_data: UpdateStudent, db: AsyncSession = Depends(get_async_db)):
     # Ищем студента по id
-    user = db.query(UserDB).filter(UserDB.id == id).first()
+    user = await db.get(UserDB, id)
 
     # Если студент не найден, возвращаем ошибку
     if not user:
@@ -166,48 +370,53 @@ async def put_student(id: int, student_data: UpdateStudent, db: Session = Depend
     if student_data.login is not None:
         user.login = student_data.login
     if student_data.password is not None:
-        user.password = hash_password(student_data.password)
+        user.password = await hash_password(student_data.password)
     if student_data.vk is not None:
         user.vk = student_data.vk
-    if student_data.group is not None:
+    group_changed = student_data.group is not None and student_data.group != user.group
+    if group_changed:
+        await remove_group_stats(db, UserDB.id == id)
         user.group = student_data.group
-    if student_data.srbal is not None:
-        user.srbal = student_data.srbal
 
     # Сохраняем изменения в базе данных
-    db.commit()
-    db.refresh(user)
+    try:
+        if group_changed:
+            await db.flush()
+            await add_group_stats(db, UserDB.id == id)
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=unique_violation_detail(e))
+    if student_data.password is not None:
+        invalidate_principal("user", id)
+    await db.refresh(user)
 
     return {"message": "Студент обновлен", "user": user}
 
 
-@router.get("/students/{id}/subjects/")
+@router.get("/students/{id}/subjects/", response_model=SubjectsResponse)
 async def get_student_subjects(
     id: int, 
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user)  # Добавляем проверку текущего пользователя
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)  # Добавляем проверку текущего пользователя
 ):
-    if current_user["role"] == "teacher":
+    if current_user.role == "teacher":
         # Проверка, если у учителя есть доступ к группе студента
-        student = db.query(UserDB).filter(UserDB.id == id).first()
+        student = await db.get(UserDB, id)
         if not student:
             raise HTTPException(status_code=404, detail="Студент не найден")
-        print(current_user)
-        # Проверяем, что учитель ведет занятия в группе студента
-        teacher = db.query(TeacherDB).filter(TeacherDB.id == current_user['user'].id).first()
-        if not teacher:
-            raise HTTPException(status_code=404, detail="Учитель не найден")
 
-        # Проверка, что учитель связан с группой студента (например, через group)
-        if teacher.group and student.group != teacher.group:
+        # Проверяем, что учитель ведет занятия в группе студента
+        teacher_groups = (await db.scalars(select(GroupDB.name).where(GroupDB.teacher_id == current_user.id))).all()
+        if teacher_groups and student.group not in teacher_groups:
             raise HTTPException(status_code=403, detail="Учитель не имеет доступа к этому студенту")
 
-    elif current_user['user'].id != id:
+    elif current_user.id != id:
         # Если текущий пользователь не учитель, то проверяем, что он не пытается получить доступ к данным другого пользователя
         raise HTTPException(status_code=403, detail="У вас нет доступа к данным другого студента")
 
     # Получаем предметы студента
-    subjects = db.query(PredmetDB).filter(PredmetDB.user_id == id).all()
+    subjects = (await db.scalars(select(PredmetDB).options(selectinload(PredmetDB.ocenki)).where(PredmetDB.user_id == id))).all()
 
     return {"message": "Предметы получены", "subjects": subjects}
 
@@ -215,12 +424,11 @@ class PredmetCreate(BaseModel):
     color: str
     predmet: str
     attes: str
-    srbal: float
 
-@router.post("/students/{id}/subjects/")
-async def add_student_subject(id: int, subject: PredmetCreate, db: Session = Depends(get_db)):
+@router.post("/students/{id}/subjects/", response_model=SubjectResponse)
+async def add_student_subject(id: int, subject: PredmetCreate, db: AsyncSession = Depends(get_async_db)):
     # Проверяем, есть ли студент
-    user = db.query(UserDB).filter(UserDB.id == id).first()
+    user = await db.get(UserDB, id)
     if not user:
         raise HTTPException(status_code=404, detail="Студент не найден")
 
@@ -229,13 +437,12 @@ async def add_student_subject(id: int, subject: PredmetCreate, db: Session = Dep
         color=subject.color,
         predmet=subject.predmet,
         attes=subject.attes,
-        srbal=subject.srbal,
         user_id=id
     )
 
     db.add(new_subject)
-    db.commit()
-    db.refresh(new_subject)
+    await db.commit()
+    await db.refresh(new_subject)
 
     return {"message": "Предмет добавлен", "subject": new_subject}
 
@@ -243,139 +450,242 @@ class PredmetUpdate(BaseModel):
     color: Optional[str] = None
     predmet: Optional[str] = None
     attes: Optional[str] = None
-    srbal: Optional[float] = None
 
-@router.put("/students/{id}/subjects/{subject_id}/")
-async def update_subject(id: int, subject_id: int, subject_data: PredmetUpdate, db: Session = Depends(get_db)):
-    # Проверяем, существует ли студент
-    user = db.query(UserDB).filter(UserDB.id == id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Студент не найден")
-
-    # Проверяем, существует ли предмет и принадлежит ли он студенту
-    subject = db.query(PredmetDB).filter(PredmetDB.id == subject_id, PredmetDB.user_id == id).first()
-    if not subject:
-        raise HTTPException(status_code=404, detail="Предмет не найден или не принадлежит студенту")
+@router.put("/students/{id}/subjects/{subject_id}/", response_model=SubjectResponse)
+async def update_subject(id: int, subject_id: int, subject_data: PredmetUpdate, db: AsyncSession = Depends(get_async_db)):
+    # Студент и его предмет одним запросом
+    subject, = await get_child_or_404(
+        db, UserDB, id, PredmetDB, PredmetDB.user_id, subject_id,
+        "Студент не найден", "Предмет не найден или не принадлежит студенту",
+    )
 
     # Обновляем только переданные поля
     if subject_data.color is not None:
         subject.color = subject_data.color
-    if subject_data.predmet is not None:
-        subject.predmet = subject_data.predmet
     if subject_data.attes is not None:
         subject.attes = subject_data.attes
-    if subject_data.srbal is not None:
-        subject.srbal = subject_data.srbal
+    # Переименованный предмет в сводке группы - другой предмет
+    if subject_data.predmet is not None and subject_data.predmet != subject.predmet:
+        await remove_group_stats(db, PredmetDB.id == subject.id)
+        subject.predmet = subject_data.predmet
+        await db.flush()
+        await add_group_stats(db, PredmetDB.id == subject.id)
 
-    db.commit()
-    db.refresh(subject)
+    await db.commit()
+    await db.refresh(subject)
 
     return {"message": "Предмет обновлен", "subject": subject}
 
-@router.delete("/students/{id}/subjects/{subject_id}/")
-async def delete_subject(id: int, subject_id: int, db: Session = Depends(get_db)):
-    user = db.query(UserDB).filter(UserDB.id == id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Студент не найден")
-
-    subject = db.query(PredmetDB).filter(PredmetDB.id == subject_id, PredmetDB.user_id == id).first()
-    if not subject:
-        raise HTTPException(status_code=404, detail="Предмет не найден или не прнадлежит студенту")
+@router.delete("/students/{id}/subjects/{subject_id}/", response_model=MessageResponse)
+async def delete_subject(id: int, subject_id: int, db: AsyncSession = Depends(get_async_db)):
+    subject, = await get_child_or_404(
+        db, UserDB, id, PredmetDB, PredmetDB.user_id, subject_id,
+        "Студент не найден", "Предмет не найден или не принадлежит студенту",
+        options=[selectinload(PredmetDB.ocenki)],
+    )
 
-    db.delete(subject)
-    db.commit()
+    # Оценки предмета больше не входят в средний балл студента
+    await add_to_averages(db, id, subject.id, -subject.ocenki_sum, -subject.ocenki_count)
+    await remove_group_stats(db, PredmetDB.id == subject.id)
+    await db.delete(subject)
+    await db.commit()
 
     return {"message": "Предмет удален"}
 
 
 
-class OcenkaCreate(BaseModel):
+class OcenkaCreate(MarkFields):
     name: str
-    data: str
-    ocenka: str
-
-@router.post("/students/{id}/subjects/{subject_id}/ocenki/")
-async def create_ocenka(id: int, subject_id: int, ocenka: OcenkaCreate, db: Session = Depends(get_db)):
-    # Проверяем, существует ли студент
-    user = db.query(UserDB).filter(UserDB.id == id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Студент не найден")
-
-    # Проверяем, существует ли предмет и принадлежит ли он студенту
-    subject = db.query(PredmetDB).filter(PredmetDB.id == subject_id, PredmetDB.user_id == id).first()
-    if not subject:
-        raise HTTPException(status_code=404, detail="Предмет не найден или не принадлежит студенту")
+    data: datetime.date
+
+@router.post("/students/{id}/subjects/{subject_id}/ocenki/", response_model=OcenkaResponse)
+async def create_ocenka(id: int, subject_id: int, ocenka: OcenkaCreate, db: AsyncSession = Depends(get_async_db)):
+    # Студент и его предмет одним запросом
+    subject, = await get_child_or_404(
+        db, UserDB, id, PredmetDB, PredmetDB.user_id, subject_id,
+        "Студент не найден", "Предмет не найден или не принадлежит студенту",
+    )
 
     # Создаем новую оценку
-    new_ocenka = OcenkaDB(name=ocenka.name, data=ocenka.data, ocenka=ocenka.ocenka, predmet_id=subject.id)
+    new_ocenka = OcenkaDB(
+        name=ocenka.name, data=ocenka.data, ocenka=ocenka.ocenka, ocenka_text=ocenka.ocenka_text, predmet_id=subject.id,
+    )
     db.add(new_ocenka)
-    db.commit()
-    db.refresh(new_ocenka)
+    # Средние баллы и сводка группы меняются в той же транзакции
+    await add_to_averages(db, id, subject.id, *mark_delta(ocenka.ocenka))
+    await db.flush()
+    await add_group_stats(db, OcenkaDB.id == new_ocenka.id)
+    await db.commit()
+    await db.refresh(new_ocenka)
 
     return {"message": "Оценка добавлена", "ocenka": new_ocenka}
 
 
-@router.get("/students/{id}/subjects/{subject_id}/ocenki/")
-async def get_ocenki(id: int, subject_id: int, db: Session = Depends(get_db)):
-    # Проверяем, существует ли студент
-    user = db.query(UserDB).filter(UserDB.id == id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Студент не найден")
+# Ограничение на число оценок в одной пачке
+GRADE_BATCH_MAX = 1000
+
+class BatchOcenkaEntry(MarkFields):
+    student_id: int
+    data: datetime.date
 
-    # Проверяем, существует ли предмет и принадлежит ли он студенту
-    subject = db.query(PredmetDB).filter(PredmetDB.id == subject_id, PredmetDB.user_id == id).first()
-    if not subject:
-        raise HTTPException(status_code=404, detail="Предмет не найден или не принадлежит студенту")
+class BatchOcenkiCreate(BaseModel):
+    group: str
+    predmet: str  # название предмета, как у студентов группы
+    name: str  # за что оценки (например, "Контрольная работа")
+    ocenki: list[BatchOcenkaEntry]
+
+class BatchOcenkaResult(BaseModel):
+    student_id: int
+    ocenka_id: Optional[int] = None
+    error: Optional[str] = None
+
+class BatchOcenkiResponse(BaseModel):
+    message: str
+    created: int
+    results: list[BatchOcenkaResult]  # в порядке запроса
+
+@router.post("/students/ocenki/batch/", response_model=BatchOcenkiResponse)
+async def create_ocenki_batch(batch: BatchOcenkiCreate, db: AsyncSession = Depends(get_async_db)):
+    """Оценки группе по одному предмету: предметы всех студентов одним запросом,
+    все оценки, средние баллы и сводка группы - одной транзакцией"""
+    if len(batch.ocenki) > GRADE_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"Не больше {GRADE_BATCH_MAX} оценок за один запрос")
+
+    # student_id -> (id предмета, id студента); если одноимённых предметов несколько, берём первый
+    rows = (await db.execute(
+        select(PredmetDB.user_id, func.min(PredmetDB.id))
+        .join(UserDB, UserDB.id == PredmetDB.user_id)
+        .where(
+            UserDB.group == batch.group,
+            PredmetDB.predmet == batch.predmet,
+            UserDB.id.in_({entry.student_id for entry in batch.ocenki}),
+        )
+        .group_by(PredmetDB.user_id)
+    )).all()
+    subjects = dict(rows)
+
+    accepted = [entry for entry in batch.ocenki if entry.student_id in subjects]
+    ocenka_ids = []
+    if accepted:
+        ocenka_ids = (await db.scalars(
+            insert(OcenkaDB).returning(OcenkaDB.id, sort_by_parameter_order=True),
+            [
+                {"name": batch.name, "data": entry.data, "ocenka": entry.ocenka, "ocenka_text": entry.ocenka_text,
+                 "predmet_id": subjects[entry.student_id]}
+                for entry in accepted
+            ],
+        )).all()
+        await add_many_to_averages(
+            db, [(entry.student_id, subjects[entry.student_id], *mark_delta(entry.ocenka)) for entry in accepted]
+        )
+        await add_group_stats(db, OcenkaDB.id.in_(ocenka_ids))
+        await db.commit()
+
+    created = iter(ocenka_ids)
+    results = [
+        BatchOcenkaResult(student_id=entry.student_id, ocenka_id=next(created))
+        if entry.student_id in subjects
+        else BatchOcenkaResult(student_id=entry.student_id, error="Студент не найден в группе или у него нет этого предмета")
+        for entry in batch.ocenki
+    ]
+    return {"message": "Оценки добавлены", "created": len(ocenka_ids), "results": results}
+
+
+@router.get("/students/{id}/subjects/{subject_id}/ocenki/", response_model=OcenkiResponse)
+async def get_ocenki(id: int, subject_id: int, db: AsyncSession = Depends(get_async_db)):
+    # Студент и его предмет одним запросом
+    subject, = await get_child_or_404(
+        db, UserDB, id, PredmetDB, PredmetDB.user_id, subject_id,
+        "Студент не найден", "Предмет не найден или не принадлежит студенту",
+    )
 
     # Получаем все оценки для данного предмета
-    ocenki = db.query(OcenkaDB).filter(OcenkaDB.predmet_id == subject_id).all()
+    ocenki = (await db.scalars(select(OcenkaDB).where(OcenkaDB.predmet_id == subject_id))).all()
 
     return {"ocenki": ocenki}
 
 
-@router.put("/students/{id}/subjects/{subject_id}/ocenki/{ocenka_id}/")
+@router.get("/students/{id}/subjects/{subject_id}/average/", response_model=SubjectAverageResponse)
+async def get_subject_average(id: int, subject_id: int, db: AsyncSession = Depends(get_async_db)):
+    # Средний балл хранится в предмете и обновляется вместе с оценками
+    subject, = await get_child_or_404(
+        db, UserDB, id, PredmetDB, PredmetDB.user_id, subject_id,
+        "Студент не найден", "Предмет не найден или не принадлежит студенту",
+    )
+
+    return {"message": "Средний балл получен", "average": subject.srbal, "count": subject.ocenki_count}
+
+
+@router.get("/students/{id}/averages/", response_model=StudentAveragesResponse)
+async def get_student_averages(id: int, db: AsyncSession = Depends(get_async_db)):
+    # Готовые агрегаты студента и его предметов; оценки не читаем вовсе
+    query = (
+        select(
+            UserDB.srbal, UserDB.ocenki_count,
+            PredmetDB.id, PredmetDB.predmet, PredmetDB.srbal, PredmetDB.ocenki_count,
+        )
+        .select_from(UserDB)
+        .outerjoin(PredmetDB, PredmetDB.user_id == UserDB.id)
+        .where(UserDB.id == id)
+        .order_by(PredmetDB.id)
+    )
+    rows = (await db.execute(query)).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Студент не найден")
+
+    subjects = [
+        SubjectAverage(subject_id=subject_id, predmet=predmet, average=average, count=count)
+        for _, _, subject_id, predmet, average, count in rows
+        if subject_id is not None
+    ]
+    return {
+        "message": "Средние баллы получены",
+        "average": rows[0][0],
+        "count": rows[0][1],
+        "subjects": subjects,
+    }
+
+
+@router.put("/students/{id}/subjects/{subject_id}/ocenki/{ocenka_id}/", response_model=OcenkaResponse)
 async def update_ocenka(
     id: int, 
     subject_id: int, 
     ocenka_id: int, 
     ocenka: OcenkaCreate,  # Параметры для обновления
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # Находим оценку по ID
-    db_ocenka = db.query(OcenkaDB).filter(OcenkaDB.id == ocenka_id, OcenkaDB.predmet_id == subject_id).first()
+    # Находим оценку по цепочке студент -> предмет -> оценка
+    db_ocenka = await get_ocenka_or_404(db, id, subject_id, ocenka_id)
+
+    # Поправка к агрегатам: и старая, и новая отметка могут быть без числа
+    old_total, old_count = mark_delta(db_ocenka.ocenka)
+    new_total, new_count = mark_delta(ocenka.ocenka)
+    await add_to_averages(db, id, subject_id, new_total - old_total, new_count - old_count)
 
-    # Если оценка не найдена, возвращаем ошибку
-    if not db_ocenka:
-        raise HTTPException(status_code=404, detail="Оценка не найдена")
+    await remove_group_stats(db, OcenkaDB.id == ocenka_id)
 
     # Обновляем поля оценка
     db_ocenka.name = ocenka.name
     db_ocenka.data = ocenka.data
     db_ocenka.ocenka = ocenka.ocenka
+    db_ocenka.ocenka_text = ocenka.ocenka_text
 
-    db.commit()  # Сохраняем изменения
-    db.refresh(db_ocenka)  # Обновляем объект
+    await db.flush()
+    await add_group_stats(db, OcenkaDB.id == ocenka_id)
+    await db.commit()  # Сохраняем изменения
+    await db.refresh(db_ocenka)  # Обновляем объект
 
     return {"message": "Оценка обновлена", "ocenka": db_ocenka}
 
-@router.delete("/students/{id}/subjects/{subject_id}/ocenki/{ocenka_id}/")
-async def delete_ocenka(id: int, subject_id: int, ocenka_id: int, db: Session = Depends(get_db)):
-    # Проверяем, существует ли студент
-    user = db.query(UserDB).filter(UserDB.id == id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Студент не найден")
-
-    # Проверяем, существует ли предмет и принадлежит ли он студенту
-    subject = db.query(PredmetDB).filter(PredmetDB.id == subject_id, PredmetDB.user_id == id).first()
-    if not subject:
-        raise HTTPException(status_code=404, detail="Предмет не найден или не принадлежит студенту")
-
-    # Проверяем, существует ли оценка
-    ocenka = db.query(OcenkaDB).filter(OcenkaDB.id == ocenka_id, OcenkaDB.predmet_id == subject_id).first()
-    if not ocenka:
-        raise HTTPException(status_code=404, detail="Оценка не найдена")
+@router.delete("/students/{id}/subjects/{subject_id}/ocenki/{ocenka_id}/", response_model=MessageResponse)
+async def delete_ocenka(id: int, subject_id: int, ocenka_id: int, db: AsyncSession = Depends(get_async_db)):
+    # Студент, предмет и оценка одним запросом
+    ocenka = await get_ocenka_or_404(db, id, subject_id, ocenka_id)
 
-    db.delete(ocenka)
-    db.commit()
+    if ocenka.ocenka is not None:
+        await add_to_averages(db, id, subject_id, -ocenka.ocenka, -1)
+    await remove_group_stats(db, OcenkaDB.id == ocenka_id)
+    await db.delete(ocenka)
+    await db.commit()
 
     return {"message": "Оценка удалена"}
@@ -1,10 +1,15 @@
-from sqlalchemy.orm import Session
-from fastapi import HTTPException, APIRouter, Depends
-from db import TeacherDB, GroupDB, ClassRykDB, Base, get_db
-from pydantic import BaseModel 
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from fastapi import HTTPException, APIRouter, Depends, Query
+from db import TeacherDB, GroupDB, ClassRykDB, Base, get_async_db, unique_violation_detail
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
-import bcrypt
 from websocket import notify_disconnect_user  # Импортируем функцию
+from hashing import hash_password, verify_password
+from auth import invalidate_principal, revoke_user_tokens
+from resolvers import get_child_or_404
 
 router = APIRouter()
 
@@ -19,25 +24,83 @@ class Item(BaseModel):
     gmail: str
     vk: str
 
+# Модели ответов: отдаём только нужные поля (без пароля и служебных атрибутов ORM)
+class GroupOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
 
-def hash_password(password: str) -> str:
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed_password.decode('utf-8')
+    id: int
+    name: Optional[str] = None
+    teacher_id: Optional[int] = None
+
+class ClassRykOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: Optional[str] = None
+    teacher_id: Optional[int] = None
+
+class TeacherOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: Optional[str] = None
+    fullname: Optional[str] = None
+    role: Optional[str] = None
+    login: Optional[str] = None
+    gmail: Optional[str] = None
+    vk: Optional[str] = None
+
+class TeacherDetail(TeacherOut):
+    classryk: list[ClassRykOut] = []
+
+class MessageResponse(BaseModel):
+    message: str
+
+class TeacherResponse(BaseModel):
+    message: str
+    user: TeacherOut
+
+class TeacherDetailResponse(BaseModel):
+    message: str
+    user: TeacherDetail
+
+class TeacherListResponse(BaseModel):
+    message: str
+    users: list[TeacherOut]
+    next_cursor: Optional[int] = None
+
+class GroupsResponse(BaseModel):
+    message: str
+    group: list[GroupOut]
+
+class GroupResponse(BaseModel):
+    message: str
+    group: GroupOut
+
+class ClassryksListResponse(BaseModel):
+    message: str
+    classryk: list[ClassRykOut]
+
+class ClassryksResponse(BaseModel):
+    message: str
+    classryks: ClassRykOut
+
+
+@router.post("/teachers/", response_model=TeacherResponse)
+async def register_teacher(
+    item: Item,
+    upsert: bool = False,  # при повторном импорте обновить учителя с тем же логином
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Повторный импорт: существующего учителя обновляем, не хэшируя пароль заново
+    if upsert:
+        existing = await db.scalar(select(TeacherDB).where(TeacherDB.login == item.login))
+        if existing is not None:
+            user = await _update_teacher(existing, item, db)
+            return {"message": "Учитель обновлен", "user": user}
 
-@router.post("/teachers/")
-async def register_teacher(item: Item, db: Session = Depends(get_db)):
-    # Проверка уникальности в базе данных
-    existing_user = db.query(TeacherDB).filter(TeacherDB.gmail == item.gmail).first()
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Gmail уже используется")
-    
-    existing_vk = db.query(TeacherDB).filter(TeacherDB.vk == item.vk).first()
-    if existing_vk:
-        raise HTTPException(status_code=400, detail="VK уже используется")
-    
     # Хэшируем пароль перед сохранением
-    hashed_password = hash_password(item.password)
+    hashed_password = await hash_password(item.password)
 
     # Создаем нового пользователя
     user = TeacherDB(
@@ -49,42 +112,90 @@ async def register_teacher(item: Item, db: Session = Depends(get_db)):
         gmail=item.gmail, 
         vk=item.vk, 
     )
+    # Уникальность login/gmail/vk проверяют индексы БД, отдельные SELECT не нужны
     db.add(user)
-    db.commit()
-    db.refresh(user)
-
-    return {"message": "Учитель успешно зарегистрирован", "user": item}
-
-@router.get("/teachers/")
-async def get_all_teachers(db: Session = Depends(get_db)):
-    # Получаем всех пользователей из базы данных
-    users = db.query(TeacherDB).all()
-    
-    # Преобразуем пользователей в формат, подходящий для возврата
-    return {"message": "Учителя получены", "users": users}
-
-@router.delete("/teachers/{id}/")
-async def del_teacher(id: int, db: Session = Depends(get_db)):
-    # Ищем учителя по id
-    user = db.query(TeacherDB).filter(TeacherDB.id == id).first()
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        if not upsert:
+            raise HTTPException(status_code=400, detail=unique_violation_detail(e))
+        # Учителя с этим логином успели создать параллельно; если его нет,
+        # конфликт по gmail/vk настоящий (SQLite сообщает только о первом индексе)
+        existing = await db.scalar(select(TeacherDB).where(TeacherDB.login == item.login))
+        if existing is None:
+            raise HTTPException(status_code=400, detail=unique_violation_detail(e))
+        user = await _update_teacher(existing, item, db)
+        return {"message": "Учитель обновлен", "user": user}
+
+    return {"message": "Учитель успешно зарегистрирован", "user": user}
+
+async def _update_teacher(user: TeacherDB, item: Item, db: AsyncSession) -> TeacherDB:
+    """Upsert: обновляет поля существующего учителя; хэш пароля меняется, только если
+    сменился сам пароль (иначе старые токены перестали бы подходить)"""
+    password_changed = not await verify_password(item.password, user.password)
+    if password_changed:
+        user.password = await hash_password(item.password)
+    user.name = item.name
+    user.fullname = item.fullname
+    user.gmail = item.gmail
+    user.vk = item.vk
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=unique_violation_detail(e))
+    if password_changed:
+        invalidate_principal("teacher", user.id)
+    return user
+
+@router.get("/teachers/", response_model=TeacherListResponse)
+async def get_all_teachers(
+    group: Optional[str] = None,
+    cursor: Optional[int] = None,  # id последнего учителя с предыдущей страницы
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Выбираем только нужные колонки (без пароля), сортировка по id стабильна
+    query = select(
+        TeacherDB.id, TeacherDB.name, TeacherDB.fullname, TeacherDB.role,
+        TeacherDB.login, TeacherDB.gmail, TeacherDB.vk,
+    ).order_by(TeacherDB.id).limit(limit)
+    if group is not None:
+        # Учителя, которые ведут указанную группу
+        query = query.where(TeacherDB.id.in_(select(GroupDB.teacher_id).where(GroupDB.name == group)))
+    if cursor is not None:
+        query = query.where(TeacherDB.id > cursor)
+
+    users = (await db.execute(query)).mappings().all()
+
+    # Курсор следующей страницы есть, только если страница заполнена целиком
+    next_cursor = users[-1]["id"] if len(users) == limit else None
+    return {"message": "Учителя получены", "users": users, "next_cursor": next_cursor}
+
+@router.delete("/teachers/{id}/", response_model=MessageResponse)
+async def del_teacher(id: int, db: AsyncSession = Depends(get_async_db)):
+    # Ищем учителя по id (группы и классы нужны ORM при удалении)
+    user = await db.get(TeacherDB, id, options=[selectinload(TeacherDB.group), selectinload(TeacherDB.classryk)])
 
     # Если учитель не найден, возвращаем ошибку
     if not user:
         raise HTTPException(status_code=404, detail="Учитель не найден")
 
     # Удаляем учителя
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
+    await revoke_user_tokens(db, "teacher", id)
 
     # Отправляем уведомление об отключении
     await notify_disconnect_user(user.id, user.name, "teacher")
     return {"message": f"Учитель удален"}
 
 
-@router.get("/teachers/{id}/")
-async def get_one_teacher(id: int, db: Session = Depends(get_db)):
+@router.get("/teachers/{id}/", response_model=TeacherDetailResponse)
+async def get_one_teacher(id: int, db: AsyncSession = Depends(get_async_db)):
     # Ищем студента по id
-    user = db.query(TeacherDB).filter(TeacherDB.id == id).first()
+    user = await db.get(TeacherDB, id, options=[selectinload(TeacherDB.classryk)])
 
     # Если студент не найден, возвращаем ошибку
     if not user:
@@ -103,10 +214,10 @@ class Updateteacher(BaseModel):
     vk: Optional[str] = None
     group: Optional[str] = None
 
-@router.put("/teachers/{id}/")
-async def put_teacher(id: int, teacher_data: Updateteacher, db: Session = Depends(get_db)):
+@router.put("/teachers/{id}/", response_model=TeacherResponse)
+async def put_teacher(id: int, teacher_data: Updateteacher, db: AsyncSession = Depends(get_async_db)):
     # Ищем студента по id
-    user = db.query(TeacherDB).filter(TeacherDB.id == id).first()
+    user = await db.get(TeacherDB, id)
 
     # Если студент не найден, возвращаем ошибку
     if not user:
@@ -120,15 +231,21 @@ async def put_teacher(id: int, teacher_data: Updateteacher, db: Session = Depend
     if teacher_data.login is not None:
         user.login = teacher_data.login
     if teacher_data.password is not None:
-        user.password = hash_password(teacher_data.password)
+        user.password = await hash_password(teacher_data.password)
     if teacher_data.gmail is not None:
         user.gmail = teacher_data.gmail
     if teacher_data.vk is not None:
         user.vk = teacher_data.vk
 
     # Сохраняем изменения в базе данных
-    db.commit()
-    db.refresh(user)
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=unique_violation_detail(e))
+    if teacher_data.password is not None:
+        invalidate_principal("teacher", id)
+    await db.refresh(user)
 
     return {"message": "Учитель обновлен", "user": user}
 
@@ -152,15 +269,15 @@ async def put_teacher(id: int, teacher_data: Updateteacher, db: Session = Depend
 
 
 
-@router.get("/teachers/{id}/group/")
-async def get_teacher_groups(id: int, db: Session = Depends(get_db)):
+@router.get("/teachers/{id}/group/", response_model=GroupsResponse)
+async def get_teacher_groups(id: int, db: AsyncSession = Depends(get_async_db)):
     # Ищем студента
-    user = db.query(TeacherDB).filter(TeacherDB.id == id).first()
+    user = await db.get(TeacherDB, id)
     if not user:
         raise HTTPException(status_code=404, detail="Учитель не найден")
 
     # Получаем предметы студента
-    groups = db.query(GroupDB).filter(GroupDB.teacher_id == id).all()
+    groups = (await db.scalars(select(GroupDB).where(GroupDB.teacher_id == id))).all()
     
     return {"message": "Группы получены","group": groups}
 
@@ -168,10 +285,10 @@ class GroupCreate(BaseModel):
     name: str
 
 
-@router.post("/teachers/{id}/groups/")
-async def add_teacher_group(id: int, group: GroupCreate, db: Session = Depends(get_db)):
+@router.post("/teachers/{id}/groups/", response_model=GroupResponse)
+async def add_teacher_group(id: int, group: GroupCreate, db: AsyncSession = Depends(get_async_db)):
 
-    user = db.query(TeacherDB).filter(TeacherDB.id == id).first()
+    user = await db.get(TeacherDB, id)
     if not user:
         raise HTTPException(status_code=404, detail="Учитель не найден")
 
@@ -182,48 +299,41 @@ async def add_teacher_group(id: int, group: GroupCreate, db: Session = Depends(g
     )
 
     db.add(new_group)
-    db.commit()
-    db.refresh(new_group)
+    await db.commit()
+    await db.refresh(new_group)
 
     return {"message": "Группа добавлена", "group": new_group}
 
 class GroupUpdate(BaseModel):
     name: Optional[str] = None
 
-@router.put("/teachers/{id}/groups/{group_id}/")
-async def update_group(id: int, group_id: int, group_data: GroupUpdate, db: Session = Depends(get_db)):
-    # Проверяем, существует ли студент
-    user = db.query(TeacherDB).filter(TeacherDB.id == id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Студент не найден")
-
-    # Проверяем, существует ли предмет и принадлежит ли он студенту
-    group = db.query(GroupDB).filter(GroupDB.id == group_id, GroupDB.teacher_id == id).first()
-    if not group:
-        raise HTTPException(status_code=404, detail="Группа не найдена или не принадлежит студенту")
+@router.put("/teachers/{id}/groups/{group_id}/", response_model=GroupResponse)
+async def update_group(id: int, group_id: int, group_data: GroupUpdate, db: AsyncSession = Depends(get_async_db)):
+    # Учитель и его группа одним запросом
+    group, = await get_child_or_404(
+        db, TeacherDB, id, GroupDB, GroupDB.teacher_id, group_id,
+        "Учитель не найден", "Группа не найдена или не принадлежит учителю",
+    )
 
     # Обновляем только переданные поля
     if group_data.name is not None:
         group.name = group_data.name
 
 
-    db.commit()
-    db.refresh(group)
+    await db.commit()
+    await db.refresh(group)
 
     return {"message": "Группы обновлены", "group": group}
 
-@router.delete("/teachers/{id}/groups/{group_id}/")
-async def delete_group(id: int, group_id: int, db: Session = Depends(get_db)):
-    user = db.query(TeacherDB).filter(TeacherDB.id == id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Учитель не найден")
-
-    group = db.query(GroupDB).filter(GroupDB.id == group_id, GroupDB.teacher_id == id).first()
-    if not group:
-        raise HTTPException(status_code=404, detail="Группа не найден или не прнадлежит учителю")
+@router.delete("/teachers/{id}/groups/{group_id}/", response_model=MessageResponse)
+async def delete_group(id: int, group_id: int, db: AsyncSession = Depends(get_async_db)):
+    group, = await get_child_or_404(
+        db, TeacherDB, id, GroupDB, GroupDB.teacher_id, group_id,
+        "Учитель не найден", "Группа не найдена или не принадлежит учителю",
+    )
 
-    db.delete(group)
-    db.commit()
+    await db.delete(group)
+    await db.commit()
 
     return {"message": "Группа удалена"}
 
@@ -247,15 +357,15 @@ async def delete_group(id: int, group_id: int, db: Session = Depends(get_db)):
 
 
 
-@router.get("/teachers/{id}/classwork/")
-async def get_teacher_classryks(id: int, db: Session = Depends(get_db)):
+@router.get("/teachers/{id}/classwork/", response_model=ClassryksListResponse)
+async def get_teacher_classryks(id: int, db: AsyncSession = Depends(get_async_db)):
     # Ищем студента
-    user = db.query(TeacherDB).filter(TeacherDB.id == id).first()
+    user = await db.get(TeacherDB, id)
     if not user:
         raise HTTPException(status_code=404, detail="Учитель не найден")
 
     # Получаем предметы студента
-    classryks = db.query(ClassRykDB).filter(ClassRykDB.teacher_id == id).all()
+    classryks = (await db.scalars(select(ClassRykDB).where(ClassRykDB.teacher_id == id))).all()
     
     return {"message": "Классное руководство получены","classryk": classryks}
 
@@ -263,10 +373,10 @@ class classryksCreate(BaseModel):
     name: str
 
 
-@router.post("/teachers/{id}/classwork/")
-async def add_teacher_classryks(id: int, classryks: classryksCreate, db: Session = Depends(get_db)):
+@router.post("/teachers/{id}/classwork/", response_model=ClassryksResponse)
+async def add_teacher_classryks(id: int, classryks: classryksCreate, db: AsyncSession = Depends(get_async_db)):
 
-    user = db.query(TeacherDB).filter(TeacherDB.id == id).first()
+    user = await db.get(TeacherDB, id)
     if not user:
         raise HTTPException(status_code=404, detail="Учитель не найден")
 
@@ -277,48 +387,41 @@ async def add_teacher_classryks(id: int, classryks: classryksCreate, db: Session
     )
 
     db.add(new_classryks)
-    db.commit()
-    db.refresh(new_classryks)
+    await db.commit()
+    await db.refresh(new_classryks)
 
     return {"message": "Классное руководство добавлено", "classryks": new_classryks}
 
 class classryksUpdate(BaseModel):
     name: Optional[str] = None
 
-@router.put("/teachers/{id}/classworks/{classryks_id}/")
-async def update_classryks(id: int, classryks_id: int, classryks_data: classryksUpdate, db: Session = Depends(get_db)):
-    # Проверяем, существует ли студент
-    user = db.query(TeacherDB).filter(TeacherDB.id == id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Студент не найден")
-
-    # Проверяем, существует ли предмет и принадлежит ли он студенту
-    classryk = db.query(ClassRykDB).filter(ClassRykDB.id == classryks_id, ClassRykDB.teacher_id == id).first()
-    if not classryk:
-        raise HTTPException(status_code=404, detail="Классное руководство не найдено или не принадлежит учителю")
+@router.put("/teachers/{id}/classworks/{classryks_id}/", response_model=ClassryksResponse)
+async def update_classryks(id: int, classryks_id: int, classryks_data: classryksUpdate, db: AsyncSession = Depends(get_async_db)):
+    # Учитель и его классное руководство одним запросом
+    classryk, = await get_child_or_404(
+        db, TeacherDB, id, ClassRykDB, ClassRykDB.teacher_id, classryks_id,
+        "Учитель не найден", "Классное руководство не найдено или не принадлежит учителю",
+    )
 
     # Обновляем только переданные поля
     if classryks_data.name is not None:
         classryk.name = classryks_data.name
 
 
-    db.commit()
-    db.refresh(classryk)
+    await db.commit()
+    await db.refresh(classryk)
 
     return {"message": "Группы обновлены", "classryks": classryk}
 
-@router.delete("/teachers/{id}/classworks/{classryks_id}/")
-async def delete_classryks(id: int, classryks_id: int, db: Session = Depends(get_db)):
-    user = db.query(TeacherDB).filter(TeacherDB.id == id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="Учитель не найден")
-
-    classryks = db.query(ClassRykDB).filter(ClassRykDB.id == classryks_id, ClassRykDB.teacher_id == id).first()
-    if not classryks:
-        raise HTTPException(status_code=404, detail="Классное руководство не найдено или не прнадлежит учителю")
+@router.delete("/teachers/{id}/classworks/{classryks_id}/", response_model=MessageResponse)
+async def delete_classryks(id: int, classryks_id: int, db: AsyncSession = Depends(get_async_db)):
+    classryks, = await get_child_or_404(
+        db, TeacherDB, id, ClassRykDB, ClassRykDB.teacher_id, classryks_id,
+        "Учитель не найден", "Классное руководство не найдено или не принадлежит учителю",
+    )
 
-    db.delete(classryks)
-    db.commit()
+    await db.delete(classryks)
+    await db.commit()
 
     return {"message": "Классное руководство удалено"}
 
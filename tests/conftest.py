@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+
+# Отдельная база и настройки для тестов: задаём до импорта модулей приложения,
+# settings.py читает переменные окружения раньше .env
+_tmp = tempfile.mkdtemp(prefix="kkts-tests-")
+DB_PATH = os.path.join(_tmp, "kkts.db")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{DB_PATH}",
+    "ASYNC_DATABASE_URL": f"sqlite+aiosqlite:///{DB_PATH}",
+    "AUTO_MIGRATE": "False",
+    "BACKUP_DIR": os.path.join(_tmp, "backups"),
+    "BACKUP_INTERVAL": "0",
+    "NOTIFY_BROKER": "memory",
+    "NOTIFY_DEBOUNCE": "0.05",
+    "REVOCATION_SYNC_INTERVAL": "3600",  # фоновые запросы не должны попадать в подсчёт
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+import db  # noqa: E402
+import main  # noqa: E402
+
+
+class QueryLog:
+    """SQL, которые приложение отправило в базу (через async_engine)"""
+
+    def __init__(self):
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        # executemany: для подсчёта и EXPLAIN достаточно первого набора параметров
+        if executemany and parameters and isinstance(parameters[0], (tuple, list, dict)):
+            parameters = parameters[0]
+        self.statements.append((statement, parameters))
+
+    def clear(self):
+        self.statements.clear()
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def rows(self) -> int:
+        """Сколько строк вернули записанные SELECT: повторяем их на той же базе"""
+        connection = sqlite3.connect(DB_PATH)
+        try:
+            return sum(
+                len(connection.execute(statement, parameters).fetchall())
+                for statement, parameters in self.statements
+                if statement.lstrip().upper().startswith("SELECT")
+            )
+        finally:
+            connection.close()
+
+
+@pytest.fixture(scope="session")
+def client():
+    # Схему создают только миграции, как и в работе
+    db.run_migrations()
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def queries(client):
+    log = QueryLog()
+    event.listen(db.async_engine.sync_engine, "before_cursor_execute", log._record)
+    yield log
+    event.remove(db.async_engine.sync_engine, "before_cursor_execute", log._record)
+
+
+_counter = 0
+
+
+def make_student(client, group="ИС-21", predmeti=None, password="p"):
+    """Регистрирует студента с уникальным логином; predmeti - {название: [оценки]}"""
+    global _counter
+    _counter += 1
+    login = f"student{_counter}"
+    body = {
+        "name": login, "fullname": login, "role": "student", "login": login, "password": password,
+        "gmail": f"{login}@mail", "vk": f"vk{login}", "group": group,
+        "ocenki": [
+            {"color": "c", "predmet": predmet, "attes": "a",
+             "ocenki": [{"name": "test", "data": "2025-01-10", "ocenka": mark} for mark in marks]}
+            for predmet, marks in (predmeti or {}).items()
+        ],
+    }
+    response = client.post("/students/", json=body)
+    assert response.status_code == 200, response.text
+    return response.json()["user"]["id"], login
+
+
+def make_teacher(client, password="p"):
+    global _counter
+    _counter += 1
+    login = f"teacher{_counter}"
+    response = client.post("/teachers/", json={
+        "name": login, "fullname": login, "role": "teacher", "login": login, "password": password,
+        "gmail": f"{login}@mail", "vk": f"vk{login}",
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["user"]["id"], login
+
+
+def login_headers(client, login, password="p"):
+    token = client.post("/auth/login", json={"login": login, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,38 @@
+import pytest
+
+from conftest import make_student, make_teacher, login_headers
+
+GROUP = "АН-71"
+
+
+@pytest.fixture(scope="module")
+def headers(client):
+    user_id, _ = make_student(client, group=GROUP, predmeti={"Экономика": [5]})  # январь 2025
+    subject_id = client.get(f"/students/{user_id}/").json()["user"]["predmeti"][0]["id"]
+    for data, mark in (("2025-02-03", 4), ("2025-02-28", 2), ("2025-03-31", 3)):
+        client.post(f"/students/{user_id}/subjects/{subject_id}/ocenki/",
+                    json={"name": "урок", "data": data, "ocenka": mark})
+    teacher_id, teacher_login = make_teacher(client)
+    client.post(f"/teachers/{teacher_id}/classwork/", json={"name": GROUP})
+    return login_headers(client, teacher_login)
+
+
+def _timeline(client, headers, query=""):
+    return client.get(f"/groups/{GROUP}/analytics/timeline/{query}", headers=headers)
+
+
+def test_timeline_filters_by_whole_months(client, headers):
+    response = _timeline(client, headers, "?month_from=2025-02&month_to=2025-03")
+    assert response.status_code == 200, response.text
+    months = {month["month"]: (month["count"], month["average"]) for month in response.json()["months"]}
+    # Оба крайних месяца целиком, включая 28 февраля и 31 марта
+    assert months == {"2025-02": (2, 3.0), "2025-03": (1, 3.0)}
+
+
+@pytest.mark.parametrize("query", ["?month_from=2025-13", "?month_to=2025-02-01", "?month_from=25-02"])
+def test_timeline_rejects_malformed_months(client, headers, query):
+    assert _timeline(client, headers, query).status_code == 422
+
+
+def test_timeline_rejects_reversed_period(client, headers):
+    assert _timeline(client, headers, "?month_from=2025-03&month_to=2025-02").status_code == 400
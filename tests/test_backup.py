@@ -0,0 +1,57 @@
+import gzip
+import os
+import sqlite3
+import tempfile
+
+import pytest
+
+import backup
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def _download(client) -> bytes:
+    response = client.get("/backup/")
+    assert response.status_code == 200, response.text
+    return response.content
+
+
+def _restore(client, content: bytes):
+    return client.post("/restore/", files={"file": ("kkts.db.gz", content, "application/gzip")})
+
+
+def test_backup_restores(client):
+    response = _restore(client, _download(client))
+    assert response.status_code == 200, response.text
+    assert client.get("/teachers/?limit=1").status_code == 200
+
+
+def test_restore_rejects_other_schema_version(client):
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        with open(path, "wb") as f:
+            f.write(gzip.decompress(_download(client)))
+        connection = sqlite3.connect(path)
+        connection.execute("UPDATE alembic_version SET version_num = 'old'")
+        connection.commit()
+        connection.close()
+        with open(path, "rb") as f:
+            response = _restore(client, gzip.compress(f.read()))
+    finally:
+        os.remove(path)
+    assert response.status_code == 400
+    assert "Версия схемы" in response.json()["detail"]
+
+
+@pytest.mark.skipif(fcntl is None, reason="блокировка воркеров работает через fcntl")
+def test_restore_refused_while_other_workers_run(client):
+    content = _download(client)
+    # Ещё один «воркер»: отдельный дескриптор с разделяемой блокировкой
+    with open(backup.WORKERS_LOCK_PATH, "a") as other:
+        fcntl.flock(other, fcntl.LOCK_SH)
+        assert _restore(client, content).status_code == 409
+    assert _restore(client, content).status_code == 200
@@ -0,0 +1,40 @@
+import asyncio
+
+from broker import SQLiteBroker
+
+# Два воркера на одной шине: событие должно дойти до другого процесса,
+# а отправитель получает его один раз (сразу из publish, но не повторно из опроса)
+
+POLL_INTERVAL = 0.01
+
+
+def test_sqlite_bus_delivers_to_other_worker_once(tmp_path):
+    path = str(tmp_path / "bus.sqlite3")
+
+    async def scenario():
+        first, second = SQLiteBroker(path, POLL_INTERVAL), SQLiteBroker(path, POLL_INTERVAL)
+        received = {"first": [], "second": []}
+
+        def recorder(name):
+            async def handler(event):
+                received[name].append(event)
+            return handler
+
+        await first.start(recorder("first"))
+        await second.start(recorder("second"))
+        try:
+            event = {"type": "group", "group": "ИС-21", "message": "hello"}
+            await first.publish(event)
+            deadline = asyncio.get_running_loop().time() + 5
+            while not received["second"] and asyncio.get_running_loop().time() < deadline:
+                await asyncio.sleep(POLL_INTERVAL)
+            # Ещё несколько циклов опроса: повтор у отправителя успел бы прийти
+            await asyncio.sleep(POLL_INTERVAL * 20)
+        finally:
+            await first.stop()
+            await second.stop()
+        return event, received
+
+    event, received = asyncio.run(scenario())
+    assert received["second"] == [event]
+    assert received["first"] == [event]
@@ -0,0 +1,51 @@
+import pytest
+
+from conftest import make_student
+
+
+@pytest.fixture
+def subject(client):
+    user_id, _ = make_student(client, group="ФК-61", predmeti={"Физкультура": [4]})
+    subject_id = client.get(f"/students/{user_id}/").json()["user"]["predmeti"][0]["id"]
+    return user_id, subject_id
+
+
+def _grade(**mark):
+    return {"name": "урок", "data": "2025-03-04", **mark}
+
+
+def _average(client, user_id, subject_id):
+    body = client.get(f"/students/{user_id}/subjects/{subject_id}/average/").json()
+    return body["average"], body["count"]
+
+
+@pytest.mark.parametrize("mark", [{"ocenka": 0}, {"ocenka": 6}, {}, {"ocenka": 5, "ocenka_text": "н"}])
+def test_invalid_marks_are_rejected(client, subject, mark):
+    user_id, subject_id = subject
+    response = client.post(f"/students/{user_id}/subjects/{subject_id}/ocenki/", json=_grade(**mark))
+    assert response.status_code == 422
+
+
+def test_batch_rejects_out_of_range_mark(client):
+    response = client.post("/students/ocenki/batch/", json={
+        "group": "ФК-61", "predmet": "Физкультура", "name": "КР",
+        "ocenki": [{"student_id": 1, "ocenka": 7, "data": "2025-03-04"}],
+    })
+    assert response.status_code == 422
+
+
+def test_text_mark_is_kept_and_not_averaged(client, subject):
+    user_id, subject_id = subject
+    response = client.post(f"/students/{user_id}/subjects/{subject_id}/ocenki/", json=_grade(ocenka_text="н"))
+    assert response.status_code == 200, response.text
+    ocenka = response.json()["ocenka"]
+    assert (ocenka["ocenka"], ocenka["ocenka_text"]) == (None, "н")
+    assert _average(client, user_id, subject_id) == (4, 1)
+
+    # «н» исправили на оценку - она входит в средний балл
+    client.put(f"/students/{user_id}/subjects/{subject_id}/ocenki/{ocenka['id']}/", json=_grade(ocenka=2))
+    assert _average(client, user_id, subject_id) == (3, 2)
+
+    # и обратно
+    client.put(f"/students/{user_id}/subjects/{subject_id}/ocenki/{ocenka['id']}/", json=_grade(ocenka_text="н"))
+    assert _average(client, user_id, subject_id) == (4, 1)
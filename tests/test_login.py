@@ -0,0 +1,24 @@
+import pytest
+
+import db
+import hashing
+from conftest import make_student, make_teacher
+
+
+@pytest.mark.parametrize("make_user", [make_student, make_teacher], ids=["student", "teacher"])
+def test_login_releases_connection_before_bcrypt(client, monkeypatch, make_user):
+    # При наплыве входов запросы ждут очереди bcrypt; если каждый держит соединение,
+    # пул заканчивается раньше и остальные запросы падают по pool_timeout
+    _, login = make_user(client)
+    checked_out = []
+    original = hashing._check
+
+    def check(*args):
+        checked_out.append(db.async_engine.sync_engine.pool.checkedout())
+        return original(*args)
+
+    monkeypatch.setattr(hashing, "_check", check)
+    response = client.post("/auth/login", json={"login": login, "password": "p"})
+
+    assert response.status_code == 200, response.text
+    assert checked_out == [0]
@@ -0,0 +1,157 @@
+import sqlite3
+
+import pytest
+from alembic import command
+
+import db
+import settings
+
+# Схема, которую создавал Base.metadata.create_all до появления миграций
+# (модели из первой версии db.py). Такие базы обновляются обычным upgrade head
+BASELINE_SCHEMA = """
+CREATE TABLE users (
+	id INTEGER NOT NULL, 
+	name VARCHAR, 
+	fullname VARCHAR, 
+	role VARCHAR, 
+	login VARCHAR, 
+	password VARCHAR, 
+	gmail VARCHAR, 
+	vk VARCHAR, 
+	"group" VARCHAR, 
+	srbal VARCHAR, 
+	PRIMARY KEY (id)
+);
+CREATE UNIQUE INDEX ix_users_gmail ON users (gmail);
+CREATE UNIQUE INDEX ix_users_login ON users (login);
+CREATE INDEX ix_users_id ON users (id);
+CREATE UNIQUE INDEX ix_users_vk ON users (vk);
+CREATE TABLE teachers (
+	id INTEGER NOT NULL, 
+	name VARCHAR, 
+	fullname VARCHAR, 
+	role VARCHAR, 
+	login VARCHAR, 
+	password VARCHAR, 
+	gmail VARCHAR, 
+	vk VARCHAR, 
+	PRIMARY KEY (id)
+);
+CREATE INDEX ix_teachers_id ON teachers (id);
+CREATE UNIQUE INDEX ix_teachers_gmail ON teachers (gmail);
+CREATE UNIQUE INDEX ix_teachers_login ON teachers (login);
+CREATE UNIQUE INDEX ix_teachers_vk ON teachers (vk);
+CREATE TABLE lessons (
+	id INTEGER NOT NULL, 
+	date VARCHAR, 
+	PRIMARY KEY (id)
+);
+CREATE INDEX ix_lessons_id ON lessons (id);
+CREATE TABLE predmeti (
+	id INTEGER NOT NULL, 
+	color VARCHAR, 
+	predmet VARCHAR, 
+	attes VARCHAR, 
+	srbal INTEGER, 
+	user_id INTEGER, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_predmeti_color ON predmeti (color);
+CREATE INDEX ix_predmeti_predmet ON predmeti (predmet);
+CREATE INDEX ix_predmeti_id ON predmeti (id);
+CREATE TABLE "group" (
+	id INTEGER NOT NULL, 
+	name VARCHAR, 
+	teacher_id INTEGER, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(teacher_id) REFERENCES teachers (id)
+);
+CREATE INDEX ix_group_name ON "group" (name);
+CREATE INDEX ix_group_id ON "group" (id);
+CREATE TABLE classryk (
+	id INTEGER NOT NULL, 
+	name VARCHAR, 
+	teacher_id INTEGER, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(teacher_id) REFERENCES teachers (id)
+);
+CREATE INDEX ix_classryk_id ON classryk (id);
+CREATE INDEX ix_classryk_name ON classryk (name);
+CREATE TABLE session (
+	id INTEGER NOT NULL, 
+	name VARCHAR, 
+	"group" VARCHAR, 
+	teacher VARCHAR, 
+	teacher2 VARCHAR, 
+	start VARCHAR, 
+	"end" VARCHAR, 
+	clases VARCHAR, 
+	adress VARCHAR, 
+	color VARCHAR, 
+	lessons_id INTEGER, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(lessons_id) REFERENCES lessons (id)
+);
+CREATE INDEX ix_session_id ON session (id);
+CREATE TABLE ocenki (
+	id INTEGER NOT NULL, 
+	name VARCHAR, 
+	data VARCHAR, 
+	ocenka VARCHAR, 
+	predmet_id INTEGER, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(predmet_id) REFERENCES predmeti (id)
+);
+CREATE INDEX ix_ocenki_id ON ocenki (id);
+"""
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    path = str(tmp_path / "old.db")
+    # alembic/env.py берёт адрес базы из settings
+    monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite:///{path}")
+    return path
+
+
+def test_upgrade_of_create_all_database(database):
+    connection = sqlite3.connect(database)
+    connection.executescript(BASELINE_SCHEMA)
+    connection.executescript("""
+        INSERT INTO users (id, login, "group", srbal) VALUES (1, 'old', 'ИС-1', '4');
+        INSERT INTO predmeti (id, predmet, user_id) VALUES (1, 'Математика', 1);
+        INSERT INTO ocenki (name, data, ocenka, predmet_id) VALUES ('t', '10.01.2025', '4', 1);
+        INSERT INTO lessons (id, date) VALUES (1, '2025-01-10');
+        INSERT INTO session (name, "group", start, "end", lessons_id) VALUES ('n', 'ИС-1', '09:00', '10:30', 1);
+    """)
+    connection.commit()
+
+    command.upgrade(db._alembic_config(), "head")
+
+    tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {"revoked_tokens", "group_stats"} <= tables
+    assert connection.execute("SELECT version_num FROM alembic_version").fetchone()[0] == db.migration_head()
+    assert connection.execute("SELECT data, typeof(ocenka) FROM ocenki").fetchone() == ("2025-01-10", "integer")
+    assert connection.execute("SELECT ocenki_sum, ocenki_count FROM users").fetchone() == (4, 1)
+    connection.close()
+
+
+def test_unparseable_schedule_values_stop_the_upgrade(database):
+    connection = sqlite3.connect(database)
+    connection.executescript(BASELINE_SCHEMA)
+    connection.executescript("""
+        INSERT INTO lessons (id, date) VALUES (1, 'понедельник');
+        INSERT INTO session (start, "end", lessons_id) VALUES ('9 утра', '10:30', 1);
+    """)
+    connection.commit()
+
+    with pytest.raises(RuntimeError) as error:
+        command.upgrade(db._alembic_config(), "head")
+    assert "lessons.date id=1: 'понедельник'" in str(error.value)
+    assert "session.start id=1: '9 утра'" in str(error.value)
+    # Схема не тронута, значения на месте - их можно исправить и повторить
+    assert connection.execute("SELECT version_num FROM alembic_version").fetchone()[0] == "5d2e8b7c1f03"
+    assert connection.execute("SELECT date FROM lessons").fetchone()[0] == "понедельник"
+    assert "date_new" not in {row[1] for row in connection.execute("PRAGMA table_info(lessons)")}
+    connection.close()
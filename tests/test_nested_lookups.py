@@ -0,0 +1,92 @@
+import re
+
+import pytest
+
+from conftest import make_student, make_teacher
+
+# Вложенный ресурс ищется одним запросом родитель LEFT JOIN ребёнок (resolvers.py):
+# и «нет родителя», и «нет ребёнка» стоят ровно один запрос, а при успехе
+# родитель отдельным SELECT не загружается
+
+MISSING = 999999
+
+
+@pytest.fixture(scope="module")
+def data(client):
+    user_id, _ = make_student(client, group="ТМ-41", predmeti={"Химия": [4]})
+    subject = client.get(f"/students/{user_id}/").json()["user"]["predmeti"][0]
+    teacher_id, teacher_login = make_teacher(client)
+    group_id = client.post(f"/teachers/{teacher_id}/groups/", json={"name": "ТМ-41"}).json()["group"]["id"]
+    classryk_id = client.post(f"/teachers/{teacher_id}/classwork/", json={"name": "ТМ-41"}).json()["classryks"]["id"]
+    lesson = client.post("/lesson/", json={"date": "2025-05-12"}).json()
+    lesson_id = lesson[list(lesson)[-1]]["id"]
+    session_id = client.post(f"/lesson/{lesson_id}/session/", json={
+        "name": "n", "group": "ТМ-41", "teacher": teacher_login, "start": "09:00", "end": "10:30",
+        "clases": "1", "adress": "a", "color": "c",
+    }).json()["session"]["id"]
+    return {
+        "user": user_id, "subject": subject["id"], "ocenka": subject["ocenki"][0]["id"],
+        "teacher": teacher_id, "group": group_id, "classryk": classryk_id,
+        "lesson": lesson_id, "session": session_id,
+    }
+
+
+GRADE = {"name": "test", "data": "2025-02-01", "ocenka": 4}
+
+# (метод, шаблон пути, тело, родительская таблица, параметр родителя)
+NESTED = {
+    "update subject": ("put", "/students/{user}/subjects/{subject}/", {"color": "x"}, "users", "user"),
+    "grades of subject": ("get", "/students/{user}/subjects/{subject}/ocenki/", None, "users", "user"),
+    "create grade": ("post", "/students/{user}/subjects/{subject}/ocenki/", GRADE, "users", "user"),
+    "update grade": ("put", "/students/{user}/subjects/{subject}/ocenki/{ocenka}/", GRADE, "users", "user"),
+    "update group": ("put", "/teachers/{teacher}/groups/{group}/", {"name": "ТМ-41"}, "teachers", "teacher"),
+    "update classwork": ("put", "/teachers/{teacher}/classworks/{classryk}/", {"name": "ТМ-41"}, "teachers", "teacher"),
+    "update session": ("put", "/lesson/{lesson}/session/{session}/", {"adress": "b"}, "lessons", "lesson"),
+}
+
+
+def _request(client, method, path, body):
+    return client.request(method, path, json=body) if body is not None else client.request(method, path)
+
+
+def _child_param(template):
+    # Последний параметр пути - искомый ребёнок
+    return re.findall(r"\{(\w+)\}", template)[-1]
+
+
+@pytest.mark.parametrize("route", NESTED)
+@pytest.mark.parametrize("missing", ["parent", "child"])
+def test_not_found_costs_one_query(client, data, queries, route, missing):
+    method, template, body, _, parent = NESTED[route]
+    ids = dict(data)
+    ids[parent if missing == "parent" else _child_param(template)] = MISSING
+
+    response = _request(client, method, template.format(**ids), body)
+
+    assert response.status_code == 404
+    assert queries.count == 1, queries.statements
+
+
+@pytest.mark.parametrize("route", NESTED)
+def test_parent_is_not_loaded_separately(client, data, queries, route):
+    method, template, body, parent_table, _ = NESTED[route]
+
+    response = _request(client, method, template.format(**data), body)
+
+    assert response.status_code == 200, response.text
+    lookups = [statement for statement, _ in queries.statements if re.search(rf"\bFROM {parent_table}\b", statement)]
+    # Родитель встречается только в одном запросе - и там же соединён с ребёнком
+    assert len(lookups) == 1, lookups
+    assert "JOIN" in lookups[0]
+
+
+def test_nested_delete_deep_chain_is_one_lookup(client, data, queries):
+    # Оценка по цепочке студент -> предмет -> оценка: при любом промахе один запрос
+    for path in (
+        f"/students/{MISSING}/subjects/{data['subject']}/ocenki/{data['ocenka']}/",
+        f"/students/{data['user']}/subjects/{MISSING}/ocenki/{data['ocenka']}/",
+        f"/students/{data['user']}/subjects/{data['subject']}/ocenki/{MISSING}/",
+    ):
+        queries.clear()
+        assert client.delete(path).status_code == 404
+        assert queries.count == 1
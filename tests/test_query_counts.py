@@ -0,0 +1,73 @@
+import pytest
+
+import auth
+from conftest import make_student, make_teacher, login_headers
+
+# Число запросов и прочитанных строк по маршрутам: связи грузятся лениво, каждый
+# эндпоинт сам выбирает, что ему нужно. Если где-то вернётся жадная загрузка
+# (lazy="joined") или запрос в цикле, эти числа вырастут
+
+GROUP = "ПК-11"
+STUDENTS = 3
+SUBJECTS = {"Алгебра": [5, 4, 3], "История": [4, 4, 5]}  # у каждого студента
+GRADES = sum(len(marks) for marks in SUBJECTS.values())
+
+
+@pytest.fixture(scope="module")
+def data(client):
+    students = [make_student(client, group=GROUP, predmeti=SUBJECTS) for _ in range(STUDENTS)]
+    user_id, login = students[0]
+    teacher_id, teacher_login = make_teacher(client)
+    client.post(f"/teachers/{teacher_id}/groups/", json={"name": GROUP})
+    client.post(f"/teachers/{teacher_id}/classwork/", json={"name": GROUP})
+    lesson = client.post("/lesson/", json={"date": "2025-04-07"}).json()
+    lesson_id = lesson[list(lesson)[-1]]["id"]
+    for start in ("09:00", "10:40"):
+        client.post(f"/lesson/{lesson_id}/session/", json={
+            "name": "n", "group": GROUP, "teacher": teacher_login, "start": start, "end": "12:00",
+            "clases": "1", "adress": "a", "color": "c",
+        })
+    return {
+        "user_id": user_id, "teacher_id": teacher_id, "lesson_id": lesson_id,
+        "login": login, "student_headers": login_headers(client, login),
+    }
+
+
+# маршрут -> (запросов, строк)
+ROUTES = {
+    # Список - только колонки студентов, без предметов и оценок
+    "student list": (lambda c, d: c.get(f"/students/?group={GROUP}"), 1, STUDENTS),
+    # Карточка: студент, его предметы, их оценки (selectinload)
+    "student detail": (lambda c, d: c.get(f"/students/{d['user_id']}/"), 3, 1 + len(SUBJECTS) + GRADES),
+    "teacher list": (lambda c, d: c.get(f"/teachers/?cursor={d['teacher_id'] - 1}&limit=1"), 1, 1),
+    "teacher detail": (lambda c, d: c.get(f"/teachers/{d['teacher_id']}/"), 2, 2),
+    "lesson detail": (lambda c, d: c.get(f"/lesson/{d['lesson_id']}/"), 2, 3),
+    # Изменение и вход загружают одну строку пользователя, без его коллекций
+    "student update": (lambda c, d: c.put(f"/students/{d['user_id']}/", json={"vk": f"vk-upd-{d['user_id']}"}), 3, 2),
+    # Вход ищет логин среди учителей, затем среди студентов
+    "login": (lambda c, d: c.post("/auth/login", json={"login": d["login"], "password": "p"}), 2, 1),
+    # Проверка токена без кэша: один запрос отпечатка пароля, затем предметы с оценками
+    "subjects with token": (
+        lambda c, d: c.get(f"/students/{d['user_id']}/subjects/", headers=d["student_headers"]),
+        3, 1 + len(SUBJECTS) + GRADES,
+    ),
+}
+
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_route_query_and_row_counts(client, data, queries, route):
+    request, expected_queries, expected_rows = ROUTES[route]
+    auth.clear_principal_cache()
+    response = request(client, data)
+    assert response.status_code == 200, response.text
+    assert queries.count == expected_queries, queries.statements
+    assert queries.rows() == expected_rows
+
+
+def test_cached_token_does_not_touch_database(client, data, queries):
+    auth.clear_principal_cache()
+    client.get(f"/students/{data['user_id']}/subjects/", headers=data["student_headers"])
+    queries.clear()
+    client.get(f"/students/{data['user_id']}/subjects/", headers=data["student_headers"])
+    # Остались только предметы и оценки; пользователь взят из кэша
+    assert queries.count == 2
@@ -0,0 +1,110 @@
+import sqlite3
+
+import pytest
+
+from conftest import DB_PATH, make_student, make_teacher, login_headers
+
+# Каждый горячий запрос роутеров должен идти по индексу: прогоняем маршрут,
+# записываем его SQL и проверяем EXPLAIN QUERY PLAN - ни одного SCAN таблицы
+
+
+def _plan(statement, parameters):
+    connection = sqlite3.connect(DB_PATH)
+    try:
+        return [row[3] for row in connection.execute("EXPLAIN QUERY PLAN " + statement, parameters)]
+    finally:
+        connection.close()
+
+
+def _scans(queries):
+    found = []
+    for statement, parameters in queries.statements:
+        if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT")):
+            continue
+        for detail in _plan(statement, parameters):
+            if detail.startswith("SCAN"):
+                found.append((detail, statement))
+    return found
+
+
+@pytest.fixture(scope="module")
+def data(client):
+    user_id, login = make_student(client, group="ИС-31", predmeti={"Математика": [5, 4], "Физика": [3]})
+    other_id, _ = make_student(client, group="ИС-31", predmeti={"Математика": [2]})
+    subjects = client.get(f"/students/{user_id}/").json()["user"]["predmeti"]
+    subject_id = subjects[0]["id"]
+    ocenka_id = subjects[0]["ocenki"][0]["id"]
+
+    teacher_id, teacher_login = make_teacher(client)
+    group_id = client.post(f"/teachers/{teacher_id}/groups/", json={"name": "ИС-31"}).json()["group"]["id"]
+    classryk_id = client.post(f"/teachers/{teacher_id}/classwork/", json={"name": "ИС-31"}).json()["classryks"]["id"]
+
+    lesson = client.post("/lesson/", json={"date": "2025-03-03"}).json()
+    lesson_id = lesson[list(lesson)[-1]]["id"]
+    session_id = client.post(f"/lesson/{lesson_id}/session/", json={
+        "name": "n", "group": "ИС-31", "teacher": teacher_login, "start": "09:00", "end": "10:30",
+        "clases": "101", "adress": "a", "color": "c",
+    }).json()["session"]["id"]
+
+    return {
+        "user_id": user_id, "other_id": other_id, "login": login, "subject_id": subject_id, "ocenka_id": ocenka_id,
+        "teacher_id": teacher_id, "teacher_login": teacher_login, "group_id": group_id, "classryk_id": classryk_id,
+        "lesson_id": lesson_id, "session_id": session_id,
+        "student_headers": login_headers(client, login),
+        "teacher_headers": login_headers(client, teacher_login),
+    }
+
+
+def _grade(value=4):
+    return {"name": "test", "data": "2025-02-01", "ocenka": value}
+
+
+ROUTES = {
+    # Списки: фильтр по группе и курсорная пагинация
+    "students by group": lambda c, d: c.get("/students/?group=ИС-31&limit=10"),
+    "students next page": lambda c, d: c.get(f"/students/?group=ИС-31&cursor={d['user_id']}&limit=10"),
+    "teachers next page": lambda c, d: c.get(f"/teachers/?cursor={d['teacher_id'] - 1}&limit=10"),
+    # Детальные карточки и их коллекции (selectinload)
+    "student detail": lambda c, d: c.get(f"/students/{d['user_id']}/"),
+    "teacher detail": lambda c, d: c.get(f"/teachers/{d['teacher_id']}/"),
+    "student subjects as teacher": lambda c, d: c.get(f"/students/{d['user_id']}/subjects/", headers=d["teacher_headers"]),
+    "teacher groups": lambda c, d: c.get(f"/teachers/{d['teacher_id']}/group/"),
+    "teacher classwork": lambda c, d: c.get(f"/teachers/{d['teacher_id']}/classwork/"),
+    # Вложенные ресурсы через resolvers
+    "grades of subject": lambda c, d: c.get(f"/students/{d['user_id']}/subjects/{d['subject_id']}/ocenki/"),
+    "grade create": lambda c, d: c.post(f"/students/{d['user_id']}/subjects/{d['subject_id']}/ocenki/", json=_grade()),
+    "grade update": lambda c, d: c.put(
+        f"/students/{d['user_id']}/subjects/{d['subject_id']}/ocenki/{d['ocenka_id']}/", json=_grade(5)),
+    "grade missing": lambda c, d: c.delete(f"/students/{d['user_id']}/subjects/{d['subject_id']}/ocenki/999999/"),
+    "subject update": lambda c, d: c.put(f"/students/{d['user_id']}/subjects/{d['subject_id']}/", json={"color": "z"}),
+    "subject average": lambda c, d: c.get(f"/students/{d['user_id']}/subjects/{d['subject_id']}/average/"),
+    "student averages": lambda c, d: c.get(f"/students/{d['user_id']}/averages/"),
+    "group update": lambda c, d: c.put(f"/teachers/{d['teacher_id']}/groups/{d['group_id']}/", json={"name": "ИС-31"}),
+    "classwork update": lambda c, d: c.put(
+        f"/teachers/{d['teacher_id']}/classworks/{d['classryk_id']}/", json={"name": "ИС-31"}),
+    "session update": lambda c, d: c.put(f"/lesson/{d['lesson_id']}/session/{d['session_id']}/", json={"adress": "b"}),
+    # Расписание за период (каждый раз другой период, чтобы не попасть в кэш)
+    "schedule by group": lambda c, d: c.get("/lesson/schedule/?date_from=2025-03-01&date_to=2025-03-07&group=ИС-31"),
+    "schedule by teacher": lambda c, d: c.get(
+        f"/lesson/schedule/?date_from=2025-03-02&date_to=2025-03-08&teacher={d['teacher_login']}"),
+    "lesson sessions": lambda c, d: c.get(f"/lesson/{d['lesson_id']}/session/"),
+    # Пакет оценок: предметы студентов одним запросом, средние и сводка группы (upsert)
+    "grade batch": lambda c, d: c.post("/students/ocenki/batch/", json={
+        "group": "ИС-31", "predmet": "Математика", "name": "КР",
+        "ocenki": [{"student_id": d["user_id"], "ocenka": 5, "data": "2025-02-02"},
+                   {"student_id": d["other_id"], "ocenka": 3, "data": "2025-02-02"}],
+    }),
+    "group analytics": lambda c, d: c.get("/groups/ИС-31/analytics/", headers=d["teacher_headers"]),
+    "group timeline": lambda c, d: c.get(
+        "/groups/ИС-31/analytics/timeline/?predmet=Математика&month_from=2025-01&month_to=2025-06", headers=d["teacher_headers"]),
+    # Авторизация: проверка пароля и токена
+    "login": lambda c, d: c.post("/auth/login", json={"login": d["login"], "password": "p"}),
+}
+
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_route_uses_indexes(client, data, queries, route):
+    response = ROUTES[route](client, data)
+    assert response.status_code in (200, 404), response.text
+    assert queries.count > 0
+    assert _scans(queries) == []
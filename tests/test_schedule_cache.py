@@ -0,0 +1,65 @@
+import asyncio
+import datetime
+import sqlite3
+
+import pytest
+
+import schedule_cache
+import websocket
+from conftest import DB_PATH
+
+DAY = datetime.date(2025, 6, 2)
+KEY = (DAY, DAY, "ИС-41", None, None)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    schedule_cache.clear()
+    yield
+    schedule_cache.clear()
+
+
+def test_read_started_before_invalidation_is_not_stored():
+    read_generation = schedule_cache.generation()
+    # Пока ответ собирался, пару изменили
+    schedule_cache.invalidate_session(DAY, "ИС-41", "Иванов", None, "101")
+    schedule_cache.set_schedule(KEY, b"stale", read_generation)
+    assert schedule_cache.get_schedule(KEY) is None
+
+    schedule_cache.set_schedule(KEY, b"fresh", schedule_cache.generation())
+    assert schedule_cache.get_schedule(KEY) == b"fresh"
+
+
+def test_entries_expire(monkeypatch):
+    monkeypatch.setattr(schedule_cache, "SCHEDULE_CACHE_TTL", 0)
+    schedule_cache.set_schedule(KEY, b"body", schedule_cache.generation())
+    assert schedule_cache.get_schedule(KEY) is None
+
+
+def test_invalidation_from_other_worker_arrives_through_broker():
+    schedule_cache.set_schedule(KEY, b"body", schedule_cache.generation())
+    other = (DAY, DAY, "ИС-42", None, None)
+    schedule_cache.set_schedule(other, b"other", schedule_cache.generation())
+
+    asyncio.run(websocket._deliver({
+        "type": "schedule_cache", "session": [DAY.isoformat(), "ИС-41", "Иванов", None, "101"],
+    }))
+    assert schedule_cache.get_schedule(KEY) is None
+    assert schedule_cache.get_schedule(other) == b"other"
+
+    asyncio.run(websocket._deliver({"type": "schedule_cache", "session": None}))
+    assert schedule_cache.get_schedule(other) is None
+
+
+def test_session_on_day_without_date(client):
+    # Дни без даты остаются от старых баз, в выборки за период они не попадают
+    connection = sqlite3.connect(DB_PATH)
+    lesson_id = connection.execute("INSERT INTO lessons (date) VALUES (NULL)").lastrowid
+    connection.commit()
+    connection.close()
+
+    response = client.post(f"/lesson/{lesson_id}/session/", json={
+        "name": "n", "group": "ИС-41", "teacher": "Иванов", "start": "09:00", "end": "10:30",
+        "clases": "101", "adress": "a", "color": "c",
+    })
+    assert response.status_code == 200, response.text
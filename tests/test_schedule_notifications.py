@@ -0,0 +1,85 @@
+import json
+import time
+
+import pytest
+
+import websocket
+from broker import broker
+
+# Правка расписания из 40 пар: без объединения каждая пара давала бы по сообщению
+# группе, учителю и второму учителю (120 событий); с окном NOTIFY_DEBOUNCE -
+# одно событие на каждого получателя со списком id пар
+
+SESSIONS = 40
+GROUP = "ЭК-51"
+TEACHERS = ("Иванов И.И.", "Петров П.П.")
+
+
+@pytest.fixture
+def published(client, monkeypatch):
+    # Изменения из предыдущих тестов ещё могут ждать окна - дожидаемся их отправки до подмены
+    deadline = time.monotonic() + 5
+    while websocket._flush_task is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    events = []
+
+    async def publish(event):
+        events.append(event)
+
+    monkeypatch.setattr(broker, "publish", publish)
+    # Окно шире, чем время всей правки через TestClient
+    monkeypatch.setattr(websocket, "NOTIFY_DEBOUNCE", 1.0)
+    return events
+
+
+def _schedule_events(events, expected, timeout=5.0):
+    """Ждёт, пока окно закроется, и возвращает события расписания по получателям"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        found = [json.loads(event["message"]) for event in events if event["type"] == "group"]
+        if len(found) >= expected:
+            break
+        time.sleep(0.05)
+    return {event["target"]: event for event in found}
+
+
+def test_bulk_edit_of_40_sessions_emits_one_event_per_target(client, published):
+    lesson = client.post("/lesson/", json={"date": "2025-09-01"}).json()
+    lesson_id = lesson[list(lesson)[-1]]["id"]
+
+    session_ids = []
+    for number in range(SESSIONS):
+        response = client.post(f"/lesson/{lesson_id}/session/", json={
+            "name": f"пара {number}", "group": GROUP, "teacher": TEACHERS[number % 2],
+            "start": "09:00", "end": "10:30", "clases": str(number), "adress": "a", "color": "c",
+        })
+        session_ids.append(response.json()["session"]["id"])
+
+    created = _schedule_events(published, expected=3)
+    assert set(created) == {GROUP, *TEACHERS}
+    assert created[GROUP]["created"] == sorted(session_ids)
+    assert created[TEACHERS[0]]["created"] == sorted(session_ids[0::2])
+
+    published.clear()
+    for session_id in session_ids:
+        client.put(f"/lesson/{lesson_id}/session/{session_id}/", json={"adress": "b"})
+
+    updated = _schedule_events(published, expected=3)
+    schedule_events = [event for event in published if event["type"] == "group"]
+    assert len(schedule_events) == 3  # вместо 3 * 40
+    assert updated[GROUP]["updated"] == sorted(session_ids)
+    assert sorted(updated[TEACHERS[0]]["updated"] + updated[TEACHERS[1]]["updated"]) == sorted(session_ids)
+
+
+def test_notifications_survive_restart(client, published):
+    async def restart_between_changes():
+        websocket.notify_schedule_change("created", 1, GROUP)
+        await websocket.stop_notifications()  # отправляет накопленное
+        await websocket.start_notifications()
+        websocket.notify_schedule_change("created", 2, GROUP)
+
+    client.portal.call(restart_between_changes)
+
+    _schedule_events(published, expected=2)
+    created = [json.loads(event["message"])["created"] for event in published if event["type"] == "group"]
+    assert created == [[1], [2]]
@@ -0,0 +1,54 @@
+import os
+import sqlite3
+import tempfile
+
+import snapshots
+from conftest import DB_PATH, make_teacher
+
+
+def _teachers(path):
+    connection = sqlite3.connect(path)
+    try:
+        assert connection.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        return connection.execute("SELECT id, login FROM teachers ORDER BY id").fetchall()
+    finally:
+        connection.close()
+
+
+def _materialized(name):
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        snapshots._materialize(name, path)
+        return _teachers(path)
+    finally:
+        os.remove(path)
+
+
+def test_full_and_incremental_snapshots_restore_the_database(client):
+    snapshots._store_if_due(force=True)
+    make_teacher(client)
+    increment = snapshots._store_if_due(force=True)
+
+    assert increment.endswith(snapshots.INC_SUFFIX)
+    assert _materialized(increment) == _teachers(DB_PATH)
+    # Снимки читают файл базы напрямую, временных копий рядом с базой не остаётся
+    assert not [name for name in os.listdir(os.path.dirname(DB_PATH)) if name.endswith(".snapshot")]
+
+
+def test_increment_holds_only_changed_pages(client):
+    snapshots._store_if_due(force=True)
+    unchanged = snapshots._store_if_due(force=True)
+    assert unchanged.endswith(snapshots.INC_SUFFIX)
+    # Только заголовок: база между снимками не менялась
+    assert _materialized(unchanged) == _teachers(DB_PATH)
+    assert os.path.getsize(snapshots._path(unchanged)) < 100
+
+
+def test_due_check_is_repeated_under_the_lock(client, monkeypatch):
+    snapshots._store_if_due(force=True)
+    before = snapshots._names()
+    # Снимок только что сделан (другим воркером) - повторять его не нужно
+    monkeypatch.setattr(snapshots, "BACKUP_INTERVAL", 3600)
+    assert snapshots._store_if_due() is None
+    assert snapshots._names() == before
@@ -0,0 +1,67 @@
+import pytest
+
+import hashing
+from conftest import login_headers
+
+
+def _body(login, password="p", **fields):
+    return {
+        "name": login, "fullname": login, "login": login, "password": password,
+        "gmail": f"{login}@mail", "vk": f"vk{login}", **fields,
+    }
+
+
+PEOPLE = {
+    "student": ("/students/", lambda login, password="p": _body(login, password, role="student", group="УП-81")),
+    "teacher": ("/teachers/", lambda login, password="p": _body(login, password, role="teacher")),
+}
+
+
+@pytest.fixture
+def bcrypt_calls(monkeypatch):
+    calls = []
+    for name in ("_hash", "_check"):
+        original = getattr(hashing, name)
+        monkeypatch.setattr(hashing, name, lambda *args, _f=original, _n=name: calls.append(_n) or _f(*args))
+    return calls
+
+
+def _register(client, kind, login):
+    """Регистрирует пользователя; возвращает id студента, чьи предметы ему можно читать"""
+    path, body = PEOPLE[kind]
+    user_id = client.post(path, json=body(login)).json()["user"]["id"]
+    if kind == "student":
+        return user_id  # студент видит только свои предметы
+    return client.post("/students/", json=PEOPLE["student"][1](f"{login}-student")).json()["user"]["id"]
+
+
+def _token_works(client, student_id, headers):
+    return client.get(f"/students/{student_id}/subjects/", headers=headers).status_code == 200
+
+
+@pytest.mark.parametrize("kind", PEOPLE)
+def test_reimport_with_same_password_keeps_tokens(client, bcrypt_calls, kind):
+    path, body = PEOPLE[kind]
+    login = f"upsert-{kind}"
+    student_id = _register(client, kind, login)
+    headers = login_headers(client, login)
+    assert _token_works(client, student_id, headers)
+
+    bcrypt_calls.clear()
+    response = client.post(f"{path}?upsert=true", json=body(login))
+    assert response.status_code == 200, response.text
+    # Одна проверка пароля, без нового хэша
+    assert bcrypt_calls == ["_check"]
+    assert _token_works(client, student_id, headers)
+
+
+@pytest.mark.parametrize("kind", PEOPLE)
+def test_reimport_with_new_password_logs_out(client, kind):
+    path, body = PEOPLE[kind]
+    login = f"upsert-new-{kind}"
+    student_id = _register(client, kind, login)
+    headers = login_headers(client, login)
+
+    assert client.post(f"{path}?upsert=true", json=body(login, "other")).status_code == 200
+    assert not _token_works(client, student_id, headers)
+    assert _token_works(client, student_id, login_headers(client, login, "other"))
@@ -0,0 +1,22 @@
+import websocket
+
+# id студентов и учителей берутся из разных таблиц: одинаковый id - разные люди
+USER_ID = 777
+
+
+def test_student_and_teacher_with_same_id_are_separate(client):
+    with client.websocket_connect(f"/ws/{USER_ID}") as student, \
+            client.websocket_connect(f"/ws/{USER_ID}?role=teacher") as teacher:
+        assert student.receive_text() == "Hello from server"
+        assert teacher.receive_text() == "Hello from server"
+        assert websocket.active_connections.keys() >= {("student", USER_ID), ("teacher", USER_ID)}
+
+        # Удаление студента отключает только студента
+        client.portal.call(websocket.notify_disconnect_user, USER_ID, "Иван", "student")
+        assert student.receive_text() == f"logout:{USER_ID},Иван,student"
+        assert ("student", USER_ID) not in websocket.active_connections
+        assert ("teacher", USER_ID) in websocket.active_connections
+
+        client.portal.call(websocket.notify_disconnect_user, USER_ID, "Пётр", "teacher")
+        assert teacher.receive_text() == f"logout:{USER_ID},Пётр,teacher"
+        assert ("teacher", USER_ID) not in websocket.active_connections
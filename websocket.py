@@ -1,24 +1,91 @@
+import asyncio
+import json
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Dict,List
+from typing import Dict, Iterable, Optional, Set, Tuple
+from settings import NOTIFY_DEBOUNCE
+from db import AsyncSessionLocal, UserDB, TeacherDB
+from broker import broker
+import schedule_cache
 
 router = APIRouter()
 
-# Словарь активных подключений {user_id: WebSocket}
-active_connections: Dict[int, WebSocket] = {}
-active_group_connections: Dict[str, List[WebSocket]] = {}
+# Сколько ждём отправки одному клиенту, прежде чем считать соединение мёртвым
+SEND_TIMEOUT = 5.0
+
+# Словарь активных подключений {(роль, user_id): WebSocket}: id студентов и учителей
+# берутся из разных таблиц и могут совпадать
+UserKey = Tuple[str, int]
+active_connections: Dict[UserKey, WebSocket] = {}
+# Подписки {группа или имя учителя: {WebSocket, ...}}
+active_group_connections: Dict[str, Set[WebSocket]] = {}
+# Обратные индексы для быстрой отписки
+_connection_keys: Dict[WebSocket, Set[str]] = {}
+_connection_users: Dict[WebSocket, UserKey] = {}
+
+# Накопленные изменения расписания {группа или учитель: {действие: {id пары, ...}}}
+_pending_changes: Dict[str, Dict[str, Set[int]]] = {}
+_flush_task: Optional[asyncio.Task] = None
+
+
+async def _subscription_keys(user_id: int, role: str) -> Set[str]:
+    """Группа студента или имена учителя, по которым приходят изменения расписания"""
+    async with AsyncSessionLocal() as db:
+        if role == "teacher":
+            teacher = await db.get(TeacherDB, user_id)
+            # В парах учитель записан строкой, поэтому подписываемся и на имя, и на ФИО
+            return {key for key in (teacher.name, teacher.fullname) if key} if teacher else set()
+        user = await db.get(UserDB, user_id)
+        return {user.group} if user and user.group else set()
+
+
+def _register(user: UserKey, websocket: WebSocket, keys: Set[str]):
+    active_connections[user] = websocket
+    _connection_users[websocket] = user
+    _connection_keys[websocket] = keys
+    for key in keys:
+        active_group_connections.setdefault(key, set()).add(websocket)
+
+
+def _unregister(websocket: WebSocket):
+    for key in _connection_keys.pop(websocket, set()):
+        connections = active_group_connections.get(key)
+        if connections is not None:
+            connections.discard(websocket)
+            if not connections:
+                del active_group_connections[key]
+    user = _connection_users.pop(websocket, None)
+    # Пользователь мог переподключиться: новое соединение не трогаем
+    if user is not None and active_connections.get(user) is websocket:
+        del active_connections[user]
+
+
+async def _send(websocket: WebSocket, message: str) -> bool:
+    try:
+        await asyncio.wait_for(websocket.send_text(message), SEND_TIMEOUT)
+        return True
+    except Exception as e:
+        print(f"Error sending message to a user: {e}")
+        return False
+
+
+async def _fan_out(connections: Iterable[WebSocket], message: str):
+    """Рассылает сообщение параллельно и убирает соединения, которые не ответили"""
+    connections = list(connections)
+    results = await asyncio.gather(*(_send(connection, message) for connection in connections))
+    for connection, ok in zip(connections, results):
+        if not ok:
+            _unregister(connection)
+
 
 @router.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: int):
-    """Подключение WebSocket с передачей user_id"""
+async def websocket_endpoint(websocket: WebSocket, user_id: int, role: str = "student"):
+    """Подключение WebSocket с передачей user_id (role=teacher для учителей)"""
     await websocket.accept()
-    active_connections[user_id] = websocket  # Запоминаем подключение
-
-    group = "group1"  # Пример группы
-    if group not in active_group_connections:
-        active_group_connections[group] = []
-    
-    active_group_connections[group].append(websocket)
-    print(f"User {user_id} connected to group {group}")  # Логируем подключение
+    # Любая другая роль - студент (так же её понимает _subscription_keys)
+    role = "teacher" if role == "teacher" else "student"
+    keys = await _subscription_keys(user_id, role)
+    _register((role, user_id), websocket, keys)  # Запоминаем подключение
+    print(f"User {user_id} connected to {sorted(keys)}")  # Логируем подключение
 
     # Отправляем сообщение сразу после подключения
     try:
@@ -30,39 +97,93 @@ async def websocket_endpoint(websocket: WebSocket, user_id: int):
         while True:
             message = await websocket.receive_text()
             print(f"Message received: {message}")  # Логируем получение сообщения
-            
-            # Убедимся, что сообщение отправляется по всей группе
-            if group in active_group_connections:
-                print(f"Sending message to group {group}")  # Логируем рассылку
-                for connection in active_group_connections[group]:
-                    if connection != websocket:
-                        try:
-                            await connection.send_text(f"New message: {message}")
-                            print(f"Message sent to connection: {connection}")  # Логируем отправку
-                        except Exception as e:
-                            print(f"Error sending message to connection: {e}")
+
+            # Пересылаем сообщение остальным участникам своих групп
+            recipients = set()
+            for key in keys:
+                recipients |= active_group_connections.get(key, set())
+            recipients.discard(websocket)
+            await _fan_out(recipients, f"New message: {message}")
     except WebSocketDisconnect:
-        # Если клиент отключается, убираем его из списка
-        if user_id in active_connections:
-            del active_connections[user_id]
-            print(f"User {user_id} disconnected")
+        # Если клиент отключается, убираем его из всех подписок
+        _unregister(websocket)
+        print(f"User {user_id} disconnected")
+
+
+
+async def _deliver(event: dict):
+    """Обрабатывает событие брокера: рассылает его клиентам, подключённым к этому процессу"""
+    if event["type"] == "group":
+        connections = active_group_connections.get(event["group"])
+        if connections:
+            await _fan_out(connections, event["message"])
+    elif event["type"] == "disconnect":
+        await _disconnect_local_user(event["user_id"], event["user_name"], event["role"])
+    elif event["type"] == "schedule_cache":
+        schedule_cache.apply_event(event)
+
+
+async def start_notifications():
+    await broker.start(_deliver)
+
+
+async def stop_notifications():
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        # Иначе после следующего start_notifications (новый lifespan) окно бы не открылось
+        _flush_task = None
+    await flush_schedule_changes()
+    await broker.stop()
 
 
 
 async def notify_racp_group(group: str, message: str):
-    """Выдаем обновившееся расписание всем пользователям, независимо от группы"""
-    # Перебираем все активные соединения и отправляем им сообщение
-    for connection in active_connections.values():
-        try:
-            await connection.send_text(message)
-        except Exception as e:
-            print(f"Error sending message to a user: {e}")
+    """Выдаем обновившееся расписание только подписчикам группы (или учителя) во всех воркерах"""
+    if group is None:
+        return
+    await broker.publish({"type": "group", "group": group, "message": message})
+
+
+
+def notify_schedule_change(action: str, session_id: int, *targets: Optional[str]):
+    """Запоминает изменение пары; подписчики получат одно событие на всё окно NOTIFY_DEBOUNCE"""
+    global _flush_task
+    for target in targets:
+        if target is None:
+            continue
+        _pending_changes.setdefault(target, {}).setdefault(action, set()).add(session_id)
+    if _flush_task is None:
+        _flush_task = asyncio.create_task(_flush_later())
+
+
+async def _flush_later():
+    global _flush_task
+    await asyncio.sleep(NOTIFY_DEBOUNCE)
+    # Изменения, пришедшие во время рассылки, попадут уже в следующее окно
+    _flush_task = None
+    await flush_schedule_changes()
+
+
+async def flush_schedule_changes():
+    changes = dict(_pending_changes)
+    _pending_changes.clear()
+    for target, actions in changes.items():
+        # {"type": "schedule", "target": "ИС-21", "created": [1, 2], "updated": [3], "deleted": [4]}
+        event = {"type": "schedule", "target": target}
+        event.update({action: sorted(ids) for action, ids in actions.items()})
+        await notify_racp_group(target, json.dumps(event, ensure_ascii=False))
 
 
 
 async def notify_disconnect_user(user_id: int, user_name: str, role: str):
-    """Отключает пользователя по его ID и имени"""
-    connection = active_connections.get(user_id)  # Получаем соединение по user_id
+    """Отключает пользователя по его ID и имени, в каком бы воркере он ни был подключён"""
+    await broker.publish({"type": "disconnect", "user_id": user_id, "user_name": user_name, "role": role})
+
+
+async def _disconnect_local_user(user_id: int, user_name: str, role: str):
+    # Только соединение пользователя этой роли: учитель с тем же id не затрагивается
+    connection = active_connections.get((role, user_id))
     if connection:
         try:
             # Отправляем сообщение об отключении с ID, именем и ролью
@@ -71,4 +192,4 @@ async def notify_disconnect_user(user_id: int, user_name: str, role: str):
             pass  # Ошибку можно залогировать
         finally:
             # Убираем пользователя из списка активных подключений
-            del active_connections[user_id] 
\ No newline at end of file
+            _unregister(connection)